@@ -0,0 +1,463 @@
+"""
+Benchmarks for the signal cleaning pipelines and peak detection methods.
+
+Generates deterministic synthetic ECG and PPG recordings with known beat positions, then times every
+`PreprocessPipeline`, every `PeakDetectionMethod` and every NeuroKit2 ECG peak detection sub-method on them. Each
+case runs in a fresh worker process, so the peak resident set size (RSS) recorded for it isn't inflated by earlier
+cases. Throughput (samples/s), peak RSS and the F1 score of the detected peaks against the ground truth are written
+to a JSON file, which can be passed to `--compare` in a later run to see what changed.
+
+Examples::
+
+    python -m benchmarks.peak_detection --output bench.json
+    python -m benchmarks.peak_detection --grid full --output bench_full.json
+    python -m benchmarks.peak_detection --signals ecg --cases xqrs neurokit --compare bench.json
+"""
+
+import argparse
+import concurrent.futures as cf
+import datetime
+import fnmatch
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import typing as t
+from pathlib import Path
+
+import attrs
+import neurokit2 as nk
+import numpy as np
+import numpy.typing as npt
+from scipy import signal as ssignal
+
+from signal_editor.app import _type_defs as _t
+from signal_editor.app._enums import (
+    NK2ECGPeakDetectionMethod,
+    PeakDetectionMethod,
+    PreprocessPipeline,
+    WFDBPeakDirection,
+)
+from signal_editor.app.logic.peak_detection import find_peaks
+from signal_editor.app.logic.processing import apply_cleaning_pipeline
+
+type SignalKind = t.Literal["ecg", "ppg"]
+
+GRIDS: t.Final[dict[str, tuple[list[int], list[int]]]] = {
+    # sampling rates (Hz), durations (seconds)
+    "quick": ([250, 1000], [60, 600]),
+    "full": ([100, 250, 500, 1000, 2000], [60, 600, 3600, 6 * 3600, 24 * 3600]),
+}
+
+# Detected peaks closer than this to a true beat count as a hit
+MATCH_TOLERANCE_SECONDS: t.Final = 0.05
+# Signals are generated, cleaned and stored in chunks of this many samples to bound the memory use of the parent
+_CHUNK_SIZE: t.Final = 10_000_000
+
+_ECG_PIPELINES: t.Final = [p for p in PreprocessPipeline if p != PreprocessPipeline.PPGElgendi]
+_DEFAULT_PIPELINE: t.Final[dict[SignalKind, PreprocessPipeline]] = {
+    "ecg": PreprocessPipeline.ECGNeuroKit2,
+    "ppg": PreprocessPipeline.PPGElgendi,
+}
+
+
+# region Synthetic signals
+
+
+def _gaussian_template(
+    sampling_rate: int, waves: list[tuple[float, float, float]], start: float, stop: float
+) -> tuple[npt.NDArray[np.float64], int]:
+    """
+    Sum of gaussian waves given as (center, amplitude, width) in seconds relative to the beat. Returns the template
+    and the index of the beat (time 0) in it.
+    """
+    time_s = np.arange(round(start * sampling_rate), round(stop * sampling_rate) + 1) / sampling_rate
+    template = np.zeros_like(time_s)
+    for center, amplitude, width in waves:
+        template += amplitude * np.exp(-(((time_s - center) / width) ** 2) / 2)
+    return template, -round(start * sampling_rate)
+
+
+def _beat_template(kind: SignalKind, sampling_rate: int) -> tuple[npt.NDArray[np.float64], int]:
+    if kind == "ecg":
+        # P, Q, R, S and T waves, with the R peak at the beat position
+        waves = [(-0.2, 0.12, 0.025), (-0.035, -0.15, 0.01), (0.0, 1.0, 0.012), (0.035, -0.25, 0.01), (0.25, 0.3, 0.04)]
+        template, beat_index = _gaussian_template(sampling_rate, waves, -0.3, 0.5)
+    else:
+        # Systolic peak followed by the smaller diastolic wave
+        waves = [(0.15, 1.0, 0.06), (0.4, 0.4, 0.08)]
+        template, _ = _gaussian_template(sampling_rate, waves, -0.1, 0.7)
+        # Ground truth for PPG is the systolic peak, not the onset of the pulse
+        beat_index = int(np.argmax(template))
+    return template, beat_index
+
+
+def _beat_positions(duration: float, rng: np.random.Generator) -> npt.NDArray[np.float64]:
+    """Beat times in seconds, with a slowly drifting heart rate, respiratory sinus arrhythmia and random jitter."""
+    n_max = int(duration * 3.5) + 10
+    mean_rr = 60 / rng.uniform(55, 85)
+    drift = 0.1 * np.sin(2 * np.pi * np.arange(n_max) / rng.uniform(200, 600) + rng.uniform(0, 2 * np.pi))
+    rsa = 0.04 * np.sin(2 * np.pi * np.arange(n_max) / rng.uniform(3, 6))
+    rr = np.clip(mean_rr * (1 + drift + rsa) + rng.normal(0, 0.02, n_max), 0.3, 2.0)
+    beats = np.cumsum(rr)
+    return beats[beats < duration - 1]
+
+
+def _artifact_intervals(duration: float, rng: np.random.Generator) -> npt.NDArray[np.float64]:
+    """Start and stop times (seconds) of motion artifacts, about one per five minutes, each 0.5 to 3 seconds long."""
+    n_artifacts = rng.poisson(duration / 300)
+    starts = np.sort(rng.uniform(0, max(duration - 3, 0), n_artifacts))
+    return np.column_stack([starts, starts + rng.uniform(0.5, 3, n_artifacts)])
+
+
+@attrs.frozen
+class SyntheticRecording:
+    kind: SignalKind = attrs.field()
+    sampling_rate: int = attrs.field()
+    duration: int = attrs.field()
+    signal_path: Path = attrs.field()
+    peaks: npt.NDArray[np.int64] = attrs.field(eq=False)
+    artifact_fraction: float = attrs.field()
+
+    @property
+    def n_samples(self) -> int:
+        return round(self.duration * self.sampling_rate)
+
+
+def generate_recording(
+    kind: SignalKind, sampling_rate: int, duration: int, out_dir: Path, seed: int = 0
+) -> SyntheticRecording:
+    """
+    Writes a synthetic recording to a `.npy` file in `out_dir` and returns it together with its true beat positions.
+
+    The beats are rendered from a fixed template at known, irregularly spaced positions, then white noise, baseline
+    wander, powerline interference (ECG only) and motion artifacts are added. All random draws are seeded from the
+    arguments, so the same arguments always produce the same recording.
+    """
+    rng = np.random.default_rng([seed, sampling_rate, duration, kind == "ecg"])
+    n = round(duration * sampling_rate)
+    beats = _beat_positions(duration, rng)
+    amplitudes = rng.normal(1, 0.1, beats.size)
+    artifacts = _artifact_intervals(duration, rng)
+    artifact_seeds = rng.integers(0, 2**32, artifacts.shape[0])
+    wander = [(rng.uniform(0.05, 0.3), rng.uniform(0.1, 0.4), rng.uniform(0, 2 * np.pi)) for _ in range(3)]
+
+    template, beat_index = _beat_template(kind, sampling_rate)
+    beat_samples = np.round(beats * sampling_rate).astype(np.int64)
+
+    path = out_dir / f"{kind}_{sampling_rate}hz_{duration}s.npy"
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(n,))
+    for chunk_start in range(0, n, _CHUNK_SIZE):
+        chunk_stop = min(chunk_start + _CHUNK_SIZE, n)
+        # Beats whose template overlaps the chunk
+        lo, hi = np.searchsorted(
+            beat_samples, [chunk_start - template.size + beat_index, chunk_stop + beat_index], side="left"
+        )
+        impulses = np.zeros(chunk_stop - chunk_start + template.size)
+        np.add.at(impulses, beat_samples[lo:hi] - chunk_start + template.size - beat_index, amplitudes[lo:hi])
+        chunk = ssignal.oaconvolve(impulses, template)[template.size : template.size + chunk_stop - chunk_start]
+
+        time_s = np.arange(chunk_start, chunk_stop) / sampling_rate
+        for freq, amplitude, phase in wander:
+            chunk += amplitude * np.sin(2 * np.pi * freq * time_s + phase)
+        if kind == "ecg" and sampling_rate > 100:
+            chunk += 0.05 * np.sin(2 * np.pi * 50 * time_s)
+        chunk += np.random.default_rng([seed, sampling_rate, duration, chunk_start]).normal(0, 0.05, chunk.size)
+        out[chunk_start:chunk_stop] = chunk
+
+    for (start, stop), artifact_seed in zip(artifacts, artifact_seeds, strict=True):
+        start_idx, stop_idx = round(start * sampling_rate), min(round(stop * sampling_rate), n)
+        noise = np.cumsum(np.random.default_rng(artifact_seed).normal(0, 1, stop_idx - start_idx))
+        noise -= np.linspace(noise[0], noise[-1], noise.size)
+        out[start_idx:stop_idx] += 2 * noise / max(np.abs(noise).max(), 1e-12)
+    out.flush()
+    del out
+
+    artifact_fraction = float(np.sum(artifacts[:, 1] - artifacts[:, 0]) / duration) if artifacts.size else 0.0
+    return SyntheticRecording(kind, sampling_rate, duration, path, beat_samples, artifact_fraction)
+
+
+def clean_recording(recording: SyntheticRecording) -> Path:
+    """Cleans a recording with the default pipeline for its kind, which the peak detection cases run on."""
+    sig = np.load(recording.signal_path, mmap_mode="r")
+    path = recording.signal_path.with_name(f"{recording.signal_path.stem}_clean.npy")
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=sig.shape)
+    out[:] = apply_cleaning_pipeline(
+        np.asarray(sig), recording.sampling_rate, _DEFAULT_PIPELINE[recording.kind], block_size=_CHUNK_SIZE
+    ).cleaned
+    out.flush()
+    return path
+
+
+# endregion
+
+# region Cases
+
+
+@attrs.frozen
+class Case:
+    """A single pipeline or peak detection method applied to a single recording."""
+
+    task: t.Literal["pipeline", "peaks"] = attrs.field()
+    name: str = attrs.field()
+    kind: SignalKind = attrs.field()
+    sampling_rate: int = attrs.field()
+    duration: int = attrs.field()
+    pipeline: PreprocessPipeline | None = attrs.field(default=None)
+    method: PeakDetectionMethod | None = attrs.field(default=None)
+    method_parameters: dict[str, t.Any] | None = attrs.field(default=None)
+    # LocalMinima runs on the inverted signal, so that its troughs are the true beats
+    invert: bool = attrs.field(default=False)
+
+    @property
+    def key(self) -> str:
+        return f"{self.task}/{self.name}/{self.kind}/{self.sampling_rate}hz/{self.duration}s"
+
+
+def _peak_methods(
+    kind: SignalKind, sampling_rate: int
+) -> list[tuple[str, PeakDetectionMethod, dict[str, t.Any], bool]]:
+    """Peak detection methods applicable to a signal kind, with the app's default parameters scaled to the rate."""
+    local_params: _t.PeaksLocalMaxima = {
+        "search_radius": round(0.3 * sampling_rate),
+        "min_distance": round(0.04 * sampling_rate),
+    }
+    methods: list[tuple[str, PeakDetectionMethod, dict[str, t.Any], bool]] = [
+        ("local_maxima", PeakDetectionMethod.LocalMaxima, dict(local_params), False),
+        ("local_minima", PeakDetectionMethod.LocalMinima, dict(local_params), True),
+    ]
+    if kind == "ppg":
+        elgendi_params: _t.PeaksPPGElgendi = {
+            "peakwindow": 0.111,
+            "beatwindow": 0.667,
+            "beatoffset": 0.02,
+            "mindelay": 0.3,
+        }
+        methods.append(("ppg_elgendi", PeakDetectionMethod.PPGElgendi, dict(elgendi_params), False))
+        return methods
+
+    xqrs_params: _t.PeaksWFDBXQRS = {
+        "search_radius": round(0.1 * sampling_rate),
+        "peak_dir": WFDBPeakDirection.Up,
+        "min_peak_distance": round(0.3 * sampling_rate),
+    }
+    methods.append(("wfdb_xqrs", PeakDetectionMethod.WFDBXQRS, dict(xqrs_params), False))
+    for nk_method in NK2ECGPeakDetectionMethod:
+        nk_params: _t.PeaksECGNeuroKit2 = {"method": nk_method, "params": None}
+        methods.append((f"neurokit/{nk_method}", PeakDetectionMethod.ECGNeuroKit2, dict(nk_params), False))
+    return methods
+
+
+def build_cases(kinds: list[SignalKind], sampling_rates: list[int], durations: list[int]) -> list[Case]:
+    cases: list[Case] = []
+    for kind in kinds:
+        pipelines = _ECG_PIPELINES if kind == "ecg" else [PreprocessPipeline.PPGElgendi]
+        for sampling_rate in sampling_rates:
+            for duration in durations:
+                cases.extend(
+                    Case("pipeline", str(pipeline), kind, sampling_rate, duration, pipeline=pipeline)
+                    for pipeline in pipelines
+                )
+                cases.extend(
+                    Case(
+                        "peaks",
+                        name,
+                        kind,
+                        sampling_rate,
+                        duration,
+                        method=method,
+                        method_parameters=params,
+                        invert=invert,
+                    )
+                    for name, method, params, invert in _peak_methods(kind, sampling_rate)
+                )
+    return cases
+
+
+def f1_score(detected: npt.NDArray[np.integer], truth: npt.NDArray[np.integer], tolerance: int) -> dict[str, float]:
+    """
+    Precision, recall and F1 of the detected peaks, matching each true peak to at most one detected peak within
+    `tolerance` samples (greedily, in order).
+    """
+    detected = np.unique(detected)
+    if truth.size == 0 or detected.size == 0:
+        return {"precision": 0.0, "recall": 0.0, "f1": 0.0}
+
+    # Candidates are the detected peaks right before and after each true peak
+    right = np.clip(np.searchsorted(detected, truth), 0, detected.size - 1)
+    left = np.clip(right - 1, 0, detected.size - 1)
+    nearest = np.where(np.abs(detected[left] - truth) <= np.abs(detected[right] - truth), left, right)
+    within = np.abs(detected[nearest] - truth) <= tolerance
+    # A detected peak can only match one true peak
+    true_positives = np.unique(nearest[within]).size
+
+    precision = true_positives / detected.size
+    recall = true_positives / truth.size
+    f1 = 2 * precision * recall / (precision + recall) if true_positives else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+
+def _peak_rss_bytes() -> int:
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, in kilobytes everywhere else
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def run_case(case: Case, signal_path: Path, truth: npt.NDArray[np.int64], repeat: int) -> dict[str, t.Any]:
+    """Runs a single case in the current process. Meant to be called in a fresh worker process per case."""
+    sig = np.array(np.load(signal_path, mmap_mode="r"))
+    if case.invert:
+        sig = -sig
+    baseline_rss = _peak_rss_bytes()
+
+    seconds: list[float] = []
+    peaks: npt.ArrayLike = []
+    result: dict[str, t.Any] = {}
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            if case.task == "pipeline":
+                assert case.pipeline is not None
+                apply_cleaning_pipeline(sig, case.sampling_rate, case.pipeline)
+            else:
+                assert case.method is not None and case.method_parameters is not None
+                peaks = find_peaks(sig, case.sampling_rate, case.method, t.cast(t.Any, case.method_parameters))
+            seconds.append(time.perf_counter() - start)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    if case.task == "peaks" and "error" not in result:
+        peaks = np.asarray(peaks, dtype=np.int64)
+        result["n_peaks"] = int(peaks.size)
+        result["n_true_peaks"] = int(truth.size)
+        result |= f1_score(peaks, truth, round(MATCH_TOLERANCE_SECONDS * case.sampling_rate))
+
+    best = min(seconds) if seconds else None
+    return {
+        **attrs.asdict(case, filter=lambda a, _: a.name not in {"method_parameters", "invert"}),
+        "key": case.key,
+        "method_parameters": case.method_parameters,
+        "n_samples": sig.size,
+        "seconds": seconds,
+        "best_seconds": best,
+        "samples_per_second": sig.size / best if best else None,
+        "peak_rss_mb": _peak_rss_bytes() / 1024**2,
+        "baseline_rss_mb": baseline_rss / 1024**2,
+        **result,
+    }
+
+
+# endregion
+
+# region Reporting
+
+
+def _environment() -> dict[str, t.Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.UTC).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "neurokit2": nk.__version__,
+    }
+
+
+def _format_row(result: dict[str, t.Any]) -> str:
+    if "error" in result:
+        return f"{result['key']:<60} ERROR {result['error']}"
+    throughput = f"{result['samples_per_second'] / 1e6:8.2f} MS/s"
+    f1 = f"F1 {result['f1']:.3f}" if "f1" in result else ""
+    return f"{result['key']:<60} {throughput}  {result['peak_rss_mb']:8.0f} MB  {f1}"
+
+
+def compare(current: list[dict[str, t.Any]], previous_path: Path) -> None:
+    """Prints the change in throughput, peak RSS and F1 of every case that is also in a previous results file."""
+    previous = {r["key"]: r for r in json.loads(previous_path.read_text())["results"]}
+    print(f"\nCompared to {previous_path}:")
+    for result in current:
+        old = previous.get(result["key"])
+        if old is None or "error" in result or "error" in old:
+            continue
+        speedup = result["samples_per_second"] / old["samples_per_second"]
+        rss_change = result["peak_rss_mb"] - old["peak_rss_mb"]
+        line = f"{result['key']:<60} {speedup:6.2f}x  {rss_change:+8.0f} MB"
+        if "f1" in result and "f1" in old:
+            line += f"  F1 {result['f1'] - old['f1']:+.3f}"
+        print(line)
+
+
+# endregion
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grid", choices=list(GRIDS), default="quick", help="Preset sampling rates and durations.")
+    parser.add_argument("--sampling-rates", type=int, nargs="+", help="Sampling rates in Hz, overrides the grid.")
+    parser.add_argument("--durations", type=int, nargs="+", help="Recording durations in seconds, overrides the grid.")
+    parser.add_argument("--signals", nargs="+", choices=["ecg", "ppg"], default=["ecg", "ppg"])
+    parser.add_argument(
+        "--cases", nargs="+", help="Only run cases whose key (e.g. 'peaks/neurokit/promac/ecg/250hz/60s') matches."
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per case, the fastest is reported.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=Path("peak_detection_benchmark.json"))
+    parser.add_argument("--compare", type=Path, help="Results file of a previous run to compare against.")
+    parser.add_argument("--work-dir", type=Path, help="Where to store the generated signals (default: a temp dir).")
+    args = parser.parse_args(argv)
+
+    grid_rates, grid_durations = GRIDS[args.grid]
+    cases = build_cases(args.signals, args.sampling_rates or grid_rates, args.durations or grid_durations)
+    if args.cases:
+        cases = [c for c in cases if any(fnmatch.fnmatch(c.key, f"*{pattern}*") for pattern in args.cases)]
+
+    results: list[dict[str, t.Any]] = []
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as work_dir:
+        recordings: dict[tuple[str, int, int], tuple[SyntheticRecording, Path | None]] = {}
+        for case in cases:
+            rec_key = (case.kind, case.sampling_rate, case.duration)
+            if rec_key not in recordings:
+                recording = generate_recording(*rec_key, out_dir=Path(work_dir), seed=args.seed)  # type: ignore
+                recordings[rec_key] = (recording, None)
+            recording, clean_path = recordings[rec_key]
+            if case.task == "peaks" and clean_path is None:
+                clean_path = clean_recording(recording)
+                recordings[rec_key] = (recording, clean_path)
+            signal_path = recording.signal_path if case.task == "pipeline" else clean_path
+            assert signal_path is not None
+
+            # A new process for every case, so the peak RSS of one case doesn't carry over to the next
+            with cf.ProcessPoolExecutor(1, mp_context=mp.get_context("spawn"), max_tasks_per_child=1) as executor:
+                result = executor.submit(run_case, case, signal_path, recording.peaks, args.repeat).result()
+            result["artifact_fraction"] = recording.artifact_fraction
+            results.append(result)
+            print(_format_row(result), flush=True)
+
+    report = {
+        "environment": _environment(),
+        "settings": {"repeat": args.repeat, "seed": args.seed, "match_tolerance_seconds": MATCH_TOLERANCE_SECONDS},
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2, default=str))
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+    if args.compare is not None:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,10 +8,11 @@ from PySide6 import QtCore, QtGui
 from pyside_config.helpers import make_combo_box_info, make_spin_box_info
 from pyside_widgets.enum_combo_box import EnumComboBox
 
-from ._enums import RateComputationMethod, TextFileSeparator
-from .utils import app_dir_posix, make_qcolor, search_enum
+from ._enums import HDF5Compression, RateComputationMethod, TextFileSeparator
+from .utils import app_dir_posix, cache_dir_posix, make_qcolor, search_enum
 
 app_dir = app_dir_posix()
+cache_dir = cache_dir_posix()
 
 
 @qconfig.config
@@ -107,6 +108,65 @@ class EditingConfig:
             "description": "How to compute the signal rate from the detected peaks.",
         },
     )
+    processing_history_memory_budget: int = attrs.field(
+        default=1024,
+        converter=int,
+        metadata={
+            "editor": make_spin_box_info(
+                label="Processing history memory",
+                widget_factory=qfw.SpinBox,
+                minimum=0,
+                maximum=1_000_000,
+                singleStep=256,
+                suffix=" MB",
+            ),
+            "description": "Memory available for storing undo steps of the processed signal, older steps are moved to temporary files.",
+        },
+    )
+    filter_block_size: int = attrs.field(
+        default=4_000_000,
+        converter=int,
+        metadata={
+            "editor": make_spin_box_info(
+                label="Filter block size",
+                widget_factory=qfw.SpinBox,
+                minimum=0,
+                maximum=100_000_000,
+                singleStep=1_000_000,
+                suffix=" samples",
+            ),
+            "description": "Signals longer than this are filtered in blocks of this many samples, which limits the memory needed for filtering very long sections. Set to 0 to always filter the whole signal at once.",
+        },
+    )
+    peak_detection_block_size: int = attrs.field(
+        default=0,
+        converter=int,
+        metadata={
+            "editor": make_spin_box_info(
+                label="Peak detection block size",
+                widget_factory=qfw.SpinBox,
+                minimum=0,
+                maximum=100_000_000,
+                singleStep=1_000_000,
+                suffix=" samples",
+            ),
+            "description": "Peaks in signals longer than this are detected in overlapping blocks of this many samples, which are processed in parallel. Peaks close to the block seams may differ slightly from detecting them in the whole signal at once. Set to 0 to always use the whole signal.",
+        },
+    )
+    batch_max_workers: int = attrs.field(
+        default=0,
+        converter=int,
+        metadata={
+            "editor": make_spin_box_info(
+                label="Batch processing workers",
+                widget_factory=qfw.SpinBox,
+                minimum=0,
+                maximum=256,
+                singleStep=1,
+            ),
+            "description": "Number of worker processes used when processing all sections at once or detecting peaks block-wise. Set to 0 to use one process per CPU core.",
+        },
+    )
 
 
 editing: EditingConfig = qconfig.get_config("EditingConfig")
@@ -141,6 +201,63 @@ class DataConfig:
             "description": "Character used to separate fields when reading from a text (.txt) file.",
         },
     )
+    input_cache_size: int = attrs.field(
+        default=2048,
+        converter=int,
+        metadata={
+            "editor": make_spin_box_info(
+                label="Input file cache size",
+                widget_factory=qfw.SpinBox,
+                minimum=0,
+                maximum=1_000_000,
+                singleStep=256,
+                suffix=" MB",
+            ),
+            "description": "Disk space for storing parsed copies of text and Excel files so they open faster the next time. Set to 0 to disable the cache.",
+        },
+    )
+    peak_detection_cache_size: int = attrs.field(
+        default=256,
+        converter=int,
+        metadata={
+            "editor": make_spin_box_info(
+                label="Peak detection cache size",
+                widget_factory=qfw.SpinBox,
+                minimum=0,
+                maximum=1_000_000,
+                singleStep=64,
+                suffix=" MB",
+            ),
+            "description": "Disk space for storing peak detection results, so running the same detection on an unchanged signal again returns immediately. Set to 0 to disable the cache.",
+        },
+    )
+    hdf5_compression: HDF5Compression = attrs.field(
+        default=HDF5Compression.BloscLZ4,
+        converter=functools.partial(search_enum, enum_class=HDF5Compression),
+        metadata={
+            "editor": make_combo_box_info(
+                label="HDF5 compression",
+                widget_factory=functools.partial(EnumComboBox, enum_class=HDF5Compression),
+                sig_value_changed="sig_current_enum_changed",
+                set_value_method="set_current_enum",
+            ),
+            "description": "Compression library used for the tables in exported HDF5 files. Blosc (LZ4) is the fastest, Zlib files can be read by any HDF5 tool.",
+        },
+    )
+    hdf5_compression_level: int = attrs.field(
+        default=5,
+        converter=int,
+        metadata={
+            "editor": make_spin_box_info(
+                label="HDF5 compression level",
+                widget_factory=qfw.SpinBox,
+                minimum=0,
+                maximum=9,
+                singleStep=1,
+            ),
+            "description": "Compression level for exported HDF5 files, higher levels create smaller files but take longer to write. Set to 0 to disable compression.",
+        },
+    )
 
 
 data: DataConfig = qconfig.get_config("DataConfig")
@@ -35,6 +35,36 @@ class InputFileFormat(enum.StrEnum):
     XLSX = ".xlsx"
     FEATHER = ".feather"
     EDF = ".edf"
+    HDF5 = ".hdf5"
+
+
+class HDF5Compression(enum.StrEnum):
+    """
+    Compression library used for the tables in exported HDF5 files.
+    """
+
+    BloscLZ4 = "blosc:lz4"
+    BloscZstd = "blosc:zstd"
+    Zlib = "zlib"
+
+
+class LoadRangeUnit(enum.StrEnum):
+    """
+    Unit of the start and stop values when loading only part of a file.
+    """
+
+    Seconds = "seconds"
+    Rows = "rows"
+
+
+class SectionBatchStatus(enum.StrEnum):
+    """
+    State of a section while a processing recipe is applied to all sections.
+    """
+
+    Queued = "queued"
+    Done = "done"
+    Failed = "failed"
 
 
 class FilterMethod(enum.StrEnum):
@@ -69,6 +99,7 @@ class PreprocessPipeline(enum.StrEnum):
 class StandardizationMethod(enum.StrEnum):
     ZScore = "std"
     ZScoreRobust = "mad"
+    ZScoreRobustRolling = "rolling_mad"
 
 
 class PeakDetectionMethod(enum.StrEnum):
@@ -45,6 +45,7 @@ PGBrush = t.Union[PGColor, "QtGui.QBrush", PGBrushKwargs, None]
 PGPointSymbols = t.Union[PointSymbols, "QtGui.QPainterPath"]
 
 UpdatePeaksAction = t.Literal["add", "remove"]
+type ProgressCallback = t.Callable[[int, int], None]
 
 
 class FindPeaksKwargs(t.TypedDict, total=False):
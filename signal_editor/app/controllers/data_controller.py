@@ -1,4 +1,5 @@
 import functools
+import math
 import typing as t
 from pathlib import Path
 
@@ -10,15 +11,23 @@ from PySide6 import QtCore
 
 # from pyside_config import config
 from .. import _type_defs as _t
-from .._app_config import Config
+from .._app_config import Config, cache_dir
 from .._constants import COMBO_BOX_NO_SELECTION
 from .._enums import InputFileFormat, TextFileSeparator
-from ..logic.file_io import detect_sampling_rate, read_edf
+from ..logic.combined_data import CombinedDataAssembler
+from ..logic.file_cache import InputFileCache, PeakDetectionCache
+from ..logic.file_io import detect_sampling_rate, scan_edf
 from ..logic.metadata import FileMetadata
 from ..logic.section import DetailedSectionResult, Section, SectionID
+from ..logic.session_reader import HDF5SessionReader
 from ..models import DataFrameModel, SectionListModel
 
 
+# Formats that have to be parsed before they can be used, and are therefore stored in the input file cache
+_CACHED_FORMATS: t.Final = frozenset({".csv", ".txt", ".tsv", ".xlsx"})
+_LOAD_BATCH_ROWS: t.Final = 500_000
+
+
 @attrs.define(frozen=True, repr=True)
 class SelectedFileMetadata:
     file_name: str = attrs.field()
@@ -40,9 +49,14 @@ class SelectedFileMetadata:
 @attrs.define(frozen=True, repr=True)
 class CompleteResult:
     metadata: SelectedFileMetadata = attrs.field()
-    global_dataframe: pl.DataFrame = attrs.field()
+    combined_data: CombinedDataAssembler = attrs.field()
     section_results: dict["SectionID", DetailedSectionResult] = attrs.field()
 
+    @property
+    def global_dataframe(self) -> pl.DataFrame:
+        """The complete combined dataframe, assembled on every access. Use `combined_data` to create it in chunks."""
+        return self.combined_data.collect()
+
     def to_dict(self) -> _t.CompleteResultDict:
         section_results = {k: v.to_dict() for k, v in self.section_results.items()}
 
@@ -66,6 +80,9 @@ class DataController(QtCore.QObject):
         self.data_model = DataFrameModel(self)
 
         self._metadata: FileMetadata | None = None
+        # Set when a results file written by `write_hdf5` is opened, sections stored in it are restored on activation
+        self._session: HDF5SessionReader | None = None
+        self._stored_sections: dict[Section, str] = {}
 
         self._sections = SectionListModel(parent=self)
         self._active_section: Section | None = None
@@ -84,6 +101,16 @@ class DataController(QtCore.QObject):
             ".tsv": functools.partial(pl.scan_csv, separator=TextFileSeparator.Tab),
             ".feather": pl.scan_ipc,
         }
+        self._file_cache = InputFileCache(Path(cache_dir) / "input_files", Config.data.input_cache_size * 1024**2)
+        self._peak_cache = PeakDetectionCache(
+            Path(cache_dir) / "peaks", Config.data.peak_detection_cache_size * 1024**2
+        )
+
+    @property
+    def peak_detection_cache(self) -> PeakDetectionCache:
+        """The peak detection cache, resized to the currently configured maximum size (0 disables it)."""
+        self._peak_cache.resize(Config.data.peak_detection_cache_size * 1024**2)
+        return self._peak_cache
 
     @property
     def base_df(self) -> pl.DataFrame:
@@ -99,15 +126,17 @@ class DataController(QtCore.QObject):
             raise ValueError("No data available.")
         return self._metadata
 
+    def create_base_section(self, df: pl.DataFrame) -> Section:
+        try:
+            section = Section(df, signal_name=self.metadata.signal_column, info_column=self.metadata.info_column)
+            section.set_locked(True)
+        except Exception as e:
+            raise ValueError("No data available. Select a valid file to load, and try again.") from e
+        return section
+
     def get_base_section(self) -> Section:
         if self._base_section is None:
-            try:
-                self._base_section = Section(
-                    self.base_df, signal_name=self.metadata.signal_column, info_column=self.metadata.info_column
-                )
-                self._base_section.set_locked(True)
-            except Exception as e:
-                raise ValueError("No data available. Select a valid file to load, and try again.") from e
+            self._base_section = self.create_base_section(self.base_df)
         return self._base_section
 
     @property
@@ -120,6 +149,7 @@ class DataController(QtCore.QObject):
     def set_active_section(self, model_index: QtCore.QModelIndex) -> None:
         section = self.sections.data(model_index, QtCore.Qt.ItemDataRole.UserRole)
         if isinstance(section, Section):
+            self._load_stored_section(section)
             self._active_section = section
             self.active_section_model.set_df(self._active_section.data)
             has_peak_data = not self._active_section.peaks_local.is_empty()
@@ -169,21 +199,34 @@ class DataController(QtCore.QObject):
             column_names: list[str] = edf_info.ch_names  # type: ignore
             other_info = dict(edf_info.info)
         elif file_path.suffix in {".feather", ".csv", ".txt", ".tsv"}:
-            lf = self._reader_funcs[file_path.suffix](file_path)
+            if (cache_path := self._get_cached_input_file(file_path)) is not None:
+                lf = pl.scan_ipc(cache_path)
+            else:
+                lf = self._reader_funcs[file_path.suffix](file_path)
             column_names = lf.collect_schema().names()
             try:
                 sampling_rate = detect_sampling_rate(lf)
             except Exception:
                 sampling_rate = 0
         elif file_path.suffix == ".xlsx":
-            lf = pl.read_excel(file_path).lazy()
+            if (cache_path := self._get_cached_input_file(file_path)) is not None:
+                lf = pl.scan_ipc(cache_path)
+            else:
+                df = pl.read_excel(file_path)
+                cache_path = self._cache_input_file(file_path, df)
+                lf = df.lazy() if cache_path is None else pl.scan_ipc(cache_path)
             column_names = lf.collect_schema().names()
             try:
                 sampling_rate = detect_sampling_rate(lf)
             except Exception:
                 sampling_rate = 0
         elif file_path.suffix == ".hdf5":
-            raise NotImplementedError("Reading HDF5 files is not yet supported.")
+            self._session = HDF5SessionReader(file_path)
+            sampling_rate = self._session.sampling_rate
+            last_signal_col = self._session.signal_column
+            last_info_col = self._session.info_column
+            column_names = [col for col in (last_signal_col, last_info_col) if col in self._session.column_names]
+            other_info = self._session.metadata
         else:
             raise ValueError(f"Unsupported file format: {file_path.suffix}. Please select a valid file format.")
 
@@ -200,12 +243,30 @@ class DataController(QtCore.QObject):
 
         self.sig_new_metadata.emit(self.metadata)
 
-    def load_data(self) -> None:
+    def load_data(self, start: int = 0, stop: int | None = None) -> None:
+        """Read the rows `start:stop` of the current file and show them. See `read_data` for details."""
+        df = self.read_data(start, stop)
+        if df is not None:
+            self.set_data(df)
+
+    def read_data(
+        self, start: int = 0, stop: int | None = None, progress: _t.ProgressCallback | None = None
+    ) -> pl.DataFrame | None:
+        """
+        Read the selected columns of the current file without touching any of the models, so it can run outside the
+        GUI thread.
+
+        Only the rows `start:stop` are read. For CSV, text and Feather files the row range is pushed down into the
+        reader, for EDF files it is translated into data record offsets. The `index` column always refers to the row
+        position in the original file, so results of a partially loaded file line up with the full file.
+
+        The data is read in batches, and `progress` is called after each one with the number of rows read so far and
+        the total number of rows (0 if not known in advance). Raising an exception in `progress` stops the read.
+        """
         if self._metadata is None:
-            return
+            return None
         suffix = self.metadata.file_format
-        file_path = self.metadata.file_path
-        separator = Config.data.text_file_separator
+        file_path = Path(self.metadata.file_path)
 
         signal_col = self.metadata.signal_column
         info_col = self.metadata.info_column
@@ -215,67 +276,178 @@ class DataController(QtCore.QObject):
         row_index_col = "index"
         if row_index_col in columns:
             logger.exception("Column name 'index' is reserved for internal use and cannot be used as a column name.")
-            return
-
-        if suffix == ".csv":
-            df = pl.read_csv(file_path, columns=columns, row_index_name=row_index_col)
-        elif suffix == ".txt":
-            df = pl.read_csv(file_path, columns=columns, separator=separator, row_index_name=row_index_col)
-        elif suffix == ".tsv":
-            df = pl.read_csv(
-                file_path,
-                columns=columns,
-                separator=TextFileSeparator.Tab,
-                row_index_name=row_index_col,
-            )
+            return None
+        if stop is not None and stop <= start:
+            logger.error(f"Invalid row range to load: start ({start}) must be smaller than stop ({stop}).")
+            return None
+        length = None if stop is None else stop - start
+
+        cache_path = self._get_cached_input_file(file_path)
+        if cache_path is None and suffix in _CACHED_FORMATS and self._file_cache.enabled:
+            # Without a range the whole file has to be parsed anyway, so keep a copy for the next time it is opened.
+            # Excel files are always read completely.
+            if suffix == ".xlsx" or (start == 0 and stop is None):
+                cache_path = self._cache_input_file(file_path, self._parse_input_file(file_path, progress))
+
+        if cache_path is not None:
+            lf = pl.scan_ipc(cache_path, row_index_name=row_index_col)
+            df = self._read_ipc_batches(lf.select(row_index_col, *columns), start, length, progress)
+        elif suffix in {".csv", ".txt", ".tsv"}:
+            df = self._read_csv_batches(file_path, columns, row_index_col, start, length, progress)
         elif suffix == ".feather":
-            df = pl.read_ipc(file_path, columns=columns, row_index_name=row_index_col)
+            lf = pl.scan_ipc(file_path, row_index_name=row_index_col)
+            df = self._read_ipc_batches(lf.select(row_index_col, *columns), start, length, progress)
         elif suffix == ".edf":
-            df = read_edf(Path(file_path), signal_col, info_col)
-        elif suffix == ".hdf5":
-            raise NotImplementedError("Reading HDF5 files is not yet supported.")
+            df = scan_edf(file_path, signal_col, info_col, start=start, stop=stop, progress=progress).collect()
+        elif suffix == ".hdf5" and self._session is not None:
+            df = self._session.read_combined_data(columns, start, stop, progress)
         elif suffix == ".xlsx":
-            df = pl.read_excel(file_path, columns=columns)
+            lf = pl.read_excel(file_path, columns=columns).lazy().with_row_index(row_index_col)
+            df = lf.select(row_index_col, *columns).slice(start, length).collect()
         else:
             raise NotImplementedError(f"Unsupported file format: {suffix}.")
 
+        if df.is_empty():
+            logger.error(f"No rows found in the selected range (start: {start}, stop: {stop}).")
+            return None
+        return df.rechunk()
+
+    def set_data(self, df: pl.DataFrame, base_section: Section | None = None) -> None:
+        """Show data read with `read_data`. `base_section` can be passed if it was already created from `df`."""
         self.data_model.set_df(df)
-        self._base_section = self.get_base_section()
+        self._base_section = base_section or self.create_base_section(df)
         self.sections.add_section(self._base_section)
+        if self._session is not None:
+            self._add_stored_sections()
         self.set_active_section(self.base_section_index)
         self.has_data = True
         self.sig_new_data.emit()
 
+    def _add_stored_sections(self) -> None:
+        """
+        Recreate the sections stored in the opened results file. Only their processing parameters and results are
+        read here, the processed signal and peaks are read once a section is activated.
+        """
+        if self._session is None:
+            return
+        first_index = self.base_df.item(0, "index")
+        last_index = self.base_df.item(-1, "index")
+        for name in self._session.section_names:
+            stored = self._session.read_section(name)
+            start, stop = stored.global_bounds
+            if start < first_index or stop > last_index:
+                logger.warning(f"Not restoring '{name}', it is not completely inside the loaded rows.")
+                continue
+            data = self.base_df.slice(start - first_index, stop - start + 1)
+            section = Section(data, self.metadata.signal_column, info_column=self.metadata.info_column)
+            section.sampling_rate = stored.processing_parameters.sampling_rate
+            self.sections.add_section(section)
+            self._stored_sections[section] = name
+
+    def _load_stored_section(self, section: Section) -> None:
+        name = self._stored_sections.pop(section, None)
+        if name is None or self._session is None:
+            return
+        stored = self._session.read_section(name)
+        params = stored.processing_parameters
+        is_processed = bool(params.processing_pipeline or params.filter_parameters or params.standardization_parameters)
+        state = self._session.read_section_state(name, section.processed_signal_name, is_processed)
+        section.restore(params, state.processed_signal, state.peaks, state.manual_peak_edits, stored.result)
+        logger.debug(f"Restored '{name}' from '{self._session.file_path.name}'.")
+
+    def _read_ipc_batches(
+        self, lf: pl.LazyFrame, start: int, length: int | None, progress: _t.ProgressCallback | None
+    ) -> pl.DataFrame:
+        # Slices of memory-mapped IPC files are cheap, so the requested range can be read in batches
+        total = lf.select(pl.len()).collect().item()
+        stop = total if length is None else min(start + length, total)
+        batches = [lf.clear().collect()]
+        for batch_start in range(start, stop, _LOAD_BATCH_ROWS):
+            batches.append(lf.slice(batch_start, min(_LOAD_BATCH_ROWS, stop - batch_start)).collect())
+            if progress is not None:
+                progress(min(batch_start + _LOAD_BATCH_ROWS, stop) - start, stop - start)
+        return pl.concat(batches, rechunk=False)
+
+    def _read_csv_batches(
+        self,
+        file_path: Path,
+        columns: list[str] | None,
+        row_index_col: str | None,
+        start: int,
+        length: int | None,
+        progress: _t.ProgressCallback | None,
+    ) -> pl.DataFrame:
+        if file_path.suffix == ".txt":
+            separator = Config.data.text_file_separator
+        elif file_path.suffix == ".tsv":
+            separator = TextFileSeparator.Tab
+        else:
+            separator = TextFileSeparator.Comma
+        # The row index is added before slicing, so it keeps the row position in the file
+        lf = pl.scan_csv(file_path, separator=separator, row_index_name=row_index_col)
+        if columns is not None:
+            lf = lf.select(*([row_index_col] if row_index_col else []), *columns)
+        batches: list[pl.DataFrame] = []
+        n_rows = 0
+        while length is None or n_rows < length:
+            batch_rows = _LOAD_BATCH_ROWS if length is None else min(_LOAD_BATCH_ROWS, length - n_rows)
+            batch = lf.slice(start + n_rows, batch_rows).collect()
+            batches.append(batch)
+            n_rows += batch.height
+            if progress is not None:
+                progress(n_rows, 0)
+            if batch.height < batch_rows:
+                break
+        return pl.concat(batches, rechunk=False)
+
+    def _cache_options(self, suffix: str) -> str:
+        if suffix == ".txt":
+            return f"{suffix}|{Config.data.text_file_separator}"
+        return suffix
+
+    def _get_cached_input_file(self, file_path: Path) -> Path | None:
+        self._file_cache.resize(Config.data.input_cache_size * 1024**2)
+        if file_path.suffix not in _CACHED_FORMATS:
+            return None
+        return self._file_cache.get(file_path, self._cache_options(file_path.suffix))
+
+    def _cache_input_file(self, file_path: Path, df: pl.DataFrame) -> Path | None:
+        return self._file_cache.put(file_path, df, self._cache_options(file_path.suffix))
+
+    def _parse_input_file(self, file_path: Path, progress: _t.ProgressCallback | None = None) -> pl.DataFrame:
+        if file_path.suffix == ".xlsx":
+            return pl.read_excel(file_path)
+        return self._read_csv_batches(file_path, None, None, 0, None, progress).rechunk()
+
     def create_section(self, start: float | int, stop: float | int) -> None:
         if self._metadata is None:
             return
-        data = self.base_df.filter(pl.col("index").is_between(start, stop))
+        # The global index is contiguous, so the rows between `start` and `stop` (inclusive) can be taken as a
+        # zero-copy slice of the base dataframe instead of filtering it
+        first_index = self.base_df.item(0, "index")
+        offset = max(math.ceil(start) - first_index, 0)
+        length = min(math.floor(stop) - first_index, self.base_df.height - 1) - offset + 1
+        data = self.base_df.slice(offset, max(length, 0))
         section = Section(data, self.metadata.signal_column, info_column=self.metadata.info_column)
         self.sections.add_section(section)
 
     def delete_section(self, idx: QtCore.QModelIndex) -> None:
+        self._stored_sections.pop(self.sections.data(idx, QtCore.Qt.ItemDataRole.UserRole), None)
         self.sections.remove_section(idx)
         self.set_active_section(self.base_section_index)
 
+    def get_unlocked_sections(self) -> list[Section]:
+        """All editable sections that aren't locked. Sections stored in a results file are restored first."""
+        for section in self.sections.editable_sections:
+            self._load_stored_section(section)
+        return [section for section in self.sections.editable_sections if not section.is_locked]
+
     def get_complete_result(self) -> CompleteResult:
-        base_df = self.get_base_section().data
+        for section in self.sections.editable_sections:
+            self._load_stored_section(section)
 
         section_results = {s.section_id: s.get_result() for s in self.sections.editable_sections}
-
-        section_dfs: list[pl.DataFrame] = []
-        for s in self.sections.editable_sections:
-            section_df = s.data.with_columns(
-                pl.col("is_peak").cast(pl.Int8),
-                pl.col("is_manual").cast(pl.Int8),
-            )
-            section_dfs.append(section_df)
-
-        combined_section_df = pl.concat(section_dfs)
-        global_df = (
-            base_df.lazy()
-            .update(combined_section_df.lazy(), on=["index", self.metadata.signal_column], how="full")
-            .drop("section_index")
-        )
+        combined_data = CombinedDataAssembler(self.get_base_section(), self.sections.editable_sections)
 
         info_col = self.metadata.info_column
         if info_col == COMBO_BOX_NO_SELECTION:
@@ -291,6 +463,6 @@ class DataController(QtCore.QObject):
 
         return CompleteResult(
             metadata=metadata,
-            global_dataframe=global_df.collect(),
+            combined_data=combined_data,
             section_results=section_results,
         )
@@ -9,6 +9,8 @@ from PySide6 import QtCore, QtGui, QtWidgets
 from .._app_config import Config
 from .._enums import PointSymbols, SVGColors
 from ..gui.graphic_items import ClickableRegionItem, CustomScatterPlotItem, EditingViewBox, TimeAxisItem
+from ..logic.peak_detection import ExtremaIndex
+from ..logic.signal_pyramid import MinMaxPyramid
 from ..utils import make_qbrush, make_qcolor, make_qpen, safe_disconnect
 
 if t.TYPE_CHECKING:
@@ -37,6 +39,10 @@ class PlotController(QtCore.QObject):
         self._setup_plot_data_items()
 
         self.block_clicks = False
+        # Local extrema of the plotted signal, and the sorted x positions of the plotted peaks, used for click-to-add
+        self._extrema_index: ExtremaIndex | None = None
+        self._signal_pyramid: MinMaxPyramid | None = None
+        self._peak_positions: npt.NDArray[np.int32] = np.array([], dtype=np.int32)
 
     def _setup_plot_widgets(self) -> None:
         widget_layout = QtWidgets.QVBoxLayout()
@@ -57,14 +63,19 @@ class PlotController(QtCore.QObject):
             vb = plt_item.getViewBox()
             plt_item.setAxisItems({"top": TimeAxisItem(orientation="top")})
             plt_item.showGrid(x=False, y=True)
-            plt_item.setDownsampling(auto=True)
-            plt_item.setClipToView(True)
             plt_item.addLegend(colCount=2)
             plt_item.addLegend().anchor(itemPos=(0, 1), parentPos=(0, 1), offset=(5, -5))
             plt_item.setMouseEnabled(x=True, y=False)
             vb.enableAutoRange("y", enable=0.99)
             vb.setAutoVisible(y=False)
 
+        # The main signal curve is decimated with its own min / max pyramid, see `_update_visible_signal`
+        self.pw_rate.getPlotItem().setDownsampling(auto=True)
+        self.pw_rate.getPlotItem().setClipToView(True)
+        main_vb = self.pw_main.getPlotItem().getViewBox()
+        main_vb.sigXRangeChanged.connect(self._update_visible_signal)
+        main_vb.sigResized.connect(self._update_visible_signal)
+
         self.pw_main.getPlotItem().getViewBox().setXLink("rate_plot")
 
         self.set_background_color(Config.plot.background_color)
@@ -114,12 +125,10 @@ class PlotController(QtCore.QObject):
         signal = pg.PlotDataItem(
             pen=pen,
             skipFiniteCheck=True,
-            autoDownsample=True,
             name="Signal",
         )
         signal.setCurveClickable(True, width=click_width)
         signal.sigClicked.connect(self._on_curve_clicked)
-        signal.sigPlotChanged.connect(self.set_view_limits)
         self.signal_curve = signal
         self.pw_main.addItem(self.signal_curve)
 
@@ -127,7 +136,6 @@ class PlotController(QtCore.QObject):
         if self.signal_curve is None:
             return
         self.signal_curve.sigClicked.disconnect(self._on_curve_clicked)
-        self.signal_curve.sigPlotChanged.disconnect(self.set_view_limits)
         self.pw_main.removeItem(self.signal_curve)
         self.signal_curve.setParent(None)
         self.signal_curve = None
@@ -197,16 +205,32 @@ class PlotController(QtCore.QObject):
         for plt_item in (self.pw_main.getPlotItem(), self.pw_rate.getPlotItem()):
             plt_item.getAxis("top").setScale(1 / sampling_rate)
 
-    @QtCore.Slot(object)
-    def set_view_limits(self, plt_data_item: pg.PlotDataItem) -> None:
-        if plt_data_item.xData is None or plt_data_item.xData.size == 0:
+    @QtCore.Slot(int)
+    def set_view_limits(self, len_data: int) -> None:
+        if len_data == 0:
             return
-        len_data = plt_data_item.xData.size
         self.pw_main.plotItem.vb.setLimits(xMin=-0.25 * len_data, xMax=1.25 * len_data, maxYRange=1e5, minYRange=0.1)
         self.pw_rate.plotItem.vb.setLimits(xMin=-0.25 * len_data, xMax=1.25 * len_data, maxYRange=1e5, minYRange=0.1)
-        self.pw_main.plotItem.vb.setRange(xRange=(0, len_data), disableAutoRange=False)
+        # The signal curve only holds the data around the visible range, so auto ranging the x axis to its bounds
+        # would keep narrowing the view
+        self.pw_main.plotItem.vb.setRange(xRange=(0, len_data), disableAutoRange=True)
         self.pw_rate.plotItem.vb.setRange(xRange=(0, len_data), disableAutoRange=False)
 
+    def _update_visible_signal(self, *args: t.Any) -> None:
+        """
+        Plot the pyramid level of the signal that matches the current view range and plot width, for the visible range
+        and half of it on either side.
+        """
+        if self.signal_curve is None or self._signal_pyramid is None:
+            return
+        vb = self.pw_main.plotItem.vb
+        x_min, x_max = vb.viewRange()[0]
+        span = x_max - x_min
+        # Twice the range in view, with about one bucket per pixel
+        max_buckets = 2 * max(int(vb.width()), 1)
+        x_data, y_data = self._signal_pyramid.get_view(x_min - span / 2, x_max + span / 2, max_buckets)
+        self.signal_curve.setData(x_data, y_data)
+
     def reset(self) -> None:
         self.pw_main.clear()
         if self.pw_main.plotItem.legend:
@@ -219,6 +243,8 @@ class PlotController(QtCore.QObject):
 
         self.clear_regions()
         self.remove_plot_data_items()
+        self._signal_pyramid = None
+        self._extrema_index = None
         self._setup_plot_data_items()
 
     @QtCore.Slot(bool)
@@ -300,14 +326,33 @@ class PlotController(QtCore.QObject):
         self.hide_region_selector()
         self.toggle_regions(self._show_regions)
 
-    def set_signal_data(self, y_data: npt.NDArray[np.float64] | pl.Series, clear: bool = False) -> None:
+    def set_signal_data(
+        self,
+        y_data: npt.NDArray[np.float64] | pl.Series,
+        clear: bool = False,
+        extrema_index: ExtremaIndex | None = None,
+        signal_pyramid: MinMaxPyramid | None = None,
+    ) -> None:
+        """
+        Plot `y_data` as the main signal. `extrema_index` and `signal_pyramid` should be the signal's precomputed local
+        extrema and min / max pyramid, the ones not given are computed here.
+        """
         if self.signal_curve is None:
             return
         if clear:
             self.signal_curve.clear()
             self.clear_peaks()
 
-        self.signal_curve.setData(y_data)
+        y_values = y_data.to_numpy() if isinstance(y_data, pl.Series) else y_data
+        if signal_pyramid is None:
+            signal_pyramid = MinMaxPyramid.from_signal(y_values)
+        if extrema_index is None:
+            extrema_index = ExtremaIndex.from_signal(y_values)
+        self._signal_pyramid = signal_pyramid
+        self._extrema_index = extrema_index
+
+        self.set_view_limits(signal_pyramid.signal.size)
+        self._update_visible_signal()
 
     def set_rate_data(
         self,
@@ -331,12 +376,14 @@ class PlotController(QtCore.QObject):
         if self.peak_scatter is None:
             return
         self.peak_scatter.setData(x=x_data, y=y_data)
+        self._peak_positions = np.sort(np.asarray(x_data, dtype=np.int32))
 
     @QtCore.Slot()
     def clear_peaks(self) -> None:
         if self.peak_scatter is None:
             return
         self.peak_scatter.clear()
+        self._peak_positions = np.array([], dtype=np.int32)
         if self.rate_curve is not None:
             self.rate_curve.clear()
         # ? Unclear if this is a good way of forcing a redraw
@@ -367,6 +414,9 @@ class PlotController(QtCore.QObject):
         new_x = np.delete(scatter_data["x"], point_index)
         new_y = np.delete(scatter_data["y"], point_index)
         self.peak_scatter.setData(x=new_x, y=new_y)
+        position = np.searchsorted(self._peak_positions, point_x)
+        if position < self._peak_positions.size and self._peak_positions[position] == point_x:
+            self._peak_positions = np.delete(self._peak_positions, position)
 
         self.sig_scatter_data_changed.emit("remove", np.array([point_x], dtype=np.int32))
 
@@ -376,40 +426,26 @@ class PlotController(QtCore.QObject):
         if self.signal_curve is None or self.peak_scatter is None or self.block_clicks:
             return
 
-        click_x = int(ev.pos().x())
+        click_x = ev.pos().x()
         click_y = ev.pos().y()
-        x_data = self.signal_curve.xData
-        y_data = self.signal_curve.yData
-        if x_data is None or y_data is None:
+        if self._signal_pyramid is None or self._extrema_index is None or self._signal_pyramid.signal.size == 0:
             return
+        # The curve only holds the decimated data around the view, the full signal is level 0 of the pyramid
+        y_data = self._signal_pyramid.signal
 
-        scatter_search_radius = Config.plot.click_radius
-
-        left_index = np.searchsorted(x_data, click_x - scatter_search_radius, side="left")
-        right_index = np.searchsorted(x_data, click_x + scatter_search_radius, side="right")
-
-        valid_x = x_data[left_index:right_index]
-        valid_y = y_data[left_index:right_index]
-
-        # Find the index of the nearest extreme point to the click position
-        extreme_index = left_index + np.argmin(np.abs(valid_x - click_x))
-        extreme_value = valid_y[np.argmin(np.abs(valid_x - click_x))]
-
-        # Find the index of the nearest extreme point to the click position in the y direction
-        extreme_index_y = left_index + np.argmin(np.abs(valid_y - click_y))
-        extreme_value_y = valid_y[np.argmin(np.abs(valid_y - click_y))]
-
-        # Use the index of the nearest extreme point in the y direction if it is closer to the click position
-        if np.abs(extreme_value_y - click_y) < np.abs(extreme_value - click_y):
-            extreme_index = extreme_index_y
-            extreme_value = extreme_value_y
+        # Snap to the extremum near the click whose value is closest to the click, or to the clicked sample if there
+        # are no extrema within the click radius. The signal's x values are the sample indices.
+        extreme_index = self._extrema_index.nearest(y_data, click_x, click_y, Config.plot.click_radius)
+        if extreme_index is None:
+            extreme_index = int(np.clip(round(click_x), 0, y_data.size - 1))
 
-        if extreme_index in self.peak_scatter.data["x"]:
+        position = np.searchsorted(self._peak_positions, extreme_index)
+        if position < self._peak_positions.size and self._peak_positions[position] == extreme_index:
             return
+        self._peak_positions = np.insert(self._peak_positions, position, extreme_index)
 
-        x_new, y_new = x_data[extreme_index], extreme_value
-        self.peak_scatter.addPoints(x=x_new, y=y_new)
-        self.sig_scatter_data_changed.emit("add", np.array([x_new], dtype=np.int32))
+        self.peak_scatter.addPoints(x=[extreme_index], y=[y_data[extreme_index]])
+        self.sig_scatter_data_changed.emit("add", np.array([extreme_index], dtype=np.int32))
 
     @QtCore.Slot()
     def remove_peaks_in_selection(self) -> None:
@@ -426,6 +462,7 @@ class PlotController(QtCore.QObject):
         mask = (scatter_x < rx) | (scatter_x > rx + rw) | (scatter_y < ry) | (scatter_y > ry + rh)
 
         self.peak_scatter.setData(x=scatter_x[mask], y=scatter_y[mask])
+        self._peak_positions = np.sort(scatter_x[mask].astype(np.int32))
         self.sig_scatter_data_changed.emit("remove", scatter_x[~mask].astype(np.int32))
         self.remove_selection_rect()
 
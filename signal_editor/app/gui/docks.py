@@ -301,6 +301,10 @@ class ParameterInputsDock(QtWidgets.QDockWidget):
                 _reset_widget(widget)
         elif standardize_method == StandardizationMethod.ZScore:
             self.ui.switch_btn_standardize_rolling_window.setEnabled(True)
+        elif standardize_method == StandardizationMethod.ZScoreRobustRolling:
+            # Always uses a rolling window
+            self.ui.switch_btn_standardize_rolling_window.setChecked(True)
+            self.ui.switch_btn_standardize_rolling_window.setEnabled(False)
         else:
             self.ui.switch_btn_standardize_rolling_window.setChecked(False)
             self.ui.switch_btn_standardize_rolling_window.setEnabled(False)
@@ -529,6 +533,11 @@ class SectionListWidget(QtWidgets.QWidget):
         confirm_cancel_btns.setLayout(confirm_cancel_layout)
         layout.addWidget(confirm_cancel_btns)
 
+        batch_progress_bar = qfw.ProgressBar(self)
+        batch_progress_bar.setVisible(False)
+        layout.addWidget(batch_progress_bar)
+        self.batch_progress_bar = batch_progress_bar
+
         layout.addWidget(self.list_view)
         self.main_layout = layout
         self.setLayout(layout)
@@ -549,5 +558,11 @@ class SectionListDock(QtWidgets.QDockWidget):
         self.btn_confirm = self._widget.btn_confirm
         self.btn_cancel = self._widget.btn_cancel
         self.btn_container = self._widget.btn_container
+        self.batch_progress_bar = self._widget.batch_progress_bar
 
         self.setWidget(self._widget)
+
+    def show_batch_progress(self, n_done: int, n_total: int) -> None:
+        self.batch_progress_bar.setRange(0, n_total)
+        self.batch_progress_bar.setValue(n_done)
+        self.batch_progress_bar.setVisible(n_done < n_total)
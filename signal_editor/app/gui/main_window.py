@@ -1,3 +1,4 @@
+import math
 import os
 
 import pyside_config as qconfig
@@ -11,7 +12,7 @@ from ...ui.ui_main_window import Ui_MainWindow
 from .. import _type_defs as _t
 from .._app_config import Config
 from .._constants import INDEX_COL
-from .._enums import LogLevel
+from .._enums import LoadRangeUnit, LogLevel
 from .dialogs import (
     MetadataDialog,
 )
@@ -146,8 +147,64 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.btn_export_all_results.setIcon(AppIcons.ArrowExportLtr.icon())
         self.btn_export_all_results.clicked.connect(lambda: self.sig_export_requested.emit("hdf5"))
 
+        self._setup_load_range_widgets()
+
         self.stackedWidget.setCurrentIndex(0)
 
+    def _setup_load_range_widgets(self) -> None:
+        line = QtWidgets.QFrame(self.grp_box_required_info)
+        line.setFrameShape(QtWidgets.QFrame.Shape.HLine)
+        line.setFrameShadow(QtWidgets.QFrame.Shadow.Sunken)
+        self.formLayout.addRow(line)
+
+        self.check_box_load_range = qfw.CheckBox("Load only a range", self.grp_box_required_info)
+        self.check_box_load_range.setToolTip("Load only the rows between start and stop instead of the whole file")
+        self.combo_box_load_range_unit = qfw.ComboBox(self.grp_box_required_info)
+        self.combo_box_load_range_unit.setMinimumSize(QtCore.QSize(0, 31))
+        for unit in LoadRangeUnit:
+            self.combo_box_load_range_unit.addItem(unit.name, userData=unit)
+        self.formLayout.addRow(self.check_box_load_range, self.combo_box_load_range_unit)
+
+        self.spin_box_load_range_start = qfw.DoubleSpinBox(self.grp_box_required_info)
+        self.spin_box_load_range_stop = qfw.DoubleSpinBox(self.grp_box_required_info)
+        for label, spin_box in [("Start", self.spin_box_load_range_start), ("Stop", self.spin_box_load_range_stop)]:
+            spin_box.setMinimumSize(QtCore.QSize(0, 31))
+            spin_box.setFrame(False)
+            spin_box.setRange(0, 1e12)
+            self.formLayout.addRow(qfw.BodyLabel(label, self.grp_box_required_info), spin_box)
+
+        self.check_box_load_range.toggled.connect(self._on_load_range_toggled)
+        self.combo_box_load_range_unit.currentIndexChanged.connect(self._on_load_range_unit_changed)
+        self._on_load_range_unit_changed()
+        self._on_load_range_toggled(False)
+
+    @QtCore.Slot(bool)
+    def _on_load_range_toggled(self, checked: bool) -> None:
+        self.combo_box_load_range_unit.setEnabled(checked)
+        self.spin_box_load_range_start.setEnabled(checked)
+        self.spin_box_load_range_stop.setEnabled(checked)
+
+    @QtCore.Slot()
+    def _on_load_range_unit_changed(self) -> None:
+        is_seconds = self.combo_box_load_range_unit.currentData() == LoadRangeUnit.Seconds
+        for spin_box in (self.spin_box_load_range_start, self.spin_box_load_range_stop):
+            spin_box.setDecimals(3 if is_seconds else 0)
+            spin_box.setSuffix(" s" if is_seconds else "")
+
+    def get_load_range(self, sampling_rate: int) -> tuple[int, int | None]:
+        """
+        Row range `(start, stop)` selected on the import page, with `stop` being exclusive. Returns `(0, None)` if the
+        whole file should be loaded. Time values are converted to rows using `sampling_rate`, keeping every row inside
+        the closed interval `[start, stop]`.
+        """
+        if not self.check_box_load_range.isChecked():
+            return 0, None
+        start = self.spin_box_load_range_start.value()
+        stop = self.spin_box_load_range_stop.value()
+        if self.combo_box_load_range_unit.currentData() == LoadRangeUnit.Seconds:
+            return math.ceil(start * sampling_rate), math.floor(stop * sampling_rate) + 1
+        return int(start), int(stop) + 1
+
     def _setup_docks(self) -> None:  # sourcery skip: extract-duplicate-method
         dwa = QtCore.Qt.DockWidgetArea
 
@@ -189,11 +246,36 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.action_export_to_xlsx = qfw.Action(AppIcons.ArrowExportLtr.icon(), "Export to XLSX")
         self.action_export_to_hdf5 = qfw.Action(AppIcons.ArrowExportLtr.icon(), "Export to HDF5")
 
+        self.action_undo_processing = QtGui.QAction(AppIcons.ArrowPrevious.icon(), "Undo Processing Step", self)
+        self.action_undo_processing.setShortcut(QtGui.QKeySequence.StandardKey.Undo)
+        self.action_undo_processing.setEnabled(False)
+        self.action_redo_processing = QtGui.QAction(AppIcons.ArrowNext.icon(), "Redo Processing Step", self)
+        self.action_redo_processing.setShortcut(QtGui.QKeySequence.StandardKey.Redo)
+        self.action_redo_processing.setEnabled(False)
+
+        self.action_cancel_loading = QtGui.QAction(AppIcons.Dismiss.icon(), "Cancel Loading", self)
+        self.action_cancel_loading.setShortcut(QtGui.QKeySequence.StandardKey.Cancel)
+        self.action_cancel_loading.setEnabled(False)
+        self.addAction(self.action_cancel_loading)
+
+        self.action_process_all_sections = QtGui.QAction(AppIcons.PlayCircle.icon(), "Process All Sections", self)
+        self.action_process_all_sections.setToolTip(
+            "Apply the processing steps and peak detection of the active section to all unlocked sections"
+        )
+        self.action_cancel_batch_processing = QtGui.QAction(AppIcons.Dismiss.icon(), "Cancel Batch Processing", self)
+        self.action_cancel_batch_processing.setEnabled(False)
+
         self.action_toggle_auto_scaling.setChecked(True)
 
     def _setup_toolbars(self) -> None:
         self.tool_bar_editing = self._setup_toolbar(
-            "tool_bar_editing", [self.action_toggle_auto_scaling, self.action_show_section_overview]
+            "tool_bar_editing",
+            [
+                self.action_toggle_auto_scaling,
+                self.action_show_section_overview,
+                self.action_undo_processing,
+                self.action_redo_processing,
+            ],
         )
 
         self.tool_bar_help = self._setup_toolbar(
@@ -204,7 +286,13 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             [self.action_create_new_section, self.action_remove_section, self.action_mark_section_done]
         )
         self.dock_sections.command_bar.addHiddenActions(
-            [self.action_unlock_section, self.action_show_section_summary, self.action_show_section_overview]
+            [
+                self.action_unlock_section,
+                self.action_show_section_summary,
+                self.action_show_section_overview,
+                self.action_process_all_sections,
+                self.action_cancel_batch_processing,
+            ]
         )
 
         self.command_bar_section_list = self.dock_sections.command_bar
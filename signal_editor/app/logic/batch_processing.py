@@ -0,0 +1,176 @@
+import concurrent.futures as cf
+import multiprocessing as mp
+import os
+import typing as t
+
+import attrs
+import numpy as np
+import numpy.typing as npt
+import polars as pl
+
+from .. import _type_defs as _t
+from .._enums import PeakDetectionMethod, PreprocessPipeline, StandardizationMethod
+from .peak_detection import find_peaks
+from .processing import apply_cleaning_pipeline, filter_signal, standardize_signal
+
+if t.TYPE_CHECKING:
+    from .section import ProcessingParameters
+
+
+def _none_if_missing(value: t.Any) -> t.Any:
+    return None if value in {None, "None", ""} else value
+
+
+@attrs.frozen
+class ProcessingRecipe:
+    """
+    The processing steps of a section that can be re-applied to the raw signal of any other section: either a
+    cleaning pipeline or a list of custom filters, followed by an optional standardization and peak detection.
+    """
+
+    processing_pipeline: PreprocessPipeline | None = attrs.field(default=None)
+    filter_parameters: tuple[_t.SignalFilterParameters, ...] = attrs.field(default=(), converter=tuple)
+    standardization_parameters: _t.StandardizationParameters | None = attrs.field(default=None)
+    peak_detection_method: PeakDetectionMethod | None = attrs.field(default=None)
+    peak_detection_method_parameters: _t.PeakDetectionMethodParameters | None = attrs.field(default=None)
+
+    @classmethod
+    def from_parameters(cls, params: "ProcessingParameters", filter_stacking: bool = True) -> "ProcessingRecipe":
+        """
+        Create the recipe from the processing parameters of a section. The stored filter parameters of a pipeline
+        aren't replayed, the pipeline itself is. Without filter stacking, each custom filter was applied to the raw
+        signal, so only the last one is kept.
+        """
+        filters = [] if params.processing_pipeline is not None else [p for p in params.filter_parameters if p]
+        return cls(
+            processing_pipeline=params.processing_pipeline,
+            filter_parameters=filters if filter_stacking else filters[-1:],
+            standardization_parameters=params.standardization_parameters,
+            peak_detection_method=params.peak_detection_method,
+            peak_detection_method_parameters=params.peak_detection_method_parameters,
+        )
+
+    @classmethod
+    def from_dict(cls, params: _t.ProcessingParametersDict, filter_stacking: bool = True) -> "ProcessingRecipe":
+        """
+        Create the recipe from a dictionary created by `ProcessingParameters.to_dict`, e.g. one that was saved as
+        JSON. Missing values may be None or the string "None".
+        """
+        pipeline = _none_if_missing(params.get("processing_pipeline"))
+        peak_method = _none_if_missing(params.get("peak_detection_method"))
+        std_params = params.get("standardization_parameters")
+        if std_params and (std_method := _none_if_missing(std_params.get("method"))) is not None:
+            std_params = {**std_params, "method": StandardizationMethod(std_method)}
+
+        filters = [] if pipeline is not None else [p for p in params.get("filter_parameters") or [] if p]
+        return cls(
+            processing_pipeline=None if pipeline is None else PreprocessPipeline(pipeline),
+            filter_parameters=filters if filter_stacking else filters[-1:],
+            standardization_parameters=std_params or None,
+            peak_detection_method=None if peak_method is None else PeakDetectionMethod(peak_method),
+            peak_detection_method_parameters=params.get("peak_detection_method_parameters") or None,
+        )
+
+    @property
+    def is_empty(self) -> bool:
+        return (
+            self.processing_pipeline is None
+            and not self.filter_parameters
+            and self.standardization_parameters is None
+            and self.peak_detection_method is None
+        )
+
+
+@attrs.frozen
+class RecipeResult:
+    """
+    Result of applying a `ProcessingRecipe` to a signal. `processed_signal` is None if the recipe doesn't change the
+    signal, `filter_parameters` are the parameters of the applied filters (as `Section.filter_signal` records them).
+    """
+
+    processed_signal: npt.NDArray[np.float64] | None = attrs.field()
+    filter_parameters: list[_t.SignalFilterParameters] = attrs.field()
+    peaks: npt.NDArray[np.int32] = attrs.field()
+
+
+def apply_recipe(
+    sig: npt.NDArray[np.float64],
+    sampling_rate: int,
+    recipe: ProcessingRecipe,
+    block_size: int | None = None,
+) -> RecipeResult:
+    """
+    Apply all steps of `recipe` to `sig`, in the same order and with the same functions the section methods use.
+    Doesn't depend on any Qt or app state, so it can run in a worker process.
+    """
+    processed: npt.NDArray[np.float64] | None = None
+    filter_params: list[_t.SignalFilterParameters] = []
+
+    if recipe.processing_pipeline is not None:
+        result = apply_cleaning_pipeline(sig, sampling_rate, recipe.processing_pipeline, block_size)
+        processed = result.cleaned
+        filter_params.append(result.parameters)
+        if result.additional_parameters is not None:
+            filter_params.append(result.additional_parameters)
+    for params in recipe.filter_parameters:
+        processed, applied = filter_signal(
+            sig if processed is None else processed, sampling_rate, block_size=block_size, **dict(params)
+        )
+        filter_params.append(applied)
+
+    if recipe.standardization_parameters is not None:
+        standardized = standardize_signal(
+            pl.Series(sig if processed is None else processed, dtype=pl.Float64),
+            robust=recipe.standardization_parameters.get("robust", False),
+            window_size=recipe.standardization_parameters.get("window_size", None),
+        )
+        processed = (
+            standardized.replace([float("inf"), float("-inf")], None)
+            .fill_nan(None)
+            .fill_null(strategy="backward")
+            .to_numpy()
+        )
+
+    peaks = np.empty(0, dtype=np.int32)
+    if recipe.peak_detection_method is not None:
+        peaks = find_peaks(
+            sig if processed is None else processed,
+            sampling_rate,
+            recipe.peak_detection_method,
+            recipe.peak_detection_method_parameters or {},
+        )
+    return RecipeResult(processed, filter_params, np.asarray(peaks, dtype=np.int32))
+
+
+def run_batch[K](
+    signals: t.Mapping[K, tuple[npt.NDArray[np.float64], int]],
+    recipe: ProcessingRecipe,
+    *,
+    block_size: int | None = None,
+    max_workers: int | None = None,
+) -> t.Iterator[tuple[K, RecipeResult | Exception]]:
+    """
+    Apply `recipe` to each of the `(signal, sampling_rate)` pairs in `signals` in a pool of worker processes, which
+    lets the NeuroKit2 / SciPy code of different signals run in parallel.
+
+    Yields `(key, result)` in order of completion, where `result` is the exception raised while processing the signal
+    if it failed. Closing the iterator early cancels all signals that haven't been started yet.
+    """
+    if not signals:
+        return
+    max_workers = min(max_workers or os.cpu_count() or 1, len(signals))
+    # Worker processes are spawned instead of forked, since forking a process that runs Qt threads isn't safe
+    with cf.ProcessPoolExecutor(max_workers, mp_context=mp.get_context("spawn")) as executor:
+        futures = {
+            executor.submit(apply_recipe, sig, sampling_rate, recipe, block_size): key
+            for key, (sig, sampling_rate) in signals.items()
+        }
+        try:
+            for future in cf.as_completed(futures):
+                try:
+                    yield futures[future], future.result()
+                except Exception as e:
+                    yield futures[future], e
+        finally:
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,69 @@
+import typing as t
+
+import polars as pl
+
+from .._constants import IS_MANUAL_COL, IS_PEAK_COL, SECTION_INDEX_COL
+from .section import Section
+
+# Default number of rows per chunk when iterating over the combined data
+_CHUNK_ROWS: t.Final = 500_000
+
+
+class CombinedDataAssembler:
+    """
+    Combines the base section with the processed signal and peaks of the other sections into a single dataframe
+    covering the whole recording.
+
+    Sections are contiguous row ranges of the base data, so instead of joining on the index, the section columns are
+    copied into the base columns at the offset given by their `global_bounds`. Where sections overlap, the section that
+    comes later in `sections` wins. The result can be created in chunks, so exporters never need the complete
+    dataframe in memory.
+    """
+
+    __slots__ = ("base_section", "sections", "_base_data", "_columns")
+
+    def __init__(self, base_section: Section, sections: t.Sequence[Section]) -> None:
+        self.base_section = base_section
+        self.sections = list(sections)
+        self._base_data = base_section.data.drop(SECTION_INDEX_COL)
+        self._columns = (base_section.processed_signal_name, IS_PEAK_COL, IS_MANUAL_COL)
+
+    @property
+    def height(self) -> int:
+        return self._base_data.height
+
+    @property
+    def schema(self) -> pl.Schema:
+        return self._base_data.schema
+
+    def _section_offsets(self) -> list[tuple[Section, int]]:
+        base_start = self.base_section.global_bounds[0]
+        return [(section, section.global_bounds[0] - base_start) for section in self.sections]
+
+    def _assemble(self, start: int, stop: int, section_offsets: list[tuple[Section, int]]) -> pl.DataFrame:
+        chunk = self._base_data.slice(start, stop - start)
+        columns = {name: chunk.get_column(name).to_numpy().copy() for name in self._columns}
+
+        for section, offset in section_offsets:
+            lo = max(start, offset)
+            hi = min(stop, offset + section.data.height)
+            if lo >= hi:
+                continue
+            section_chunk = section.data.slice(lo - offset, hi - lo)
+            for name, values in columns.items():
+                values[lo - start : hi - start] = section_chunk.get_column(name).to_numpy()
+
+        return chunk.with_columns(pl.Series(name, values, chunk.schema[name]) for name, values in columns.items())
+
+    def iter_chunks(self, chunk_rows: int = _CHUNK_ROWS) -> t.Iterator[pl.DataFrame]:
+        """Create the combined dataframe in consecutive chunks of (at most) `chunk_rows` rows."""
+        section_offsets = self._section_offsets()
+        if self.height == 0:
+            yield self._base_data.clear()
+            return
+        for start in range(0, self.height, chunk_rows):
+            yield self._assemble(start, min(start + chunk_rows, self.height), section_offsets)
+
+    def collect(self) -> pl.DataFrame:
+        """Create the complete combined dataframe."""
+        return self._assemble(0, self.height, self._section_offsets())
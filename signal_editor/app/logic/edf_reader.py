@@ -0,0 +1,200 @@
+import typing as t
+from pathlib import Path
+
+import attrs
+import numpy as np
+import numpy.typing as npt
+from loguru import logger
+
+EDF_ANNOTATIONS_LABEL: t.Final = "EDF Annotations"
+
+# Same unit handling as `mne.io.read_raw_edf`, so values match the ones the MNE based reader produced
+_UNIT_SCALING: t.Final = {"μV": 1e-6, "µV": 1e-6, "uV": 1e-6, "mV": 1e-3}
+
+# Approximate number of bytes of data records read at once
+_BLOCK_BYTES: t.Final = 8 * 1024**2
+
+
+def _header_fields(raw: bytes, n_signals: int, width: int) -> tuple[list[str], bytes]:
+    size = n_signals * width
+    fields = [raw[i : i + width].decode("latin-1").strip() for i in range(0, size, width)]
+    return fields, raw[size:]
+
+
+@attrs.frozen
+class EDFSignalHeader:
+    label: str
+    unit: str
+    physical_min: float
+    physical_max: float
+    digital_min: float
+    digital_max: float
+    samples_per_record: int
+
+    @property
+    def calibration(self) -> tuple[float, float]:
+        """Gain and offset that convert the stored digital values to physical values (in SI units for voltages)."""
+        digital_range = self.digital_max - self.digital_min
+        physical_range = self.physical_max - self.physical_min
+        if not np.isfinite(digital_range) or digital_range == 0:
+            digital_range = 1.0
+        if physical_range == 0:
+            physical_range = 1.0
+        cal = physical_range / digital_range
+        unit_scale = _UNIT_SCALING.get(self.unit, 1.0)
+        return cal * unit_scale, (self.physical_min - self.digital_min * cal) * unit_scale
+
+
+@attrs.frozen
+class EDFHeader:
+    header_bytes: int
+    n_records: int
+    record_duration: float
+    signals: tuple[EDFSignalHeader, ...]
+
+    @property
+    def samples_per_record(self) -> int:
+        return sum(sig.samples_per_record for sig in self.signals)
+
+    @property
+    def record_offsets(self) -> list[int]:
+        """Position of the first sample of each signal inside a data record."""
+        offsets = [0]
+        for sig in self.signals[:-1]:
+            offsets.append(offsets[-1] + sig.samples_per_record)
+        return offsets
+
+    @property
+    def max_samples_per_record(self) -> int:
+        return max(
+            (sig.samples_per_record for sig in self.signals if sig.label != EDF_ANNOTATIONS_LABEL),
+            default=0,
+        )
+
+    def channel_index(self, label: str) -> int:
+        """Index of the signal with the given label. Raises `KeyError` if the label is missing or not unique."""
+        matches = [i for i, sig in enumerate(self.signals) if sig.label == label]
+        if len(matches) != 1:
+            raise KeyError(label)
+        return matches[0]
+
+
+def read_edf_header(file_path: Path) -> EDFHeader:
+    """
+    Parse the fixed and per-signal parts of an EDF(+) header.
+
+    If the number of data records in the header is missing or doesn't match the file size (e.g. the recording wasn't
+    stopped properly), the number of complete records in the file is used instead.
+    """
+    with open(file_path, "rb") as f:
+        fixed = f.read(256)
+        if len(fixed) < 256:
+            raise ValueError(f"File '{file_path}' is too short to be a valid EDF file.")
+        header_bytes = int(fixed[184:192].decode("latin-1").strip())
+        n_records = int(fixed[236:244].decode("latin-1").strip() or -1)
+        record_duration = float(fixed[244:252].decode("latin-1").strip() or 0) or 1.0
+        n_signals = int(fixed[252:256].decode("latin-1").strip())
+
+        raw = f.read(n_signals * 256)
+        labels, raw = _header_fields(raw, n_signals, 16)
+        _, raw = _header_fields(raw, n_signals, 80)  # transducer type
+        units, raw = _header_fields(raw, n_signals, 8)
+        physical_min, raw = _header_fields(raw, n_signals, 8)
+        physical_max, raw = _header_fields(raw, n_signals, 8)
+        digital_min, raw = _header_fields(raw, n_signals, 8)
+        digital_max, raw = _header_fields(raw, n_signals, 8)
+        _, raw = _header_fields(raw, n_signals, 80)  # prefiltering
+        samples_per_record, raw = _header_fields(raw, n_signals, 8)
+
+        file_size = f.seek(0, 2)
+
+    signals = tuple(
+        EDFSignalHeader(
+            label=labels[i],
+            unit=units[i],
+            physical_min=float(physical_min[i]),
+            physical_max=float(physical_max[i]),
+            digital_min=float(digital_min[i]),
+            digital_max=float(digital_max[i]),
+            samples_per_record=int(samples_per_record[i]),
+        )
+        for i in range(n_signals)
+    )
+    record_bytes = 2 * sum(sig.samples_per_record for sig in signals)
+    complete_records = (file_size - header_bytes) // record_bytes if record_bytes else 0
+    if n_records != complete_records:
+        logger.warning(
+            f"Number of data records in the header ({n_records}) doesn't match the file size, using the number of "
+            f"complete records in the file ({complete_records}) instead."
+        )
+        n_records = complete_records
+
+    return EDFHeader(header_bytes, n_records, record_duration, signals)
+
+
+class EDFRecordReader:
+    """
+    Reads the samples of single signals from the memory-mapped data records of an EDF file.
+
+    Only the records overlapping the requested sample range are touched, so reading a block of a signal costs memory
+    proportional to the block, not to the whole recording.
+    """
+
+    __slots__ = ("header", "_records")
+
+    def __init__(self, file_path: Path, header: EDFHeader | None = None) -> None:
+        self.header = header or read_edf_header(file_path)
+        self._records = np.memmap(
+            file_path,
+            dtype="<i2",
+            mode="r",
+            offset=self.header.header_bytes,
+            shape=(self.header.n_records, self.header.samples_per_record),
+        )
+
+    def n_samples(self, channel: int) -> int:
+        return self.header.n_records * self.header.signals[channel].samples_per_record
+
+    def block_size(self, channel: int) -> int:
+        """Number of samples of `channel` that make up roughly `_BLOCK_BYTES` worth of data records."""
+        spr = self.header.signals[channel].samples_per_record
+        record_bytes = 2 * self.header.samples_per_record
+        return max(_BLOCK_BYTES // record_bytes, 1) * spr
+
+    def read(self, channel: int, start: int, stop: int) -> npt.NDArray[np.float64]:
+        """Physical values of the samples `start:stop` of `channel`."""
+        sig = self.header.signals[channel]
+        spr = sig.samples_per_record
+        stop = min(stop, self.n_samples(channel))
+        if stop <= start:
+            return np.empty(0, dtype=np.float64)
+        first_record = start // spr
+        last_record = -(-stop // spr)
+        col = self.header.record_offsets[channel]
+        digital = self._records[first_record:last_record, col : col + spr].ravel()
+        digital = digital[start - first_record * spr : stop - first_record * spr]
+
+        gain, offset = sig.calibration
+        out = digital.astype(np.float64)
+        out *= gain
+        out += offset
+        return out
+
+    def find_last_row(self, channels: t.Sequence[int], start: int, stop: int) -> int:
+        """
+        Position of the last row in `start:stop` where none of `channels` is zero, or `start - 1` if there is no such
+        row. The data is scanned backwards from `stop` one block at a time, so a long run of trailing zeros is the only
+        part of the file that gets read.
+        """
+        block = min(self.block_size(ch) for ch in channels)
+        block_stop = stop
+        while block_stop > start:
+            block_start = max(block_stop - block, start)
+            keep = np.ones(block_stop - block_start, dtype=np.bool_)
+            for ch in channels:
+                keep &= self.read(ch, block_start, block_stop) != 0
+            non_zero = np.flatnonzero(keep)
+            if non_zero.size:
+                return block_start + int(non_zero[-1])
+            block_stop = block_start
+        return start - 1
@@ -0,0 +1,324 @@
+import collections
+import contextlib
+import hashlib
+import json
+import time
+import typing as t
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+import polars as pl
+from loguru import logger
+
+_HASH_CHUNK_SIZE: t.Final = 8 * 1024**2
+_INDEX_FILE_NAME: t.Final = "index.json"
+
+
+class _CacheEntry(t.TypedDict):
+    nbytes: int
+    last_used: float
+
+
+class _SourceRecord(t.TypedDict):
+    mtime_ns: int
+    size: int
+    key: str
+
+
+class _LRUFileCache:
+    """
+    Base class of the caches that store each entry as a file in `cache_dir`, together with a JSON index of the size and
+    last use of every entry. If the total size of the entries exceeds `max_size` bytes, the least recently used ones
+    are removed. A `max_size` of 0 disables the cache.
+
+    Subclasses supply the file suffix of the entries, read and write the entries themselves, and can store additional
+    data in the index.
+    """
+
+    __slots__ = ("cache_dir", "max_size", "_entries")
+
+    _entry_suffix: t.ClassVar[str]
+    _description: t.ClassVar[str]
+
+    def __init__(self, cache_dir: Path | str, max_size: int) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self._entries: dict[str, _CacheEntry] = {}
+        self._read_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @property
+    def total_size(self) -> int:
+        return sum(entry["nbytes"] for entry in self._entries.values())
+
+    def resize(self, max_size: int) -> None:
+        """Change the maximum size of the cache, removing the least recently used entries that no longer fit."""
+        if max_size == self.max_size:
+            return
+        self.max_size = max_size
+        if self.enabled and self.total_size > max_size:
+            self._evict()
+            self._write_index()
+
+    def _index_path(self) -> Path:
+        return self.cache_dir / _INDEX_FILE_NAME
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{self._entry_suffix}"
+
+    def _load_index_data(self, index: dict[str, t.Any]) -> None:
+        """Restore the additional data a subclass stores in the index."""
+
+    def _index_data(self) -> dict[str, t.Any]:
+        """Additional data a subclass stores in the index."""
+        return {}
+
+    def _read_index(self) -> None:
+        try:
+            index = json.loads(self._index_path().read_text(encoding="utf-8"))
+            self._entries = index["entries"]
+            self._load_index_data(index)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.warning(f"Could not read the {self._description} index in '{self.cache_dir}', starting a new one.")
+            self._entries = {}
+            self._load_index_data({})
+
+        # Drop entries whose file was deleted outside of the cache
+        for key in [key for key in self._entries if not self._entry_path(key).is_file()]:
+            del self._entries[key]
+
+    def _write_index(self) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        index = {"entries": self._entries, **self._index_data()}
+        tmp_path = self._index_path().with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(index), encoding="utf-8")
+        tmp_path.replace(self._index_path())
+
+    def _touch(self, key: str) -> None:
+        self._entries[key]["last_used"] = time.time()
+        self._write_index()
+
+    def _add_entry(self, key: str) -> None:
+        """Register the file that was just written for `key`, and make room for it."""
+        self._entries[key] = _CacheEntry(nbytes=self._entry_path(key).stat().st_size, last_used=time.time())
+        self._evict(keep=key)
+        self._write_index()
+
+    def clear(self) -> None:
+        for key in list(self._entries):
+            self._remove(key)
+        self._write_index()
+
+    def _forget(self, key: str) -> None:
+        """Called when the entry for `key` is removed, to drop anything else a subclass keeps for it."""
+
+    def _remove(self, key: str) -> None:
+        del self._entries[key]
+        self._forget(key)
+        with contextlib.suppress(OSError):
+            self._entry_path(key).unlink(missing_ok=True)
+
+    def _evict(self, keep: str | None = None) -> None:
+        total_size = self.total_size
+        for key in sorted(self._entries, key=lambda k: self._entries[k]["last_used"]):
+            if total_size <= self.max_size:
+                break
+            if key == keep:
+                continue
+            total_size -= self._entries[key]["nbytes"]
+            self._remove(key)
+            logger.debug(f"Removed entry '{key}' from the {self._description}.")
+
+
+class InputFileCache(_LRUFileCache):
+    """
+    On-disk cache of parsed input files, stored as uncompressed Arrow IPC files that can be memory-mapped.
+
+    Entries are keyed by a hash of the file content together with the options used to parse it, so copies of a file
+    share a single entry. The hash of each source path is remembered along with its modification time and size, and is
+    only recomputed once either of those changes. If the total size of the cached files exceeds `max_size` bytes, the
+    least recently used entries are removed.
+    """
+
+    __slots__ = ("_sources",)
+
+    _entry_suffix = ".arrow"
+    _description = "input file cache"
+
+    def __init__(self, cache_dir: Path | str, max_size: int) -> None:
+        self._sources: dict[str, _SourceRecord] = {}
+        super().__init__(cache_dir, max_size)
+
+    def _load_index_data(self, index: dict[str, t.Any]) -> None:
+        self._sources = index.get("sources", {})
+
+    def _index_data(self) -> dict[str, t.Any]:
+        return {"sources": self._sources}
+
+    def _forget(self, key: str) -> None:
+        # Sources pointing at a removed entry have to be hashed again
+        self._sources = {k: v for k, v in self._sources.items() if v["key"] != key}
+
+    def _source_id(self, file_path: Path, options: str) -> str:
+        return f"{file_path.resolve().as_posix()}|{options}"
+
+    def _key_for(self, file_path: Path, options: str) -> str:
+        """Content hash of `file_path` and `options`, reusing the stored hash if the file hasn't changed."""
+        stat = file_path.stat()
+        source_id = self._source_id(file_path, options)
+        record = self._sources.get(source_id)
+        if record is not None and record["mtime_ns"] == stat.st_mtime_ns and record["size"] == stat.st_size:
+            return record["key"]
+
+        hasher = hashlib.blake2b(options.encode(), digest_size=16)
+        with open(file_path, "rb") as f:
+            while chunk := f.read(_HASH_CHUNK_SIZE):
+                hasher.update(chunk)
+        key = hasher.hexdigest()
+        self._sources[source_id] = _SourceRecord(mtime_ns=stat.st_mtime_ns, size=stat.st_size, key=key)
+
+        # The file was modified, so the entry for its previous contents is stale unless another file shares it
+        if record is not None and record["key"] != key and record["key"] in self._entries:
+            if all(source["key"] != record["key"] for source in self._sources.values()):
+                self._remove(record["key"])
+        self._write_index()
+        return key
+
+    def get(self, file_path: Path, options: str = "") -> Path | None:
+        """
+        Path to the cached Arrow IPC file for the current contents of `file_path`, or `None` if there is no entry.
+        """
+        if not self.enabled:
+            return None
+        key = self._key_for(file_path, options)
+        if key not in self._entries:
+            return None
+        self._touch(key)
+        logger.debug(f"Using cached copy of '{file_path.name}'.")
+        return self._entry_path(key)
+
+    def put(self, file_path: Path, df: pl.DataFrame, options: str = "") -> Path | None:
+        """
+        Store the parsed contents of `file_path`. Returns the path to the cached Arrow IPC file, or `None` if the
+        cache is disabled or the entry couldn't be written.
+        """
+        if not self.enabled:
+            return None
+        key = self._key_for(file_path, options)
+        entry_path = self._entry_path(key)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            df.write_ipc(entry_path, compression="uncompressed")
+        except OSError as e:
+            logger.warning(f"Could not write '{file_path.name}' to the input file cache: {e}")
+            return None
+
+        self._add_entry(key)
+        return entry_path
+
+    def clear(self) -> None:
+        self._sources.clear()
+        super().clear()
+
+
+def signal_digest(sig: npt.NDArray[np.generic]) -> str:
+    """Hash of the contents, data type and shape of `sig`."""
+    sig = np.ascontiguousarray(sig)
+    hasher = hashlib.blake2b(f"{sig.dtype.str}{sig.shape}".encode(), digest_size=16)
+    hasher.update(memoryview(sig).cast("B"))
+    return hasher.hexdigest()
+
+
+class PeakDetectionCache(_LRUFileCache):
+    """
+    Cache of peak detection results, held in memory and stored on disk as `.npy` files.
+
+    Entries are keyed by a hash of the signal together with the sampling rate, the detection method and its
+    (canonicalized) parameters, so running a detection again on an unchanged signal returns the stored peaks. The most
+    recently used results are kept in memory up to `memory_size` bytes. If the total size of the files on disk exceeds
+    `max_size` bytes, the least recently used entries are removed. A `max_size` of 0 disables the cache.
+    """
+
+    __slots__ = ("memory_size", "_memory")
+
+    _entry_suffix = ".npy"
+    _description = "peak detection cache"
+
+    def __init__(self, cache_dir: Path | str, max_size: int, memory_size: int = 64 * 1024**2) -> None:
+        self.memory_size = memory_size
+        self._memory: collections.OrderedDict[str, npt.NDArray[np.int32]] = collections.OrderedDict()
+        super().__init__(cache_dir, max_size)
+
+    @staticmethod
+    def key(
+        signal_hash: str,
+        sampling_rate: int,
+        method: str,
+        method_parameters: t.Mapping[str, t.Any],
+        **options: t.Any,
+    ) -> str:
+        """
+        Cache key for the peaks detected in the signal with hash `signal_hash`. Parameters are compared by value, so
+        the order of the keys doesn't matter. `options` are any other settings that change the result.
+        """
+        config = {"sampling_rate": sampling_rate, "method": str(method), "parameters": method_parameters, **options}
+        hasher = hashlib.blake2b(signal_hash.encode(), digest_size=16)
+        hasher.update(json.dumps(config, sort_keys=True, default=str).encode())
+        return hasher.hexdigest()
+
+    def _forget(self, key: str) -> None:
+        self._memory.pop(key, None)
+
+    def _remember(self, key: str, peaks: npt.NDArray[np.int32]) -> None:
+        self._memory[key] = peaks
+        self._memory.move_to_end(key)
+        total_size = sum(value.nbytes for value in self._memory.values())
+        while total_size > self.memory_size and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            total_size -= evicted.nbytes
+
+    def get(self, key: str) -> npt.NDArray[np.int32] | None:
+        """The stored peaks for `key`, or `None` if there is no entry."""
+        if not self.enabled:
+            return None
+        peaks = self._memory.get(key)
+        if peaks is None and key in self._entries:
+            try:
+                peaks = np.load(self._entry_path(key))
+            except (OSError, ValueError):
+                self._remove(key)
+                self._write_index()
+                return None
+            peaks.setflags(write=False)
+        if peaks is None:
+            return None
+
+        self._remember(key, peaks)
+        if key in self._entries:
+            self._touch(key)
+        return peaks.copy()
+
+    def put(self, key: str, peaks: npt.NDArray[np.int32]) -> None:
+        if not self.enabled:
+            return
+        peaks = np.array(peaks, dtype=np.int32)
+        peaks.setflags(write=False)
+        self._remember(key, peaks)
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            np.save(self._entry_path(key), peaks)
+        except OSError as e:
+            logger.warning(f"Could not write to the peak detection cache: {e}")
+            return
+        self._add_entry(key)
+
+    def clear(self) -> None:
+        self._memory.clear()
+        super().clear()
@@ -5,12 +5,20 @@ from pathlib import Path
 import mne.io
 import polars as pl
 import polars.selectors as cs
+from polars.io.plugins import register_io_source
 import tables as tb
 from loguru import logger
 
 from .. import _type_defs as _t
-from .._constants import COMBO_BOX_NO_SELECTION
-from .._enums import PeakDetectionMethod
+from .._constants import COMBO_BOX_NO_SELECTION, INDEX_COL
+from .._enums import HDF5Compression, PeakDetectionMethod, TextFileSeparator
+from .edf_reader import EDFRecordReader, read_edf_header
+
+if t.TYPE_CHECKING:
+    from .section import DetailedSectionResult, SectionID
+
+# Number of rows converted and appended to a HDF5 table at once
+_WRITE_BATCH_ROWS: t.Final = 500_000
 
 
 def _infer_time_column(lf: pl.LazyFrame, contains: t.Sequence[str] | None = None) -> list[str]:
@@ -126,17 +134,15 @@ def detect_sampling_rate(
     return lf.filter(pl.col(time_column).is_between(start_val, target, closed)).collect().height
 
 
-def read_edf(
+def _read_edf_mne(
     file_path: Path,
     data_channel: str,
-    info_channel: str | None = None,
+    info_channel: str,
     *,
     start: int = 0,
     stop: int | None = None,
     filter_all_zeros: bool = True,
 ) -> pl.DataFrame:
-    if info_channel is None:
-        info_channel = COMBO_BOX_NO_SELECTION
     raw_edf = mne.io.read_raw_edf(file_path, include=[data_channel, info_channel])
     channel_names: list[str] = raw_edf.ch_names  # type: ignore
     data = raw_edf.get_data(start=start, stop=stop).squeeze()  # type: ignore
@@ -160,75 +166,346 @@ def read_edf(
     return out.with_row_index(offset=start)
 
 
-@logger.catch
-def write_hdf5(file_path: Path, data: _t.CompleteResultDict) -> None:
-    fp = file_path.resolve().as_posix()
-    with tb.open_file(fp, "w", title=f"Results_{file_path.stem}") as h5f:
-        # Root level metadata
-        for k, v in data["metadata"].items():
-            h5f.set_node_attr(h5f.root, k, v)
+def scan_edf(
+    file_path: Path,
+    data_channel: str,
+    info_channel: str | None = None,
+    *,
+    start: int = 0,
+    stop: int | None = None,
+    filter_all_zeros: bool = True,
+    progress: _t.ProgressCallback | None = None,
+) -> pl.LazyFrame:
+    """
+    Lazily read one or two channels of an EDF file.
 
-        h5f.create_table(
-            h5f.root, name="combined_data", title="Combined Section Dataframe", obj=data["global_dataframe"]
-        )
+    The data records are memory-mapped and converted to physical values one block at a time, with every block becoming
+    a separate chunk of the resulting frame. Only the channels that end up in the query are read, and reading stops
+    once the requested number of rows is reached.
 
-        section_results = h5f.create_group(h5f.root, "section_results", "Results by Section")
+    Parameters
+    ----------
+    file_path : Path
+        Path to the EDF file.
+    data_channel : str
+        Name of the channel containing the signal.
+    info_channel : str, optional
+        Name of an additional channel to read alongside the signal, by default None
+    start : int, optional
+        Sample position to start reading from, by default 0
+    stop : int | None, optional
+        Sample position to stop reading at (exclusive), by default None (read until the end of the recording)
+    filter_all_zeros : bool, optional
+        Whether to remove rows containing zeros, by default True. Without an info channel, only the trailing run of
+        zeros is removed, which is found by scanning the data records backwards from the end of the file. With an info
+        channel, every row where either channel is zero is removed.
+    progress : ProgressCallback, optional
+        Called after each block with the number of samples read so far and the total number of samples to read, by
+        default None
 
-        for section_id, section_data in data["section_results"].items():
-            section_group = h5f.create_group(section_results, section_id, f"Results for {section_id.pretty_name()}")
+    Returns
+    -------
+    pl.LazyFrame
+        A lazy frame with the columns `index` (starting at `start`), `data_channel` and, if given, `info_channel`.
 
-            h5f.create_table(
-                section_group, name="peak_result", obj=section_data["section_result"]["peak_data"], title="Peak Results"
-            )
-            h5f.create_table(
-                section_group, name="rate_result", obj=section_data["section_result"]["rate_data"], title="Rate Results"
-            )
+    Notes
+    -----
+    Files where the selected channels are sampled at a lower rate than the fastest channel in the file are read
+    with `mne.io.read_raw_edf` instead, since MNE resamples those channels to the highest sampling rate.
+    """
+    if info_channel is None:
+        info_channel = COMBO_BOX_NO_SELECTION
+    channel_names = [data_channel] if info_channel == COMBO_BOX_NO_SELECTION else [data_channel, info_channel]
+
+    header = read_edf_header(file_path)
+    try:
+        channels = [header.channel_index(name) for name in channel_names]
+    except KeyError:
+        channels = []
+    if not channels or any(header.signals[ch].samples_per_record != header.max_samples_per_record for ch in channels):
+        logger.info("Selected EDF channels can't be read directly, falling back to MNE.")
+        return _read_edf_mne(
+            file_path, data_channel, info_channel, start=start, stop=stop, filter_all_zeros=filter_all_zeros
+        ).lazy()
+
+    reader = EDFRecordReader(file_path, header)
+    n_samples = reader.n_samples(channels[0])
+    stop = n_samples if stop is None else min(stop, n_samples)
+    if filter_all_zeros:
+        last_row = reader.find_last_row(channels, start, stop)
+        if start <= last_row < stop - 1:
+            logger.info(f"Found section of continuous zeros from row {last_row + 1} to the end of the column.")
+            stop = last_row + 1
+        else:
+            logger.info("No section of continuous zeros found, keeping all rows.")
+    filter_rows = filter_all_zeros and len(channels) > 1
+
+    schema = {INDEX_COL: pl.UInt32, **{name: pl.Float64 for name in channel_names}}
+
+    def read_blocks(
+        with_columns: list[str] | None, predicate: pl.Expr | None, n_rows: int | None, batch_size: int | None
+    ) -> t.Iterator[pl.DataFrame]:
+        needed = set(channel_names) if filter_rows or predicate is not None else set(with_columns or channel_names)
+        # The rows come from the decoded samples, so a query that only needs the index still reads one channel
+        needed = needed.intersection(channel_names) or {data_channel}
+        block = batch_size or reader.block_size(channels[0])
+        next_index = start
+        rows_left = n_rows
+        # Polars expects at least one batch, even if it is empty
+        yield pl.DataFrame(schema=schema).select(with_columns or pl.all())
+        for block_start in range(start, stop, block):
+            if rows_left is not None and rows_left <= 0:
+                break
+            block_stop = min(block_start + block, stop)
+            columns = [
+                pl.Series(name, reader.read(ch, block_start, block_stop))
+                for name, ch in zip(channel_names, channels, strict=True)
+                if name in needed
+            ]
+            df = pl.DataFrame(columns)
+            if filter_rows:
+                df = df.filter(pl.all_horizontal(pl.col(channel_names) != 0))
+            df = df.with_row_index(INDEX_COL, offset=next_index)
+            next_index += df.height
+            if predicate is not None:
+                df = df.filter(predicate)
+            if rows_left is not None:
+                df = df.head(rows_left)
+                rows_left -= df.height
+            if with_columns is not None:
+                df = df.select(with_columns)
+            if progress is not None:
+                progress(block_stop - start, stop - start)
+            yield df
+
+    return register_io_source(read_blocks, schema=schema)
 
-            # Section dataframe
-            h5f.create_table(
-                section_group,
-                name="data",
-                obj=section_data["section_dataframe"],
-                title="Section Dataframe",
-            )
 
-            # Processing info
-            processing_group = h5f.create_group(section_group, "processing_info", "Data Processing Information")
-            h5f.set_node_attr(processing_group, "sampling_rate", section_data["metadata"]["sampling_rate"])
-            h5f.set_node_attr(
-                processing_group,
-                "processing_pipeline",
-                section_data["metadata"]["processing_parameters"]["processing_pipeline"],
+def read_edf(
+    file_path: Path,
+    data_channel: str,
+    info_channel: str | None = None,
+    *,
+    start: int = 0,
+    stop: int | None = None,
+    filter_all_zeros: bool = True,
+) -> pl.DataFrame:
+    return scan_edf(
+        file_path, data_channel, info_channel, start=start, stop=stop, filter_all_zeros=filter_all_zeros
+    ).collect()
+
+
+def read_signal_file(
+    file_path: Path,
+    signal_column: str,
+    info_column: str | None = None,
+    *,
+    separator: TextFileSeparator = TextFileSeparator.Tab,
+) -> tuple[pl.DataFrame, int]:
+    """
+    Read the signal (and info) column of a supported input file, without any of the caching or batching done when a
+    file is opened in the app.
+
+    Returns the data, with the row position in the `index` column, and the sampling rate read from the EDF header or
+    detected from the time column (0 if it couldn't be detected).
+    """
+    columns = [signal_column] if info_column is None else [signal_column, info_column]
+    suffix = file_path.suffix
+    if suffix == ".edf":
+        header = read_edf_header(file_path)
+        samples_per_record = header.signals[header.channel_index(signal_column)].samples_per_record
+        return read_edf(file_path, signal_column, info_column), round(samples_per_record / header.record_duration)
+
+    if suffix in {".csv", ".txt", ".tsv"}:
+        if suffix == ".csv":
+            separator = TextFileSeparator.Comma
+        elif suffix == ".tsv":
+            separator = TextFileSeparator.Tab
+        lf = pl.scan_csv(file_path, separator=separator)
+    elif suffix == ".feather":
+        lf = pl.scan_ipc(file_path)
+    elif suffix == ".xlsx":
+        lf = pl.read_excel(file_path).lazy()
+    else:
+        raise ValueError(f"Unsupported file format: {suffix}")
+
+    try:
+        sampling_rate = detect_sampling_rate(lf)
+    except Exception:
+        sampling_rate = 0
+    df = lf.with_row_index(INDEX_COL).select(INDEX_COL, *columns).collect()
+    return df, sampling_rate
+
+
+def _write_table(
+    h5f: tb.File,
+    where: tb.Group,
+    name: str,
+    data: pl.DataFrame | t.Iterable[pl.DataFrame],
+    title: str,
+    filters: tb.Filters,
+    expected_rows: int | None = None,
+) -> tb.Table | None:
+    """
+    Write a dataframe, or the chunks of one, to a new table. Each chunk is converted to a structured array right before
+    it is appended, so at most one chunk is held in memory twice. Returns `None` if there was nothing to write.
+
+    PyTables picks the chunk shape of the table from `expected_rows`, so it should be the total number of rows when
+    `data` is passed as chunks. It's taken from the dataframe otherwise.
+    """
+    if isinstance(data, pl.DataFrame):
+        expected_rows = data.height
+        data = data.iter_slices(_WRITE_BATCH_ROWS)
+
+    table: tb.Table | None = None
+    for chunk in data:
+        if chunk.width == 0:
+            continue
+        if table is None:
+            table = h5f.create_table(
+                where,
+                name,
+                description=chunk.clear().to_numpy(structured=True).dtype,
+                title=title,
+                filters=filters,
+                expectedrows=expected_rows or _WRITE_BATCH_ROWS,
             )
+        if chunk.height > 0:
+            table.append(chunk.to_numpy(structured=True))
+    if table is not None:
+        table.flush()
+    return table
+
+
+class SectionExport(t.NamedTuple):
+    """The data written to the group of a single section in a HDF5 results file."""
+
+    name: str
+    title: str
+    metadata: _t.SectionMetadataDict
+    data: pl.DataFrame
+    peak_data: pl.DataFrame
+    rate_data: pl.DataFrame
+    is_locked: bool = False
+
+
+def _write_section(h5f: tb.File, where: tb.Group, section: SectionExport, filters: tb.Filters) -> None:
+    section_group = h5f.create_group(where, section.name, section.title)
+    h5f.set_node_attr(section_group, "is_locked", section.is_locked)
+    section_metadata = section.metadata
+
+    _write_table(h5f, section_group, "peak_result", section.peak_data, "Peak Results", filters)
+    _write_table(h5f, section_group, "rate_result", section.rate_data, "Rate Results", filters)
+
+    # Section dataframe
+    _write_table(h5f, section_group, "data", section.data, "Section Dataframe", filters)
+
+    # Processing info
+    processing_group = h5f.create_group(section_group, "processing_info", "Data Processing Information")
+    h5f.set_node_attr(processing_group, "sampling_rate", section_metadata["sampling_rate"])
+    h5f.set_node_attr(
+        processing_group,
+        "processing_pipeline",
+        section_metadata["processing_parameters"]["processing_pipeline"],
+    )
+
+    # Filters
+    filters_group = h5f.create_group(processing_group, "filters", "Applied Filters")
+    for i, filter_params in enumerate(section_metadata["processing_parameters"]["filter_parameters"], 1):
+        filter_group = h5f.create_group(filters_group, f"filter_{i}", f"Filter {i} Parameters")
+        for param, value in filter_params.items():
+            h5f.set_node_attr(filter_group, param, value)
+
+    # Standardization
+    std_group = h5f.create_group(processing_group, "standardization", "Data Standardization")
+    if std_params := section_metadata["processing_parameters"].get("standardization_parameters", {}):
+        for param, value in std_params.items():
+            h5f.set_node_attr(std_group, param, value)
+
+    # Peak detection
+    peak_detect_group = h5f.create_group(processing_group, "peak_detection", "Peak Detection Method")
+    peak_method = section_metadata["processing_parameters"]["peak_detection_method"] or "None"
+    peak_params = section_metadata["processing_parameters"]["peak_detection_method_parameters"] or {}
+    if peak_method == PeakDetectionMethod.ECGNeuroKit2:
+        peak_method = f"{peak_method} ({peak_params.get("method", "None")})"
+        peak_params = peak_params.get("params") or {}
+    h5f.set_node_attr(peak_detect_group, "method", peak_method)
+    if peak_params:
+        for param, value in peak_params.items():
+            h5f.set_node_attr(peak_detect_group, param, value)
+
+    # Rate computation
+    rate_group = h5f.create_group(processing_group, "rate_computation", "Rate Computation Method")
+    rate_method = section_metadata["processing_parameters"]["rate_computation_method"]
+    h5f.set_node_attr(rate_group, "method", rate_method)
+
+
+def write_hdf5_sections(
+    file_path: Path,
+    metadata: _t.SelectedFileMetadataDict,
+    global_data: pl.DataFrame | t.Iterable[pl.DataFrame],
+    sections: t.Iterable[SectionExport],
+    *,
+    compression: HDF5Compression = HDF5Compression.BloscLZ4,
+    compression_level: int = 5,
+    expected_rows: int | None = None,
+) -> None:
+    """
+    Write the combined data and the given sections to a HDF5 file, see `write_hdf5`. Only needs plain dataframes and
+    dictionaries, so results created without a `Section` (e.g. by the batch command line interface) are written in
+    the same layout.
+    """
+    fp = file_path.resolve().as_posix()
+    filters = tb.Filters(complevel=compression_level, complib=str(compression), shuffle=True)
+    with tb.open_file(fp, "w", title=f"Results_{file_path.stem}", filters=filters) as h5f:
+        # Root level metadata
+        for k, v in metadata.items():
+            h5f.set_node_attr(h5f.root, k, v)
+
+        _write_table(h5f, h5f.root, "combined_data", global_data, "Combined Section Dataframe", filters, expected_rows)
+
+        section_results_group = h5f.create_group(h5f.root, "section_results", "Results by Section")
+        for section in sections:
+            _write_section(h5f, section_results_group, section, filters)
+
 
-            # Filters
-            filters_group = h5f.create_group(processing_group, "filters", "Applied Filters")
-            for i, filter_params in enumerate(
-                section_data["metadata"]["processing_parameters"]["filter_parameters"], 1
-            ):
-                filter_group = h5f.create_group(filters_group, f"filter_{i}", f"Filter {i} Parameters")
-                for param, value in filter_params.items():
-                    h5f.set_node_attr(filter_group, param, value)
-
-            # Standardization
-            std_group = h5f.create_group(processing_group, "standardization", "Data Standardization")
-            if std_params := section_data["metadata"]["processing_parameters"].get("standardization_parameters", {}):
-                for param, value in std_params.items():
-                    h5f.set_node_attr(std_group, param, value)
-
-            # Peak detection
-            peak_detect_group = h5f.create_group(processing_group, "peak_detection", "Peak Detection Method")
-            peak_method = section_data["metadata"]["processing_parameters"]["peak_detection_method"] or "None"
-            peak_params = section_data["metadata"]["processing_parameters"]["peak_detection_method_parameters"] or {}
-            if peak_method == PeakDetectionMethod.ECGNeuroKit2:
-                peak_method = f"{peak_method} ({peak_params.get("method", "None")})"
-                peak_params = peak_params.get("params") or {}
-            h5f.set_node_attr(peak_detect_group, "method", peak_method)
-            if peak_params:
-                for param, value in peak_params.items():
-                    h5f.set_node_attr(peak_detect_group, param, value)
-
-            # Rate computation
-            rate_group = h5f.create_group(processing_group, "rate_computation", "Rate Computation Method")
-            rate_method = section_data["metadata"]["processing_parameters"]["rate_computation_method"]
-            h5f.set_node_attr(rate_group, "method", rate_method)
+@logger.catch
+def write_hdf5(
+    file_path: Path,
+    metadata: _t.SelectedFileMetadataDict,
+    global_data: pl.DataFrame | t.Iterable[pl.DataFrame],
+    section_results: t.Mapping["SectionID", "DetailedSectionResult"],
+    *,
+    compression: HDF5Compression = HDF5Compression.BloscLZ4,
+    compression_level: int = 5,
+    expected_rows: int | None = None,
+) -> None:
+    """
+    Write the combined data and the results of all sections to a HDF5 file.
+
+    Tables are chunked and compressed with `compression` at `compression_level` (0 disables compression). The
+    dataframes are written one section at a time in batches of rows, and `global_data` may also be passed as an
+    iterable of chunks, so the export never needs a second copy of the complete data. In that case, `expected_rows`
+    should be the total number of rows of `global_data`, which determines the chunk shape of its table.
+    """
+    sections = (
+        SectionExport(
+            name=section_id,
+            title=f"Results for {section_id.pretty_name()}",
+            metadata=section_result.metadata.to_dict(),
+            data=section_result.section_dataframe,
+            peak_data=section_result.section_result.peak_data,
+            rate_data=section_result.section_result.rate_data,
+            is_locked=section_result.section_result.is_locked,
+        )
+        for section_id, section_result in section_results.items()
+    )
+    write_hdf5_sections(
+        file_path,
+        metadata,
+        global_data,
+        sections,
+        compression=compression,
+        compression_level=compression_level,
+        expected_rows=expected_rows,
+    )
@@ -0,0 +1,263 @@
+import functools
+import typing as t
+
+import attrs
+import neurokit2 as nk
+import numpy as np
+import numpy.typing as npt
+from loguru import logger
+from scipy import signal
+
+from .._enums import FilterMethod
+
+# Maximum number of filter designs kept in the cache
+_FILTER_CACHE_SIZE: t.Final = 128
+
+# Methods whose design can be cached and applied with `apply_filter`. FIR and Savitzky-Golay filters are designed and
+# applied by `neurokit2.signal_filter` (through MNE / SciPy) and aren't included.
+CACHEABLE_FILTER_METHODS: t.Final = frozenset(
+    {
+        FilterMethod.Butterworth,
+        FilterMethod.ButterworthLegacy,
+        FilterMethod.ButterworthZI,
+        FilterMethod.Bessel,
+        FilterMethod.Powerline,
+    }
+)
+
+
+def _readonly(values: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    arr = np.asarray(values, dtype=np.float64)
+    arr.setflags(write=False)
+    return arr
+
+
+@attrs.frozen(eq=False)
+class FilterCoefficients:
+    """
+    Filter coefficients as second-order sections (`sos`) or as numerator / denominator (`b`, `a`). `zi` are the initial
+    conditions for a step response of the SOS filter. All arrays are read-only, since they are shared through the cache
+    (SciPy's SOS routines need writable arrays, so `sos` is copied before it is used).
+    """
+
+    method: FilterMethod = attrs.field()
+    sos: npt.NDArray[np.float64] | None = attrs.field(default=None)
+    b: npt.NDArray[np.float64] | None = attrs.field(default=None)
+    a: npt.NDArray[np.float64] | None = attrs.field(default=None)
+    zi: npt.NDArray[np.float64] | None = attrs.field(default=None)
+
+
+def _frequencies(
+    lowcut: float | None, highcut: float | None, sampling_rate: float
+) -> tuple[float | list[float], t.Literal["bandpass", "bandstop", "highpass", "lowpass"]]:
+    """Cutoff frequencies and filter type, following `neurokit2.signal_filter`."""
+    lowcut = lowcut or None
+    highcut = highcut or None
+    if lowcut is None and highcut is None:
+        raise ValueError("Need a lowcut or a highcut frequency to design the filter.")
+    if sampling_rate <= 2 * max(f for f in (lowcut, highcut) if f is not None):
+        logger.warning(
+            f"Sampling rate ({sampling_rate} Hz) is too low for the cutoff frequencies ({lowcut=}, {highcut=}), the "
+            "sampling rate has to be more than twice the highest cutoff to avoid aliasing."
+        )
+    if lowcut is not None and highcut is not None:
+        return sorted([lowcut, highcut]), "bandstop" if lowcut > highcut else "bandpass"
+    if lowcut is not None:
+        return lowcut, "highpass"
+    return t.cast(float, highcut), "lowpass"
+
+
+@functools.lru_cache(maxsize=_FILTER_CACHE_SIZE)
+def design_filter(
+    method: FilterMethod,
+    sampling_rate: float,
+    lowcut: float | None = None,
+    highcut: float | None = None,
+    order: int = 2,
+    powerline: float = 50,
+) -> FilterCoefficients:
+    """
+    Design (or get from the cache) the filter that `neurokit2.signal_filter` would use for the given parameters. Only
+    the methods in `CACHEABLE_FILTER_METHODS` are supported.
+    """
+    method = FilterMethod(method)
+    if method == FilterMethod.Powerline:
+        b = np.ones(int(sampling_rate / powerline)) if sampling_rate >= 100 else np.ones(2)
+        return FilterCoefficients(method, b=_readonly(b), a=_readonly([b.size]))
+
+    freqs, btype = _frequencies(lowcut, highcut, sampling_rate)
+    if method == FilterMethod.ButterworthLegacy:
+        b, a = signal.butter(order, freqs, btype=btype, output="ba", fs=sampling_rate)
+        return FilterCoefficients(method, b=_readonly(b), a=_readonly(a))
+
+    if method in {FilterMethod.Butterworth, FilterMethod.ButterworthZI}:
+        sos = signal.butter(order, freqs, btype=btype, output="sos", fs=sampling_rate)
+    elif method == FilterMethod.Bessel:
+        sos = signal.bessel(order, freqs, btype=btype, output="sos", fs=sampling_rate)
+    else:
+        raise ValueError(f"Filter method '{method}' can't be designed here, use `neurokit2.signal_filter` instead.")
+    zi = signal.sosfilt_zi(sos) if method == FilterMethod.ButterworthZI else None
+    return FilterCoefficients(method, sos=_readonly(sos), zi=None if zi is None else _readonly(zi))
+
+
+@functools.lru_cache(maxsize=_FILTER_CACHE_SIZE)
+def design_fir_bandpass(numtaps: int, lowcut: float, highcut: float, sampling_rate: float) -> FilterCoefficients:
+    """Design (or get from the cache) a windowed FIR band-pass filter with `numtaps` taps (see `scipy.signal.firwin`)."""
+    b = signal.firwin(numtaps=numtaps, cutoff=[lowcut, highcut], pass_zero=False, fs=sampling_rate)
+    return FilterCoefficients(FilterMethod.FIR, b=_readonly(b), a=_readonly([1.0]))
+
+
+def clear_filter_cache() -> None:
+    design_filter.cache_clear()
+    design_fir_bandpass.cache_clear()
+
+
+type _BlockStep[S] = t.Callable[[npt.NDArray[np.float64], S], tuple[npt.NDArray[np.float64], S]]
+
+
+def _sos_step(sos: npt.NDArray[np.float64]) -> _BlockStep[npt.NDArray[np.float64]]:
+    def step(block: npt.NDArray[np.float64], zi: npt.NDArray[np.float64]) -> tuple[npt.NDArray[np.float64], t.Any]:
+        return signal.sosfilt(sos, block, zi=zi)
+
+    return step
+
+
+def _ba_step(b: npt.NDArray[np.float64], a: npt.NDArray[np.float64]) -> _BlockStep[npt.NDArray[np.float64]]:
+    def step(block: npt.NDArray[np.float64], zi: npt.NDArray[np.float64]) -> tuple[npt.NDArray[np.float64], t.Any]:
+        return signal.lfilter(b, a, block, zi=zi)
+
+    return step
+
+
+def _fir_step(taps: npt.NDArray[np.float64]) -> _BlockStep[npt.NDArray[np.float64]]:
+    """Overlap-save FIR filtering, the state holds the last `len(taps) - 1` input samples of the previous block."""
+
+    def step(
+        block: npt.NDArray[np.float64], history: npt.NDArray[np.float64]
+    ) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        segment = np.concatenate((history, block))
+        return signal.oaconvolve(segment, taps, mode="valid"), segment[segment.size - history.size :]
+
+    return step
+
+
+def _blockwise_filtfilt[S](
+    sig: npt.NDArray[np.float64],
+    step: _BlockStep[S],
+    initial_state: t.Callable[[float], S],
+    padlen: int,
+    block_size: int,
+) -> npt.NDArray[np.float64]:
+    """
+    Forward-backward filtering with odd padding of length `padlen` (same as `filtfilt(..., method="pad")`), processing
+    `block_size` samples at a time and passing the filter state from one block to the next. Apart from the result, only
+    block-sized temporaries are allocated.
+    """
+    n = sig.size
+    left_pad = 2 * sig[0] - sig[padlen:0:-1]
+    right_pad = 2 * sig[-1] - sig[-2 : -(padlen + 2) : -1]
+    out = np.empty(n, dtype=np.float64)
+
+    state = initial_state(left_pad[0] if padlen else sig[0])
+    if padlen:
+        _, state = step(left_pad, state)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        out[start:stop], state = step(sig[start:stop], state)
+    right_forward, _ = step(right_pad, state) if padlen else (out[-1:], state)
+
+    state = initial_state(right_forward[-1])
+    if padlen:
+        _, state = step(right_forward[::-1], state)
+    for stop in range(n, 0, -block_size):
+        start = max(stop - block_size, 0)
+        backward, state = step(out[start:stop][::-1], state)
+        out[start:stop] = backward[::-1]
+    return out
+
+
+def zero_phase_filter(
+    sig: npt.NDArray[np.float64], coefficients: FilterCoefficients, block_size: int | None = None
+) -> npt.NDArray[np.float64]:
+    """
+    Filter `sig` forwards and backwards, so the result has no phase shift. Second-order sections are applied with
+    `sosfiltfilt`, transfer function coefficients with `filtfilt` (using Gustafsson's method for Butterworth filters, as
+    `neurokit2` does).
+
+    If `sig` is longer than `block_size`, it is filtered block-wise, which bounds the memory used for temporaries to a
+    few blocks. IIR filters carry their state across blocks (giving the same result as the whole-array functions), FIR
+    filters use FFT-based overlap-save convolution (matching up to floating point rounding). Gustafsson's method needs
+    the whole signal, so it always runs on the complete array.
+    """
+    use_blocks = block_size is not None and block_size > 0 and sig.size > block_size
+    if use_blocks and coefficients.method != FilterMethod.ButterworthLegacy:
+        return _blockwise_zero_phase_filter(sig, coefficients, t.cast(int, block_size))
+
+    if coefficients.sos is not None:
+        return signal.sosfiltfilt(coefficients.sos.copy(), sig)
+    if coefficients.b is None or coefficients.a is None:
+        raise ValueError("Filter coefficients need either `sos` or both `b` and `a`.")
+    if coefficients.method == FilterMethod.ButterworthLegacy:
+        try:
+            return signal.filtfilt(coefficients.b, coefficients.a, sig, method="gust")
+        except ValueError:
+            pass
+    return signal.filtfilt(coefficients.b, coefficients.a, sig, method="pad")
+
+
+def _blockwise_zero_phase_filter(
+    sig: npt.NDArray[np.float64], coefficients: FilterCoefficients, block_size: int
+) -> npt.NDArray[np.float64]:
+    if coefficients.sos is not None:
+        sos = coefficients.sos.copy()
+        # Same padding length as `sosfiltfilt`
+        n_sections = sos.shape[0]
+        padlen = 3 * (2 * n_sections + 1 - min(int((sos[:, 2] == 0).sum()), int((sos[:, 5] == 0).sum())))
+        zi = signal.sosfilt_zi(sos)
+        step, initial_state = _sos_step(sos), lambda x0: zi * x0
+    elif coefficients.b is not None and coefficients.a is not None:
+        b, a = coefficients.b, coefficients.a
+        padlen = 3 * max(a.size, b.size)
+        if a.size == 1:
+            taps = b / a[0]
+            step = _fir_step(taps)
+            initial_state = lambda x0: np.full(taps.size - 1, x0)  # noqa: E731
+        else:
+            zi = signal.lfilter_zi(b, a)
+            step, initial_state = _ba_step(b, a), lambda x0: zi * x0
+    else:
+        raise ValueError("Filter coefficients need either `sos` or both `b` and `a`.")
+
+    if sig.size <= padlen:
+        raise ValueError(f"The length of the input vector must be greater than the padding length ({padlen}).")
+    return _blockwise_filtfilt(np.asarray(sig, dtype=np.float64), step, initial_state, padlen, block_size)
+
+
+def apply_filter(
+    sig: npt.NDArray[np.float64], coefficients: FilterCoefficients, block_size: int | None = None
+) -> npt.NDArray[np.float64]:
+    """
+    Apply a filter created by `design_filter` or `design_fir_bandpass` to `sig`. Same as the corresponding method of
+    `neurokit2.signal_filter`, including the handling of missing values, which are interpolated before filtering and
+    set to NaN again afterwards. See `zero_phase_filter` for `block_size`.
+    """
+    missing = np.flatnonzero(np.isnan(sig))
+    if missing.size > 0:
+        sig = np.asarray(nk.signal_interpolate(sig, method="linear"), dtype=np.float64)
+
+    if coefficients.method == FilterMethod.ButterworthZI:
+        if coefficients.sos is None or coefficients.zi is None:
+            raise ValueError("Filter coefficients of a single pass filter need both `sos` and `zi`.")
+        # Single forward pass starting from the steady state for the signal mean
+        step = _sos_step(coefficients.sos.copy())
+        state = coefficients.zi * np.mean(sig)
+        block_size = block_size if block_size and block_size > 0 else sig.size
+        filtered = np.empty(sig.size, dtype=np.float64)
+        for start in range(0, sig.size, block_size):
+            filtered[start : start + block_size], state = step(sig[start : start + block_size], state)
+    else:
+        filtered = zero_phase_filter(sig, coefficients, block_size)
+
+    filtered = np.asarray(filtered, dtype=np.float64)
+    filtered[missing] = np.nan
+    return filtered
@@ -7,8 +7,13 @@ modified to fit the needs of this application.
 # Since neurokit2 isn't typed all that well, we disable the following checks to appease the type checker.
 
 # pyright: reportUnknownVariableType=false, reportUnknownArgumentType=false
+import concurrent.futures as cf
+import itertools
+import multiprocessing as mp
+import os
 import typing as t
 
+import attrs
 import neurokit2 as nk
 import numpy as np
 import numpy.typing as npt
@@ -45,33 +50,100 @@ def find_extrema(
     else:
         peaks = _find_peaks_local_min(sig, search_radius)
 
-    peak_diffs = np.diff(peaks)
-    close_peaks = np.where(peak_diffs < min_peak_distance)[0]
-    while len(close_peaks) > 0:
-        for i in close_peaks:
-            peaks[i] = (peaks[i] + peaks[i + 1]) // 2
-        peaks = np.delete(peaks, close_peaks + 1)
-        peak_diffs = np.diff(peaks)
-        close_peaks = np.where(peak_diffs < min_peak_distance)[0]
-
-    return peaks
+    # Each run of peaks that are closer than `min_peak_distance` to their successor is replaced by the midpoint of its
+    # first two peaks. A merged peak never moves further than its run's last peak, which is at least
+    # `min_peak_distance` away from the next run, so a single pass leaves no close peaks behind.
+    close_peaks = np.flatnonzero(np.diff(peaks) < min_peak_distance)
+    if close_peaks.size == 0:
+        return peaks
+    peaks[close_peaks] = (peaks[close_peaks] + peaks[close_peaks + 1]) // 2
+    return np.delete(peaks, close_peaks + 1)
+
+
+def find_local_extrema(sig: npt.NDArray[np.float64]) -> tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]:
+    """
+    Indices of all local maxima and minima of `sig`, in ascending order. For flat tops / bottoms, the first sample of
+    the plateau is used. The first and last sample of the signal are never extrema.
+    """
+    sig = np.asarray(sig)
+    diff = np.diff(sig)
+    # Ignoring flat steps, an extremum is where the slope changes sign
+    steps = np.flatnonzero(diff)
+    slope = np.sign(diff[steps])
+    turns = np.flatnonzero(slope[:-1] != slope[1:])
+    positions = (steps[turns] + 1).astype(np.int32)
+    is_max = slope[turns] > 0
+    return positions[is_max], positions[~is_max]
+
+
+@attrs.frozen
+class ExtremaIndex:
+    """
+    Sorted positions of the local extrema of a signal, used to snap a position (e.g. a mouse click) to the nearest
+    extremum with binary search instead of scanning the signal.
+    """
+
+    maxima: npt.NDArray[np.int32] = attrs.field(eq=False)
+    minima: npt.NDArray[np.int32] = attrs.field(eq=False)
+
+    @classmethod
+    def from_signal(cls, sig: npt.NDArray[np.float64]) -> "ExtremaIndex":
+        maxima, minima = find_local_extrema(sig)
+        maxima.setflags(write=False)
+        minima.setflags(write=False)
+        return cls(maxima, minima)
+
+    def candidates(self, x: float, radius: int) -> npt.NDArray[np.int32]:
+        """All extrema within `radius` samples of `x`."""
+        found = [
+            positions[np.searchsorted(positions, x - radius, "left") : np.searchsorted(positions, x + radius, "right")]
+            for positions in (self.maxima, self.minima)
+        ]
+        return np.concatenate(found)
+
+    def nearest(self, sig: npt.NDArray[np.float64], x: float, y: float, radius: int) -> int | None:
+        """
+        The extremum within `radius` samples of `x` whose value is closest to `y`, or the one closest to `x` for
+        ties. `None` if there are no extrema in the range.
+        """
+        candidates = self.candidates(x, radius)
+        if candidates.size == 0:
+            return None
+        best = np.lexsort((np.abs(candidates - x), np.abs(sig[candidates] - y)))[0]
+        return int(candidates[best])
 
 
 # XQRS related functions
+
+# Upper limit for the number of values in the block of search windows that is compared at once
+_SHIFT_BLOCK_VALUES: t.Final = 4_000_000
+
+
 def _shift_peaks(
     sig: npt.NDArray[np.float64], peaks: npt.NDArray[np.int32], radius: int, dir_is_up: bool
 ) -> npt.NDArray[np.int32]:
-    start_indices = np.maximum(peaks - radius, 0)
-    end_indices = np.minimum(peaks + radius, sig.size)
-
+    """
+    Move each peak to the largest (or smallest) value in `sig[peak - radius:peak + radius]`. Modifies and returns
+    `peaks`.
+
+    Windows that would extend past the end of the signal are padded with values that are never selected. Windows
+    that would start before the first sample are cut off at 0, but the shift is still counted from `peak - radius`.
+    """
+    find_peak_func = np.argmax if dir_is_up else np.argmin
     shifted_peaks = np.zeros_like(peaks)
 
-    for i, (start, end) in enumerate(zip(start_indices, end_indices, strict=False)):
-        local_sig = sig[start:end]
-        if dir_is_up:
-            shifted_peaks[i] = np.subtract(np.argmax(local_sig), radius)
-        else:
-            shifted_peaks[i] = np.subtract(np.argmin(local_sig), radius)
+    # Peaks too close to the start of the signal for a full window
+    at_start = np.flatnonzero(peaks < radius)
+    for i in at_start:
+        shifted_peaks[i] = find_peak_func(sig[: min(peaks[i] + radius, sig.size)]) - radius
+
+    padded = np.concatenate([sig, np.full(radius, -np.inf if dir_is_up else np.inf)])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * radius)
+    full = np.flatnonzero(peaks >= radius)
+    block = max(_SHIFT_BLOCK_VALUES // max(2 * radius, 1), 1)
+    for lo in range(0, full.size, block):
+        idx = full[lo : lo + block]
+        shifted_peaks[idx] = find_peak_func(windows[peaks[idx] - radius], axis=1) - radius
 
     peaks += shifted_peaks
     return peaks
@@ -120,23 +192,25 @@ def _remove_outliers(
         raise ValueError("find_peak_func must be np.argmax or np.argmin")
 
     comparison_func, direction = comparison_ops[find_peak_func]
-    outliers_mask = np.zeros_like(qrs_locations, dtype=np.bool_)
-
-    for i, peak in enumerate(qrs_locations):
-        start_ind = max(0, i - 2)
-        end_ind = min(len(qrs_locations), i + 3)
-
-        surrounding_peaks = qrs_locations[start_ind:end_ind]
-        surrounding_values = sig[surrounding_peaks]
-        local_mean = np.mean(surrounding_values)
-        local_std = np.std(surrounding_values)
-        threshold = local_mean + direction * n_std * local_std
-
-        if comparison_func(sig[peak], threshold):
-            outliers_mask[i] = True
-
-    qrs_locations = qrs_locations[~outliers_mask]
-    return qrs_locations
+    peak_values = sig[qrs_locations]
+    n_peaks = peak_values.size
+
+    # Mean and standard deviation of the values of each peak and its two neighbours on either side
+    local_mean = np.empty(n_peaks, dtype=np.float64)
+    local_std = np.empty(n_peaks, dtype=np.float64)
+    if n_peaks >= 5:
+        windows = np.lib.stride_tricks.sliding_window_view(peak_values, 5)
+        local_mean[2:-2] = windows.mean(axis=1)
+        local_std[2:-2] = windows.std(axis=1)
+    # Shorter windows at the edges
+    for i in {*range(min(2, n_peaks)), *range(max(n_peaks - 2, 0), n_peaks)}:
+        surrounding_values = peak_values[max(0, i - 2) : min(n_peaks, i + 3)]
+        local_mean[i] = np.mean(surrounding_values)
+        local_std[i] = np.std(surrounding_values)
+
+    threshold = local_mean + direction * n_std * local_std
+    outliers_mask = comparison_func(peak_values, threshold)
+    return qrs_locations[~outliers_mask]
 
 
 def _handle_close_peaks(
@@ -252,3 +326,91 @@ def _find_peaks_nk_ecg(
         show=False,
         **params,
     )["ECG_R_Peaks"]
+
+
+# Context added on both sides of a block for methods that adapt their thresholds to the preceding signal
+_BLOCK_CONTEXT_SECONDS: t.Final = 10
+# Minimum distance between peaks assumed by the NeuroKit2 based methods, used to remove duplicates at block seams
+_DEFAULT_MIN_PEAK_DISTANCE_SECONDS: t.Final = 0.3
+
+
+def _block_overlap(
+    sampling_rate: int, method: PeakDetectionMethod, method_parameters: _t.PeakDetectionMethodParameters
+) -> tuple[int, int]:
+    """
+    Number of samples by which neighbouring blocks overlap, and the minimum distance between two peaks found at the
+    seam of two blocks for them to be considered different peaks.
+    """
+    if method in {PeakDetectionMethod.LocalMaxima, PeakDetectionMethod.LocalMinima}:
+        method_parameters = t.cast(_t.PeaksLocalMaxima, method_parameters)
+        search_radius, min_distance = method_parameters["search_radius"], method_parameters["min_distance"]
+        return 2 * (search_radius + min_distance) + 1, min_distance
+    if method == PeakDetectionMethod.WFDBXQRS:
+        method_parameters = t.cast(_t.PeaksWFDBXQRS, method_parameters)
+        return (
+            _BLOCK_CONTEXT_SECONDS * sampling_rate + method_parameters["search_radius"],
+            method_parameters["min_peak_distance"],
+        )
+    if method == PeakDetectionMethod.PPGElgendi:
+        min_delay = t.cast(_t.PeaksPPGElgendi, method_parameters).get("mindelay", _DEFAULT_MIN_PEAK_DISTANCE_SECONDS)
+        return _BLOCK_CONTEXT_SECONDS * sampling_rate, round(min_delay * sampling_rate)
+    return _BLOCK_CONTEXT_SECONDS * sampling_rate, round(_DEFAULT_MIN_PEAK_DISTANCE_SECONDS * sampling_rate)
+
+
+def find_peaks_blockwise(
+    sig: npt.NDArray[np.float64],
+    sampling_rate: int,
+    method: PeakDetectionMethod,
+    method_parameters: _t.PeakDetectionMethodParameters,
+    block_size: int,
+    *,
+    max_workers: int | None = None,
+) -> npt.NDArray[np.int32]:
+    """
+    Same as `find_peaks`, but the signal is split into blocks of at most `block_size` samples that are processed in a
+    pool of worker processes.
+
+    Each block is extended on both sides by an overlap that depends on the method (its search radius, or a few
+    seconds of context for methods with adaptive thresholds). Only the peaks inside the block itself are kept, and of
+    two peaks that end up closer than the method's minimum peak distance at a seam, the earlier one is kept. The result
+    is deterministic, but may differ slightly from detecting the peaks in the whole signal at once.
+    """
+    n = sig.size
+    n_blocks = -(-n // block_size) if block_size > 0 else 1
+    if n_blocks <= 1:
+        return np.asarray(find_peaks(sig, sampling_rate, method, method_parameters), dtype=np.int32)
+
+    overlap, min_distance = _block_overlap(sampling_rate, method, method_parameters)
+    bounds = np.linspace(0, n, n_blocks + 1).astype(np.int64)
+    segments = [
+        (max(start - overlap, 0), min(stop + overlap, n)) for start, stop in zip(bounds[:-1], bounds[1:], strict=True)
+    ]
+
+    block_signals = [sig[seg_start:seg_stop] for seg_start, seg_stop in segments]
+
+    max_workers = min(max_workers or os.cpu_count() or 1, n_blocks)
+    if max_workers == 1:
+        block_peaks = [find_peaks(block, sampling_rate, method, method_parameters) for block in block_signals]
+    else:
+        # Spawned instead of forked, since forking a process that runs Qt threads isn't safe
+        with cf.ProcessPoolExecutor(max_workers, mp_context=mp.get_context("spawn")) as executor:
+            block_peaks = list(
+                executor.map(
+                    find_peaks,
+                    block_signals,
+                    itertools.repeat(sampling_rate),
+                    itertools.repeat(method),
+                    itertools.repeat(method_parameters),
+                )
+            )
+
+    kept: list[npt.NDArray[np.int64]] = []
+    for peaks, (seg_start, _), start, stop in zip(block_peaks, segments, bounds[:-1], bounds[1:], strict=True):
+        peaks = np.unique(np.asarray(peaks, dtype=np.int64)) + seg_start
+        kept.append(peaks[(peaks >= start) & (peaks < stop)])
+    peaks = np.concatenate(kept)
+
+    # Both blocks may have found the same peak at slightly different positions on either side of a seam
+    block_of_peak = np.searchsorted(bounds, peaks, side="right")
+    duplicates = np.flatnonzero((np.diff(peaks) < min_distance) & (np.diff(block_of_peak) != 0))
+    return np.delete(peaks, duplicates + 1).astype(np.int32)
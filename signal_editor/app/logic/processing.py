@@ -7,10 +7,16 @@ import neurokit2 as nk
 import numpy as np
 import numpy.typing as npt
 import polars as pl
-from scipy import signal
 
 from .. import _type_defs as _t
 from .._enums import FilterMethod, PreprocessPipeline
+from .filter_design import (
+    CACHEABLE_FILTER_METHODS,
+    apply_filter,
+    design_filter,
+    design_fir_bandpass,
+    zero_phase_filter,
+)
 
 
 class CleaningResult(t.NamedTuple):
@@ -25,6 +31,98 @@ def rolling_standardize(sig: pl.Series, window_size: int) -> pl.Series:
     return (sig - roll_mean) / roll_std
 
 
+# Upper limit for the number of values in the block of windows whose MAD is computed at once
+_ROLLING_MAD_BLOCK_VALUES: t.Final = 4_000_000
+
+
+def _window_mad(
+    sig: npt.NDArray[np.float64],
+    rolling_median: npt.NDArray[np.float64],
+    ends: npt.NDArray[np.intp],
+    window_size: int,
+) -> npt.NDArray[np.float64]:
+    """Exact (unscaled) MAD of the trailing windows ending at the sorted positions `ends`."""
+    mad = np.empty(ends.size, dtype=np.float64)
+
+    # Windows at the start of the signal are shorter than `window_size`
+    n_partial = int(np.searchsorted(ends, window_size - 1))
+    for i, end in enumerate(ends[:n_partial]):
+        mad[i] = np.median(np.abs(sig[: end + 1] - rolling_median[end]))
+
+    windows = np.lib.stride_tricks.sliding_window_view(sig, window_size)
+    block = max(_ROLLING_MAD_BLOCK_VALUES // window_size, 1)
+    for lo in range(n_partial, ends.size, block):
+        block_ends = ends[lo : lo + block]
+        deviations = np.abs(windows[block_ends - (window_size - 1)] - rolling_median[block_ends, None])
+        mad[lo : lo + block_ends.size] = np.median(deviations, axis=1)
+    return mad
+
+
+def rolling_mad(
+    sig: npt.NDArray[np.float64],
+    window_size: int,
+    rolling_median: npt.NDArray[np.float64] | None = None,
+    step: int | None = None,
+    rtol: float = 0.02,
+    constant: float = 1.4826,
+) -> npt.NDArray[np.float64]:
+    """
+    Median absolute deviation in trailing windows of `window_size` samples (shorter at the start of the signal).
+
+    The MAD is computed exactly for every `step`-th window (default: a quarter of the window size) and linearly
+    interpolated in between. Where the exact values at the ends of an interval differ by more than `rtol`, e.g. at
+    the edges of a burst, the interval is bisected until they don't, so the MAD is only interpolated where it changes
+    slowly. The cost is about `len(sig) * window_size / step` for signals without level changes, `step=1` computes
+    every window exactly. `rolling_median` can be passed if the rolling median of `sig` with the same window size was
+    already computed.
+    """
+    n = sig.size
+    if n == 0:
+        return np.empty(0, dtype=np.float64)
+    window_size = max(min(window_size, n), 1)
+    step = step or max(window_size // 4, 1)
+    if rolling_median is None:
+        rolling_median = pl.Series(sig).rolling_median(window_size, min_periods=1).to_numpy()
+
+    anchors = np.unique(np.concatenate([[0], np.arange(step - 1, n, step), [n - 1]]))
+    anchor_mad = _window_mad(sig, rolling_median, anchors, window_size)
+
+    # Intervals are bisected while the values at their ends differ by more than `rtol`. If the value at the midpoint
+    # of a split interval is off the line between its ends, both halves are bisected as well.
+    intervals = np.arange(anchors.size - 1)
+    curved = np.zeros(intervals.size, dtype=np.bool_)
+    while intervals.size > 0:
+        left_mad, right_mad = anchor_mad[intervals], anchor_mad[intervals + 1]
+        needs_split = (anchors[intervals + 1] - anchors[intervals] > 1) & (
+            curved | (np.abs(right_mad - left_mad) > rtol * np.maximum(left_mad, right_mad))
+        )
+        intervals = intervals[needs_split]
+        if intervals.size == 0:
+            break
+        mids = (anchors[intervals] + anchors[intervals + 1]) // 2
+        mid_mad = _window_mad(sig, rolling_median, mids, window_size)
+        is_curved = np.abs(mid_mad - (anchor_mad[intervals] + anchor_mad[intervals + 1]) / 2) > rtol * mid_mad
+
+        order = np.argsort(np.concatenate([anchors, mids]), kind="stable")
+        anchors = np.concatenate([anchors, mids])[order]
+        anchor_mad = np.concatenate([anchor_mad, mid_mad])[order]
+        mid_pos = np.searchsorted(anchors, mids)
+        intervals = np.concatenate([mid_pos - 1, mid_pos])
+        curved = np.concatenate([is_curved, is_curved])
+        order = np.argsort(intervals)
+        intervals, curved = intervals[order], curved[order]
+
+    return constant * np.interp(np.arange(n), anchors, anchor_mad)
+
+
+def rolling_robust_standardize(sig: pl.Series, window_size: int) -> pl.Series:
+    """Robust z-score in trailing windows, using the rolling median and `rolling_mad` instead of mean and std."""
+    roll_median = sig.rolling_median(window_size, min_periods=1)
+    values = sig.cast(pl.Float64).to_numpy()
+    roll_mad = rolling_mad(values, window_size, roll_median.cast(pl.Float64).to_numpy())
+    return (sig - roll_median) / pl.Series(roll_mad)
+
+
 def calculate_mad(sig: pl.Series, constant: float = 1.4826) -> np.float64:
     sig_median = sig.median()
     mad = np.median(np.abs(sig - sig_median))
@@ -33,8 +131,8 @@ def calculate_mad(sig: pl.Series, constant: float = 1.4826) -> np.float64:
 
 def standardize_signal(sig: pl.Series, robust: bool = False, window_size: int | None = None) -> pl.Series:
     if robust and window_size:
-        raise ValueError("Windowed MAD scaling is not supported for robust scaling")
-    if window_size:
+        result = rolling_robust_standardize(sig, window_size)
+    elif window_size:
         result = rolling_standardize(sig, window_size)
     elif robust:
         result = (sig - sig.median()) / calculate_mad(sig)
@@ -44,47 +142,52 @@ def standardize_signal(sig: pl.Series, robust: bool = False, window_size: int |
     return result.fill_nan(None).fill_null(strategy="backward")
 
 
+def _filter(
+    sig: npt.NDArray[np.float64],
+    sampling_rate: int,
+    method: FilterMethod,
+    lowcut: float | None = None,
+    highcut: float | None = None,
+    order: int = 2,
+    powerline: float = 50,
+    block_size: int | None = None,
+) -> npt.NDArray[np.float64]:
+    """
+    Same as `neurokit2.signal_filter`, but reuses the filter design if it was already used before. Signals longer than
+    `block_size` are filtered block-wise, see `filter_design.zero_phase_filter`.
+    """
+    return apply_filter(sig, design_filter(method, sampling_rate, lowcut, highcut, order, powerline), block_size)
+
+
 def ecg_clean_neurokit(
-    sig: npt.NDArray[np.float64], sampling_rate: int, powerline: int = 50
+    sig: npt.NDArray[np.float64], sampling_rate: int, powerline: int = 50, block_size: int | None = None
 ) -> npt.NDArray[np.float64]:
-    clean = nk.signal_filter(
-        signal=sig,
-        sampling_rate=sampling_rate,
-        lowcut=0.5,
-        method=FilterMethod.Butterworth,
-        order=5,
-    )
-    return nk.signal_filter(clean, sampling_rate=sampling_rate, method=FilterMethod.Powerline, powerline=powerline)
+    clean = _filter(sig, sampling_rate, FilterMethod.Butterworth, lowcut=0.5, order=5, block_size=block_size)
+    return _filter(clean, sampling_rate, FilterMethod.Powerline, powerline=powerline, block_size=block_size)
 
 
 def ppg_clean_elgendi(
-    sig: npt.NDArray[np.float64], sampling_rate: int
+    sig: npt.NDArray[np.float64], sampling_rate: int, block_size: int | None = None
 ) -> tuple[npt.NDArray[np.float64], _t.SignalFilterParameters]:
-    return nk.signal_filter(
+    return _filter(
         sig,
-        sampling_rate=sampling_rate,
+        sampling_rate,
         lowcut=0.5,
         highcut=8,
         method=FilterMethod.Butterworth,
         order=3,
+        block_size=block_size,
     ), {"lowcut": 0.5, "highcut": 8, "method": FilterMethod.Butterworth, "order": 3}
 
 
 def ecg_clean_biosppy(
-    sig: npt.NDArray[np.float64], sampling_rate: int
+    sig: npt.NDArray[np.float64], sampling_rate: int, block_size: int | None = None
 ) -> tuple[npt.NDArray[np.float64], _t.SignalFilterParameters]:
     order = int(1.5 * sampling_rate)
     if order % 2 == 0:
         order += 1
 
-    frequency = [0.67, 45]
-
-    frequency = 2 * np.array(frequency) / sampling_rate  # Normalize frequency to Nyquist Frequency
-
-    a = np.array([1])
-    b = signal.firwin(numtaps=order, cutoff=frequency, pass_zero=False)
-
-    filtered = signal.filtfilt(b, a, sig)
+    filtered = zero_phase_filter(sig, design_fir_bandpass(order, 0.67, 45, sampling_rate), block_size)
 
     filtered -= np.mean(filtered)
 
@@ -92,72 +195,79 @@ def ecg_clean_biosppy(
 
 
 def ecg_clean_pantompkins(
-    sig: npt.NDArray[np.float64], sampling_rate: int
+    sig: npt.NDArray[np.float64], sampling_rate: int, block_size: int | None = None
 ) -> tuple[npt.NDArray[np.float64], _t.SignalFilterParameters]:
-    return nk.signal_filter(
+    return _filter(
         sig,
-        sampling_rate=sampling_rate,
+        sampling_rate,
         lowcut=5,
         highcut=15,
         method=FilterMethod.ButterworthZI,
         order=1,
+        block_size=block_size,
     ), {"lowcut": 5, "highcut": 15, "method": FilterMethod.ButterworthZI, "order": 1}
 
 
 def ecg_clean_hamilton(
-    sig: npt.NDArray[np.float64], sampling_rate: int
+    sig: npt.NDArray[np.float64], sampling_rate: int, block_size: int | None = None
 ) -> tuple[npt.NDArray[np.float64], _t.SignalFilterParameters]:
-    return nk.signal_filter(
+    return _filter(
         sig,
-        sampling_rate=sampling_rate,
+        sampling_rate,
         lowcut=8,
         highcut=16,
         method=FilterMethod.ButterworthZI,
         order=1,
+        block_size=block_size,
     ), {"lowcut": 8, "highcut": 16, "method": FilterMethod.ButterworthZI, "order": 1}
 
 
 def ecg_clean_elgendi(
-    sig: npt.NDArray[np.float64], sampling_rate: int
+    sig: npt.NDArray[np.float64], sampling_rate: int, block_size: int | None = None
 ) -> tuple[npt.NDArray[np.float64], _t.SignalFilterParameters]:
-    return nk.signal_filter(
+    return _filter(
         sig,
-        sampling_rate=sampling_rate,
+        sampling_rate,
         lowcut=8,
         highcut=20,
         method=FilterMethod.ButterworthZI,
         order=2,
+        block_size=block_size,
     ), {"lowcut": 8, "highcut": 20, "method": FilterMethod.ButterworthZI, "order": 2}
 
 
 def ecg_clean_engzee(
-    sig: npt.NDArray[np.float64], sampling_rate: int
+    sig: npt.NDArray[np.float64], sampling_rate: int, block_size: int | None = None
 ) -> tuple[npt.NDArray[np.float64], _t.SignalFilterParameters]:
-    return nk.signal_filter(
+    return _filter(
         sig,
-        sampling_rate=sampling_rate,
+        sampling_rate,
         lowcut=52,
         highcut=48,
         method=FilterMethod.ButterworthZI,
         order=4,
+        block_size=block_size,
     ), {"lowcut": 52, "highcut": 48, "method": FilterMethod.ButterworthZI, "order": 4}
 
 
 def ecg_clean_vgraph(
-    sig: npt.NDArray[np.float64], sampling_rate: int
+    sig: npt.NDArray[np.float64], sampling_rate: int, block_size: int | None = None
 ) -> tuple[npt.NDArray[np.float64], _t.SignalFilterParameters]:
-    return nk.signal_filter(
+    return _filter(
         sig,
-        sampling_rate=sampling_rate,
+        sampling_rate,
         lowcut=4,
         method=FilterMethod.Butterworth,
         order=2,
+        block_size=block_size,
     ), {"lowcut": 4, "method": FilterMethod.Butterworth, "order": 2}
 
 
 def filter_signal(
     sig: npt.NDArray[np.float64],
     sampling_rate: int,
+    *,
+    block_size: int | None = None,
     **kwargs: t.Unpack[_t.SignalFilterParameters],
 ) -> tuple[npt.NDArray[np.float64], _t.SignalFilterParameters]:
     highcut = kwargs.get("highcut")
@@ -166,19 +276,32 @@ def filter_signal(
         kwargs["highcut"] = None
     if lowcut == 0:
         kwargs["lowcut"] = None
-    out = nk.signal_filter(sig, sampling_rate=sampling_rate, **kwargs)  # type: ignore
+    method = kwargs.get("method", FilterMethod.Butterworth)
+    if method in CACHEABLE_FILTER_METHODS:
+        out = _filter(
+            sig,
+            sampling_rate,
+            FilterMethod(method),
+            lowcut=kwargs.get("lowcut"),
+            highcut=kwargs.get("highcut"),
+            order=kwargs.get("order", 2),
+            powerline=kwargs.get("powerline", 50),
+            block_size=block_size,
+        )
+    else:
+        out = nk.signal_filter(sig, sampling_rate=sampling_rate, **kwargs)  # type: ignore
 
     return np.asarray(out, dtype=np.float64), kwargs
 
 
 def apply_cleaning_pipeline(
-    sig: npt.NDArray[np.float64], sampling_rate: int, pipeline: PreprocessPipeline
+    sig: npt.NDArray[np.float64], sampling_rate: int, pipeline: PreprocessPipeline, block_size: int | None = None
 ) -> CleaningResult:
     additional_params: _t.SignalFilterParameters | None = None
     if pipeline == PreprocessPipeline.PPGElgendi:
-        cleaned, params = ppg_clean_elgendi(sig, sampling_rate)
+        cleaned, params = ppg_clean_elgendi(sig, sampling_rate, block_size=block_size)
     elif pipeline == PreprocessPipeline.ECGNeuroKit2:
-        cleaned = ecg_clean_neurokit(sig, sampling_rate)
+        cleaned = ecg_clean_neurokit(sig, sampling_rate, block_size=block_size)
         params: _t.SignalFilterParameters = {
             "lowcut": 0.5,
             "method": str(FilterMethod.Butterworth),
@@ -189,16 +312,16 @@ def apply_cleaning_pipeline(
             "powerline": 50,
         }
     elif pipeline == PreprocessPipeline.ECGBioSPPy:
-        cleaned, params = ecg_clean_biosppy(sig, sampling_rate)
+        cleaned, params = ecg_clean_biosppy(sig, sampling_rate, block_size=block_size)
     elif pipeline == PreprocessPipeline.ECGPanTompkins1985:
-        cleaned, params = ecg_clean_pantompkins(sig, sampling_rate)
+        cleaned, params = ecg_clean_pantompkins(sig, sampling_rate, block_size=block_size)
     elif pipeline == PreprocessPipeline.ECGHamilton2002:
-        cleaned, params = ecg_clean_hamilton(sig, sampling_rate)
+        cleaned, params = ecg_clean_hamilton(sig, sampling_rate, block_size=block_size)
     elif pipeline == PreprocessPipeline.ECGElgendi2010:
-        cleaned, params = ecg_clean_elgendi(sig, sampling_rate)
+        cleaned, params = ecg_clean_elgendi(sig, sampling_rate, block_size=block_size)
     elif pipeline == PreprocessPipeline.ECGEngzeeMod2012:
-        cleaned, params = ecg_clean_engzee(sig, sampling_rate)
+        cleaned, params = ecg_clean_engzee(sig, sampling_rate, block_size=block_size)
     elif pipeline == PreprocessPipeline.ECGVisibilityGraph:
-        cleaned, params = ecg_clean_vgraph(sig, sampling_rate)
+        cleaned, params = ecg_clean_vgraph(sig, sampling_rate, block_size=block_size)
 
     return CleaningResult(cleaned, params, additional_params)
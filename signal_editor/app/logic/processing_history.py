@@ -0,0 +1,146 @@
+import tempfile
+import typing as t
+
+import attrs
+import numpy as np
+import numpy.typing as npt
+from loguru import logger
+
+from .. import _type_defs as _t
+from .._enums import PreprocessPipeline
+
+
+@attrs.frozen
+class ProcessingState:
+    """Snapshot of the processing related attributes of a section at a single point in its history."""
+
+    processing_pipeline: PreprocessPipeline | None = attrs.field(default=None)
+    filter_parameters: tuple[_t.SignalFilterParameters, ...] = attrs.field(default=(), converter=tuple)
+    standardization_parameters: _t.StandardizationParameters | None = attrs.field(default=None)
+    is_filtered: bool = attrs.field(default=False)
+    is_standardized: bool = attrs.field(default=False)
+    is_processed: bool = attrs.field(default=False)
+
+
+@attrs.define
+class ProcessingStep:
+    """
+    A single version of the processed signal. `signal` is `None` for the unmodified (raw) signal, otherwise it is a
+    read-only array that is either held in memory or backed by a memory-mapped scratch file.
+    """
+
+    description: str = attrs.field()
+    state: ProcessingState = attrs.field()
+    signal: npt.NDArray[np.float64] | None = attrs.field(default=None)
+    _scratch_file: t.IO[bytes] | None = attrs.field(default=None, alias="scratch_file")
+
+    @property
+    def is_spilled(self) -> bool:
+        return self._scratch_file is not None
+
+    @property
+    def nbytes_in_memory(self) -> int:
+        if self.signal is None or self.is_spilled:
+            return 0
+        return self.signal.nbytes
+
+    def spill(self) -> None:
+        """Move the signal buffer into a memory-mapped temporary file."""
+        if self.signal is None or self.is_spilled:
+            return
+        scratch_file = tempfile.TemporaryFile(prefix="signal_editor_history_")
+        writer = np.memmap(scratch_file, dtype=np.float64, mode="w+", shape=self.signal.shape)
+        writer[:] = self.signal
+        writer.flush()
+        del writer
+        self.signal = np.memmap(scratch_file, dtype=np.float64, mode="r", shape=self.signal.shape)
+        self._scratch_file = scratch_file
+
+    def release(self) -> None:
+        self.signal = None
+        if self._scratch_file is not None:
+            self._scratch_file.close()
+            self._scratch_file = None
+
+
+class ProcessingHistory:
+    """
+    Undo / redo stack for the processed signal of a section.
+
+    Every processing step stores its result as an immutable buffer, so moving between steps only swaps references.
+    Once the in-memory buffers exceed `memory_budget` bytes, the oldest steps (except the current one) are moved to
+    memory-mapped scratch files.
+    """
+
+    __slots__ = ("_steps", "_position", "memory_budget")
+
+    def __init__(self, initial_state: ProcessingState | None = None, memory_budget: int = 1024**3) -> None:
+        self.memory_budget = memory_budget
+        self._steps: list[ProcessingStep] = []
+        self._position = -1
+        self.clear(initial_state)
+
+    def __len__(self) -> int:
+        return len(self._steps)
+
+    @property
+    def current(self) -> ProcessingStep:
+        return self._steps[self._position]
+
+    @property
+    def can_undo(self) -> bool:
+        return self._position > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self._position < len(self._steps) - 1
+
+    def clear(self, initial_state: ProcessingState | None = None) -> None:
+        """Remove all steps and start over from the raw signal."""
+        for step in self._steps:
+            step.release()
+        self._steps = [ProcessingStep("Raw signal", initial_state or ProcessingState())]
+        self._position = 0
+
+    def push(self, signal: npt.NDArray[np.float64] | None, state: ProcessingState, description: str) -> None:
+        """
+        Add a new step after the current one, discarding any steps that could have been redone. The history takes
+        ownership of `signal`, which is made read-only.
+        """
+        for step in self._steps[self._position + 1 :]:
+            step.release()
+        del self._steps[self._position + 1 :]
+
+        if signal is not None:
+            signal = np.asarray(signal, dtype=np.float64)
+            signal.setflags(write=False)
+
+        self._steps.append(ProcessingStep(description, state, signal))
+        self._position += 1
+        self._enforce_memory_budget()
+
+    def undo(self) -> ProcessingStep | None:
+        if not self.can_undo:
+            return None
+        self._position -= 1
+        return self.current
+
+    def redo(self) -> ProcessingStep | None:
+        if not self.can_redo:
+            return None
+        self._position += 1
+        return self.current
+
+    def descriptions(self) -> list[str]:
+        return [step.description for step in self._steps]
+
+    def _enforce_memory_budget(self) -> None:
+        in_memory = sum(step.nbytes_in_memory for step in self._steps)
+        for i, step in enumerate(self._steps):
+            if in_memory <= self.memory_budget:
+                break
+            if i == self._position or step.nbytes_in_memory == 0:
+                continue
+            in_memory -= step.nbytes_in_memory
+            step.spill()
+            logger.debug(f"Moved processing step '{step.description}' to a memory-mapped scratch file.")
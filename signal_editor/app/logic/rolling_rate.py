@@ -0,0 +1,211 @@
+import typing as t
+
+import neurokit2 as nk
+import numpy as np
+import numpy.typing as npt
+import polars as pl
+
+from .._constants import IS_PEAK_COL, SECTION_INDEX_COL
+from .._enums import IncompleteWindowMethod
+
+
+class RollingRateWindows:
+    """
+    Per-window peak counts for the rolling rate of a section, mirroring the windows created by
+    `polars.DataFrame.group_by_dynamic` on the `section_index` column.
+
+    Instead of aggregating the `is_peak` column over every row, the peak count of each window is derived from the
+    sorted peak indices. Manual peak edits only touch the windows that overlap the edited indices, so updating the
+    rate after a click costs `O(k * period / every)` instead of a full pass over the section.
+    """
+
+    __slots__ = ("n_rows", "every", "period", "offset", "starts", "rows_in_window", "peaks_in_window")
+
+    def __init__(self, n_rows: int, every: int, period: int, offset: int = 0) -> None:
+        if every <= 0 or period <= 0:
+            raise ValueError(f"Window length and step size must be positive, got period={period}, every={every}")
+        self.n_rows = n_rows
+        self.every = every
+        self.period = period
+        self.offset = offset
+
+        # Same window placement as `group_by_dynamic(..., start_by="window")` for an index starting at 0: windows
+        # start at multiples of `every` shifted by `offset`, beginning with the last start at or before row 0. If
+        # `period > every`, windows starting before row 0 still overlap it and are kept as incomplete windows.
+        first_start = ((0 - offset) // every) * every + offset
+        starts = np.arange(first_start, n_rows, every, dtype=np.int64)
+        rows_in_window = np.minimum(starts + period, n_rows) - np.maximum(starts, 0)
+
+        # `group_by_dynamic` doesn't create windows that contain no rows
+        keep = rows_in_window > 0
+        self.starts = starts[keep]
+        self.rows_in_window = rows_in_window[keep]
+        self.peaks_in_window = np.zeros(self.starts.size, dtype=np.int64)
+
+    def matches(self, n_rows: int, every: int, period: int, offset: int) -> bool:
+        return (self.n_rows, self.every, self.period, self.offset) == (n_rows, every, period, offset)
+
+    def set_peaks(self, peaks: npt.NDArray[np.int32]) -> None:
+        """Recount the peaks in every window. `peaks` must be sorted in ascending order."""
+        lower = np.searchsorted(peaks, self.starts, side="left")
+        upper = np.searchsorted(peaks, self.starts + self.period, side="left")
+        self.peaks_in_window = (upper - lower).astype(np.int64)
+
+    def _affected_windows(self, indices: npt.NDArray[np.int32]) -> npt.NDArray[np.intp]:
+        if indices.size == 0 or self.starts.size == 0:
+            return np.empty(0, dtype=np.intp)
+        first_start = self.starts[0]
+        idx = indices.astype(np.int64)
+        # Window k covers [first_start + k * every, first_start + k * every + period)
+        k_min = -((first_start + self.period - 1 - idx) // self.every)
+        k_max = (idx - first_start) // self.every
+        max_windows_per_index = -(-self.period // self.every)
+        ks = k_min[:, None] + np.arange(max_windows_per_index)
+        valid = (ks <= k_max[:, None]) & (ks >= 0) & (ks < self.starts.size)
+        return ks[valid]
+
+    def apply_edits(
+        self,
+        added: npt.NDArray[np.int32] | None = None,
+        removed: npt.NDArray[np.int32] | None = None,
+    ) -> None:
+        """
+        Update the peak counts of the windows overlapping the given indices. The indices must be the ones that
+        actually changed, i.e. newly added peaks that weren't peaks before, and removed peaks that were.
+        """
+        if added is not None:
+            np.add.at(self.peaks_in_window, self._affected_windows(added), 1)
+        if removed is not None:
+            np.subtract.at(self.peaks_in_window, self._affected_windows(removed), 1)
+
+    def labels(self, label: t.Literal["left", "right", "datapoint"] = "datapoint") -> npt.NDArray[np.int64]:
+        if label == "left":
+            return self.starts
+        if label == "right":
+            return self.starts + self.period
+        return np.maximum(self.starts, 0)
+
+    def rate_frame(
+        self,
+        incomplete_window_method: IncompleteWindowMethod = IncompleteWindowMethod.Drop,
+        label: t.Literal["left", "right", "datapoint"] = "datapoint",
+        sampling_rate: int = 1,
+    ) -> pl.DataFrame:
+        """
+        Create the rate dataframe (`section_index`, `rate_bpm`) from the current window counts, using the same
+        handling of incomplete windows as `Section._calc_rate_rolling`.
+        """
+        peaks_in_window_to_peaks_per_minute = 60 * sampling_rate / self.period
+        labels = self.labels(label)
+        is_complete = self.rows_in_window == self.period
+
+        if incomplete_window_method == IncompleteWindowMethod.Drop:
+            labels = labels[is_complete]
+            rate = self.peaks_in_window[is_complete] * peaks_in_window_to_peaks_per_minute
+        elif incomplete_window_method == IncompleteWindowMethod.Approximate:
+            rate = (self.peaks_in_window * self.period / self.rows_in_window) * peaks_in_window_to_peaks_per_minute
+        else:
+            rate = np.where(is_complete, self.peaks_in_window * peaks_in_window_to_peaks_per_minute, np.nan)
+
+        out = pl.DataFrame(
+            {SECTION_INDEX_COL: labels, "rate_bpm": rate},
+            schema={SECTION_INDEX_COL: pl.Int32, "rate_bpm": pl.Float64},
+        )
+        if incomplete_window_method == IncompleteWindowMethod.RepeatLast:
+            out = out.with_columns(pl.col("rate_bpm").fill_nan(None).forward_fill())
+        return out
+
+
+def instantaneous_rate(peaks: npt.NDArray[np.int32], sampling_rate: int, n_rows: int) -> pl.DataFrame:
+    """
+    Rate (per minute) at every row of a signal with `n_rows` rows, interpolated between the `peaks`. See
+    `neurokit2.signal_rate` for more details.
+    """
+    inst_rate = nk.signal_rate(peaks, sampling_rate=sampling_rate, desired_length=n_rows)  # type: ignore
+    return pl.DataFrame(
+        {SECTION_INDEX_COL: pl.int_range(n_rows, dtype=pl.Int32, eager=True), "rate_bpm": inst_rate},
+        schema_overrides={SECTION_INDEX_COL: pl.Int32, "rate_bpm": pl.Float64},
+    )
+
+
+def rolling_rate(
+    data: pl.DataFrame | pl.LazyFrame,
+    sampling_rate: int,
+    grp_col: str = SECTION_INDEX_COL,
+    info_column: str | None = None,
+    sec_new_window_every: int = 10,
+    sec_window_length: int = 60,
+    sec_start_at: int = 0,
+    full_info: bool = False,
+    label: t.Literal["left", "right", "datapoint"] = "datapoint",
+    incomplete_window_method: IncompleteWindowMethod = IncompleteWindowMethod.Drop,
+) -> pl.DataFrame:
+    """
+    Rate (per minute) in rolling windows over the `is_peak` column of `data`. With `full_info`, the number of peaks
+    and rows in each window and summary statistics of `info_column` are included as well.
+    """
+    every = sec_new_window_every * sampling_rate
+    period = sec_window_length * sampling_rate
+    offset = sec_start_at * sampling_rate
+
+    samples_in_minute = 60 * sampling_rate
+    peaks_in_window_to_peaks_per_minute = samples_in_minute / period
+    # Sampling rate: 400 Hz, window length: 90 seconds:
+    # samples_in_minute = 60 * 400 = 24000
+    # period = 90 * 400 = 36000
+    # peaks_in_window_to_peaks_per_minute = 24000 / 36000 = 0.666
+    # rate_bpm = peaks_in_window * 0.666
+
+    rr_df = (
+        data.lazy()
+        .sort(grp_col)
+        .with_columns(pl.col(grp_col).cast(pl.Int64))
+        .group_by_dynamic(
+            pl.col(grp_col),
+            every=f"{every}i",
+            period=f"{period}i",
+            offset=f"{offset}i",
+            label=label,
+        )
+    )
+    if info_column is not None and full_info:
+        rr_df = rr_df.agg(
+            pl.sum(IS_PEAK_COL).alias("peaks_in_window"),
+            pl.len().alias("rows_in_window"),
+            pl.mean(info_column).round(1).name.suffix("_mean"),
+            pl.std(info_column).name.suffix("_std"),
+            pl.min(info_column).name.suffix("_min"),
+            pl.max(info_column).name.suffix("_max"),
+            pl.var(info_column).name.suffix("_var"),
+        )
+    else:
+        rr_df = rr_df.agg(
+            pl.sum(IS_PEAK_COL).alias("peaks_in_window"),
+            pl.len().alias("rows_in_window"),
+        )
+
+    if incomplete_window_method == IncompleteWindowMethod.Drop:
+        rr_df = rr_df.filter(pl.col("rows_in_window") == period).with_columns(
+            (pl.col("peaks_in_window") * peaks_in_window_to_peaks_per_minute).alias("rate_bpm")
+        )
+    elif incomplete_window_method == IncompleteWindowMethod.Approximate:
+        rr_df = rr_df.with_columns(
+            (
+                (pl.col("peaks_in_window") * period / pl.col("rows_in_window")) * peaks_in_window_to_peaks_per_minute
+            ).alias("rate_bpm")
+        )
+    elif incomplete_window_method == IncompleteWindowMethod.RepeatLast:
+        rr_df = rr_df.with_columns(
+            (
+                pl.when(pl.col("rows_in_window") != period).then(None).otherwise(pl.col("peaks_in_window"))
+                * peaks_in_window_to_peaks_per_minute
+            ).alias("rate_bpm")
+        ).with_columns(pl.col("rate_bpm").forward_fill())
+
+    if not full_info:
+        rr_df = rr_df.select(
+            pl.col(grp_col).cast(pl.Int32),
+            pl.col("rate_bpm").cast(pl.Float64),
+        )
+
+    return rr_df.collect().shrink_to_fit()
@@ -1,13 +1,12 @@
 import pprint
 import re
+import time
 import typing as t
 
 import attrs
-import neurokit2 as nk
 import numpy as np
 import numpy.typing as npt
 import polars as pl
-import polars.selectors as ps
 from loguru import logger
 
 from .. import _type_defs as _t
@@ -20,8 +19,13 @@ from .._enums import (
     RateComputationMethod,
 )
 from ..utils import format_long_sequence
-from .peak_detection import find_peaks
+from .batch_processing import ProcessingRecipe, RecipeResult
+from .file_cache import PeakDetectionCache, signal_digest
+from .peak_detection import ExtremaIndex, find_peaks, find_peaks_blockwise
 from .processing import apply_cleaning_pipeline, filter_signal, standardize_signal
+from .processing_history import ProcessingHistory, ProcessingState, ProcessingStep
+from .rolling_rate import RollingRateWindows, instantaneous_rate, rolling_rate
+from .signal_pyramid import MinMaxPyramid
 
 
 @attrs.define
@@ -61,56 +65,73 @@ class ProcessingParameters:
         return pprint.pformat(self.to_dict(), indent=2, width=120, underscore_numbers=True)
 
 
-@attrs.define
+def _as_index_array(value: int | t.Sequence[int] | pl.Series | npt.NDArray[np.integer[t.Any]]) -> npt.NDArray[np.int32]:
+    if isinstance(value, pl.Series):
+        value = value.to_numpy()
+    return np.unique(np.asarray(value, dtype=np.int32).ravel())
+
+
+@attrs.frozen
+class PeakEditOperation:
+    """Single entry in the manual peak edit journal."""
+
+    timestamp: float = attrs.field()
+    action: t.Literal["add", "remove", "clear"] = attrs.field()
+    indices: npt.NDArray[np.int32] = attrs.field(eq=False)
+
+
+@attrs.define(eq=False)
 class ManualPeakEdits:
-    added: list[int] = attrs.field(factory=list)
-    removed: list[int] = attrs.field(factory=list)
+    """
+    Net manually added / removed peaks, stored as sorted unique `int32` arrays, plus an append-only journal of every
+    edit operation. Adding a previously removed peak (or vice versa) cancels the earlier edit.
+    """
+
+    added: npt.NDArray[np.int32] = attrs.field(factory=lambda: np.empty(0, dtype=np.int32))
+    removed: npt.NDArray[np.int32] = attrs.field(factory=lambda: np.empty(0, dtype=np.int32))
+    journal: list[PeakEditOperation] = attrs.field(factory=list)
 
     def __repr__(self) -> str:
-        return f"Added Peaks [{len(self.added)}]: {format_long_sequence(self.added)}\nRemoved Peaks [{len(self.removed)}]: {format_long_sequence(self.removed)}"
+        return f"Added Peaks [{len(self.added)}]: {format_long_sequence(self.added.tolist())}\nRemoved Peaks [{len(self.removed)}]: {format_long_sequence(self.removed.tolist())}"
 
-    def clear(self) -> None:
-        self.added.clear()
-        self.removed.clear()
+    def __len__(self) -> int:
+        """Number of net edits (added + removed peaks)."""
+        return self.added.size + self.removed.size
 
-    def new_added(self, value: int | t.Sequence[int] | pl.Series) -> None:
-        if isinstance(value, int):
-            if value in self.removed:
-                self.removed.remove(value)
-            else:
-                self.added.append(value)
-        else:
-            for v in value:
-                if v in self.removed:
-                    self.removed.remove(v)
-                else:
-                    self.added.append(v)
-
-    def new_removed(self, value: int | t.Sequence[int] | pl.Series) -> None:
-        if isinstance(value, int):
-            if value in self.added:
-                self.added.remove(value)
-            else:
-                self.removed.append(value)
-        else:
-            for v in value:
-                if v in self.added:
-                    self.added.remove(v)
-                else:
-                    self.removed.append(v)
+    def _log(self, action: t.Literal["add", "remove", "clear"], indices: npt.NDArray[np.int32]) -> None:
+        self.journal.append(PeakEditOperation(time.time(), action, indices))
 
-    def sort_and_deduplicate(self) -> None:
-        self.added = sorted(set(self.added))
-        self.removed = sorted(set(self.removed))
+    def clear(self) -> None:
+        if len(self) > 0:
+            self._log("clear", np.empty(0, dtype=np.int32))
+        self.added = np.empty(0, dtype=np.int32)
+        self.removed = np.empty(0, dtype=np.int32)
+
+    def new_added(self, value: int | t.Sequence[int] | pl.Series | npt.NDArray[np.int32]) -> None:
+        values = _as_index_array(value)
+        if values.size == 0:
+            return
+        self._log("add", values)
+        was_removed = np.isin(values, self.removed, assume_unique=True)
+        self.removed = np.setdiff1d(self.removed, values[was_removed], assume_unique=True)
+        self.added = np.union1d(self.added, values[~was_removed]).astype(np.int32)
+
+    def new_removed(self, value: int | t.Sequence[int] | pl.Series | npt.NDArray[np.int32]) -> None:
+        values = _as_index_array(value)
+        if values.size == 0:
+            return
+        self._log("remove", values)
+        was_added = np.isin(values, self.added, assume_unique=True)
+        self.added = np.setdiff1d(self.added, values[was_added], assume_unique=True)
+        self.removed = np.union1d(self.removed, values[~was_added]).astype(np.int32)
 
     def get_joined(self) -> list[int]:
-        return sorted(set(self.added) | set(self.removed))
+        return np.union1d(self.added, self.removed).tolist()
 
     def to_dict(self) -> _t.ManualPeakEditsDict:
-        self.sort_and_deduplicate()
         return _t.ManualPeakEditsDict(
-            added=self.added,
-            removed=self.removed,
+            added=self.added.tolist(),
+            removed=self.removed.tolist(),
         )
 
 
@@ -211,12 +232,23 @@ class Section:
         "_is_filtered",
         "_is_standardized",
         "_is_processed",
-        "data",
+        "_data",
+        "_processed",
+        "_data_view",
+        "_peaks",
+        "_peaks_version",
+        "_processed_version",
+        "_derived_peak_cache",
+        "_signal_digest",
+        "_extrema_index",
+        "_signal_pyramid",
         "sampling_rate",
         "global_bounds",
         "_result_data",
         "_rate_is_synced",
+        "_rate_windows",
         "_processing_parameters",
+        "_processing_history",
         "_manual_peak_edits",
     )
 
@@ -229,36 +261,78 @@ class Section:
         self._is_standardized: bool = False
         self._is_processed: bool = False  # flag to indicate if the section has been processed using a pipeline
 
-        if SECTION_INDEX_COL in data.columns:
-            data.drop_in_place(SECTION_INDEX_COL)
-
-        self.data = (
-            data.with_row_index(SECTION_INDEX_COL)
-            .lazy()
-            .select(ps.by_name(INDEX_COL, SECTION_INDEX_COL).cast(pl.Int32), ~ps.by_name(INDEX_COL, SECTION_INDEX_COL))
-            .set_sorted(INDEX_COL)
-            .set_sorted(SECTION_INDEX_COL)
-            .with_columns(
-                pl.col(signal_name).alias(self.processed_signal_name),
-                pl.lit(0, pl.Int8).alias(IS_PEAK_COL),
-                pl.lit(0, pl.Int8).alias(IS_MANUAL_COL),
-            )
-            .collect()
-        )
+        # Only references the columns of `data` (usually a zero-copy slice of the base dataframe). The section index
+        # is computed from the row position, and the processed signal is only allocated once it is modified.
+        self._data = data.drop(
+            SECTION_INDEX_COL, self.processed_signal_name, IS_PEAK_COL, IS_MANUAL_COL, strict=False
+        ).rechunk()
+        self._processed: pl.Series | None = None
+        self._data_view: pl.DataFrame | None = None
+
+        # Sorted, unique section indices of all peaks. This is the source of truth for peak locations, the
+        # `is_peak` column is only created when the dataframe is requested through `data`.
+        self._peaks: npt.NDArray[np.int32] = np.empty(0, dtype=np.int32)
+        # Bumped whenever the peaks / the processed signal change, used to invalidate cached values derived from them
+        self._peaks_version = 0
+        self._processed_version = 0
+        self._derived_peak_cache: dict[str, tuple[tuple[int, int], t.Any]] = {}
+        self._signal_digest: tuple[int, str] | None = None
+        self._extrema_index: tuple[int, ExtremaIndex] | None = None
+        self._signal_pyramid: tuple[int, MinMaxPyramid] | None = None
 
         self.sampling_rate = Config.internal.last_sampling_rate
         self.global_bounds: tuple[int, int] = (
-            self.data.item(0, INDEX_COL),
-            self.data.item(-1, INDEX_COL),
+            self._data.item(0, INDEX_COL),
+            self._data.item(-1, INDEX_COL),
         )
 
         self._rate_is_synced = False
+        self._rate_windows: RollingRateWindows | None = None
 
         self._result_data = SectionResult()
 
         self._processing_parameters = ProcessingParameters(self.sampling_rate)
+        self._processing_history = ProcessingHistory(
+            memory_budget=Config.editing.processing_history_memory_budget * 1024**2
+        )
         self._manual_peak_edits = ManualPeakEdits()
 
+    @property
+    def data(self) -> pl.DataFrame:
+        """
+        The complete section dataframe, with the section index, processed signal, and peak / manual edit indicator
+        columns. Built from the underlying columns when first requested after a change.
+        """
+        if self._data_view is None:
+            peak_mask = np.zeros(self._data.height, dtype=np.int8)
+            peak_mask[self._peaks] = 1
+            manual_mask = np.zeros(self._data.height, dtype=np.int8)
+            manual_mask[self._manual_peak_edits.added] = 1
+            manual_mask[self._manual_peak_edits.removed] = -1
+
+            self._data_view = (
+                self._data.lazy()
+                .select(
+                    pl.col(INDEX_COL).cast(pl.Int32),
+                    pl.int_range(pl.len(), dtype=pl.Int32).alias(SECTION_INDEX_COL),
+                    pl.exclude(INDEX_COL),
+                )
+                .set_sorted(INDEX_COL)
+                .set_sorted(SECTION_INDEX_COL)
+                .collect()
+                .with_columns(
+                    self.processed_signal.alias(self.processed_signal_name),
+                    pl.Series(IS_PEAK_COL, peak_mask, pl.Int8),
+                    pl.Series(IS_MANUAL_COL, manual_mask, pl.Int8),
+                )
+            )
+        return self._data_view
+
+    @property
+    def section_index(self) -> pl.Series:
+        """The row positions of the section, starting at 0."""
+        return pl.int_range(self._data.height, dtype=pl.Int32, eager=True).alias(SECTION_INDEX_COL)
+
     @property
     def rate_data(self) -> pl.DataFrame:
         return self._result_data.rate_data
@@ -299,12 +373,119 @@ class Section:
     @property
     def raw_signal(self) -> pl.Series:
         """The raw (unprocessed) signal data for the section."""
-        return self.data.get_column(self.signal_name)
+        return self._data.get_column(self.signal_name)
 
     @property
     def processed_signal(self) -> pl.Series:
         """The processed (filtered, standardized, etc) signal data for the section."""
-        return self.data.get_column(self.processed_signal_name)
+        if self._processed is None:
+            return self.raw_signal.alias(self.processed_signal_name)
+        return self._processed
+
+    def _set_processed_signal(self, values: pl.Series | npt.NDArray[np.float64] | None) -> None:
+        self._processed = None if values is None else pl.Series(self.processed_signal_name, values, pl.Float64)
+        self._processed_version += 1
+        self._data_view = None
+
+    @property
+    def processed_signal_version(self) -> int:
+        """Counter that is incremented every time the processed signal changes."""
+        return self._processed_version
+
+    @property
+    def processed_signal_digest(self) -> str:
+        """Hash of the processed signal, only recomputed after the processed signal version changed."""
+        if self._signal_digest is None or self._signal_digest[0] != self._processed_version:
+            digest = signal_digest(self.processed_signal.to_numpy(allow_copy=False))
+            self._signal_digest = (self._processed_version, digest)
+        return self._signal_digest[1]
+
+    @property
+    def extrema_index(self) -> ExtremaIndex:
+        """Positions of the local extrema of the processed signal, rebuilt after the processed signal version changed."""
+        if self._extrema_index is None or self._extrema_index[0] != self._processed_version:
+            index = ExtremaIndex.from_signal(self.processed_signal.to_numpy(allow_copy=False))
+            self._extrema_index = (self._processed_version, index)
+        return self._extrema_index[1]
+
+    @property
+    def signal_pyramid(self) -> MinMaxPyramid:
+        """Min / max envelopes of the processed signal for plotting, rebuilt after the processed signal changed."""
+        if self._signal_pyramid is None or self._signal_pyramid[0] != self._processed_version:
+            pyramid = MinMaxPyramid.from_signal(self.processed_signal.to_numpy(allow_copy=False))
+            self._signal_pyramid = (self._processed_version, pyramid)
+        return self._signal_pyramid[1]
+
+    @property
+    def peaks_version(self) -> int:
+        """Counter that is incremented every time the peaks change."""
+        return self._peaks_version
+
+    def _set_peak_indices(self, peaks: npt.NDArray[np.int32]) -> None:
+        peaks.setflags(write=False)
+        self._peaks = peaks
+        self._peaks_version += 1
+        self._data_view = None
+
+    def _get_cached[T](self, key: str, factory: t.Callable[[], T], depends_on_signal: bool = False) -> T:
+        version = (self._peaks_version, self._processed_version if depends_on_signal else -1)
+        cached = self._derived_peak_cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        value = factory()
+        self._derived_peak_cache[key] = (version, value)
+        return value
+
+    @property
+    def can_undo_processing(self) -> bool:
+        return self._processing_history.can_undo
+
+    @property
+    def can_redo_processing(self) -> bool:
+        return self._processing_history.can_redo
+
+    def _get_processing_state(self) -> ProcessingState:
+        return ProcessingState(
+            processing_pipeline=self._processing_parameters.processing_pipeline,
+            filter_parameters=self._processing_parameters.filter_parameters,
+            standardization_parameters=self._processing_parameters.standardization_parameters,
+            is_filtered=self._is_filtered,
+            is_standardized=self._is_standardized,
+            is_processed=self._is_processed,
+        )
+
+    def _add_processing_step(self, values: npt.NDArray[np.float64], description: str) -> None:
+        self._processing_history.push(values, self._get_processing_state(), description)
+        self._set_processed_signal(self._processing_history.current.signal)
+
+    def _restore_processing_step(self, step: ProcessingStep) -> None:
+        state = step.state
+        self._processing_parameters.processing_pipeline = state.processing_pipeline
+        self._processing_parameters.filter_parameters = list(state.filter_parameters)
+        self._processing_parameters.standardization_parameters = state.standardization_parameters
+        self._is_filtered = state.is_filtered
+        self._is_standardized = state.is_standardized
+        self._is_processed = state.is_processed
+        self._set_processed_signal(step.signal)
+
+    def undo_processing(self) -> bool:
+        """
+        Go back to the processed signal (and processing parameters) before the last filter / standardization step.
+        Returns False if there is nothing to undo.
+        """
+        step = self._processing_history.undo()
+        if step is None:
+            return False
+        self._restore_processing_step(step)
+        return True
+
+    def redo_processing(self) -> bool:
+        """Re-apply the last undone processing step. Returns False if there is nothing to redo."""
+        step = self._processing_history.redo()
+        if step is None:
+            return False
+        self._restore_processing_step(step)
+        return True
 
     @property
     def is_filtered(self) -> bool:
@@ -324,23 +505,19 @@ class Section:
     @property
     def peaks_local(self) -> pl.Series:
         """Returns the indices of the peaks in the processed signal."""
-        return (
-            self.data.lazy()
-            .filter(pl.col(IS_PEAK_COL) == 1)
-            .select(SECTION_INDEX_COL)
-            .collect()
-            .get_column(SECTION_INDEX_COL)
-        )
+        return self._get_cached("peaks_local", lambda: pl.Series(SECTION_INDEX_COL, self._peaks, pl.Int32))
 
     @property
     def peaks_global(self) -> pl.Series:
         """Returns the indices of the peaks relative to the entire signal."""
-        return self.data.lazy().filter(pl.col(IS_PEAK_COL) == 1).select(INDEX_COL).collect().get_column(INDEX_COL)
+        # The global index is contiguous, so the global positions are just the local ones shifted by the section start
+        return self._get_cached(
+            "peaks_global", lambda: (self.peaks_local + self.global_bounds[0]).cast(pl.Int32).alias(INDEX_COL)
+        )
 
     @property
     def manual_peak_edits(self) -> ManualPeakEdits:
         """Object holding information about manually added/removed peaks."""
-        self._manual_peak_edits.sort_and_deduplicate()
         return self._manual_peak_edits
 
     def filter_signal(
@@ -379,6 +556,7 @@ class Section:
             sig_data = self.raw_signal.to_numpy(allow_copy=False)
         else:
             sig_data = self.processed_signal.to_numpy(allow_copy=False)
+        block_size = Config.editing.filter_block_size or None
         method = kwargs.get("method", None)
         filter_params: _t.SignalFilterParameters = {}
         additional_params: _t.SignalFilterParameters | None = None
@@ -388,10 +566,10 @@ class Section:
             if method is None:
                 filtered = sig_data
             else:
-                filtered, filter_params = filter_signal(sig_data, self.sampling_rate, **kwargs)
+                filtered, filter_params = filter_signal(sig_data, self.sampling_rate, block_size=block_size, **kwargs)
                 self._is_filtered = True
         else:
-            result = apply_cleaning_pipeline(sig_data, self.sampling_rate, pipeline)
+            result = apply_cleaning_pipeline(sig_data, self.sampling_rate, pipeline, block_size)
             filtered = result.cleaned
             filter_params = result.parameters
             additional_params = result.additional_parameters
@@ -402,7 +580,8 @@ class Section:
         if additional_params is not None:
             self._processing_parameters.filter_parameters.append(additional_params)
 
-        self.data = self.data.with_columns(pl.Series(self.processed_signal_name, filtered))
+        description = f"Pipeline ({pipeline})" if pipeline is not None else f"Filter ({method})"
+        self._add_processing_step(filtered, description)
 
     def standardize_signal(self, **kwargs: t.Unpack[_t.StandardizationParameters]) -> None:
         """
@@ -411,7 +590,7 @@ class Section:
         Parameters
         ----------
         robust : bool
-            If True, uses median absolute deviation (MAD) instead of standard deviation
+            If True, uses the median and median absolute deviation (MAD) instead of mean and standard deviation
         window_size : int
             If using rolling standardization, the window size to use
         """
@@ -420,20 +599,16 @@ class Section:
             return
         window_size = kwargs.get("window_size", None)
         robust = kwargs.get("robust", False)
-        if robust and window_size:
-            window_size = None
 
         standardized = standardize_signal(self.processed_signal, robust=robust, window_size=window_size)
 
-        self.data = self.data.with_columns(
-            standardized.replace([float("inf"), float("-inf")], None)
-            .fill_nan(None)
-            .fill_null(strategy="backward")
-            .alias(self.processed_signal_name)
+        standardized = (
+            standardized.replace([float("inf"), float("-inf")], None).fill_nan(None).fill_null(strategy="backward")
         )
         self._is_standardized = True
 
         self._processing_parameters.standardization_parameters = kwargs
+        self._add_processing_step(standardized.to_numpy(), f"Standardization ({kwargs.get('method')})")
 
     @logger.catch(message="Peak detection failed. Please check the parameters and try again.")
     def detect_peaks(
@@ -442,9 +617,11 @@ class Section:
         method_parameters: _t.PeakDetectionMethodParameters,
         *,
         rr_params: _t.RollingRateKwargsDict | None = None,
+        cache: PeakDetectionCache | None = None,
     ) -> None:
         """
-        Find peaks in the processed signal using the specified method and parameters.
+        Find peaks in the processed signal using the specified method and parameters. Signals longer than the
+        configured peak detection block size are processed block-wise, see `find_peaks_blockwise`.
 
         Parameters
         ----------
@@ -452,13 +629,38 @@ class Section:
             The method to use for peak detection
         method_parameters : PeakDetectionMethodParameters
             The parameters to use for the peak detection method
+        cache : PeakDetectionCache, optional
+            Cache to look up and store the detected peaks in
         """
-        peaks = find_peaks(
-            self.processed_signal.to_numpy(allow_copy=False),
-            self.sampling_rate,
-            method,
-            method_parameters,
-        )
+        sig = self.processed_signal.to_numpy(allow_copy=False)
+        block_size = Config.editing.peak_detection_block_size
+        if not block_size or sig.size <= block_size:
+            block_size = 0
+
+        # Results are stored by the hash of the processed signal, so any change to the signal invalidates them
+        cache_key = None
+        peaks = None
+        if cache is not None and cache.enabled:
+            cache_key = cache.key(
+                self.processed_signal_digest, self.sampling_rate, method, method_parameters, block_size=block_size
+            )
+            peaks = cache.get(cache_key)
+        if peaks is not None:
+            logger.debug(f"Using cached peaks for {method} with parameters {method_parameters}.")
+        else:
+            if block_size:
+                peaks = find_peaks_blockwise(
+                    sig,
+                    self.sampling_rate,
+                    method,
+                    method_parameters,
+                    block_size,
+                    max_workers=Config.editing.batch_max_workers or None,
+                )
+            else:
+                peaks = find_peaks(sig, self.sampling_rate, method, method_parameters)
+            if cache is not None and cache_key is not None:
+                cache.put(cache_key, peaks)
 
         self._processing_parameters.peak_detection_method = method
         self._processing_parameters.peak_detection_method_parameters = method_parameters
@@ -473,8 +675,8 @@ class Section:
         rr_params: _t.RollingRateKwargsDict | None = None,
     ) -> None:
         """
-        Sets the `is_peak` column in `self.data` to 1 at the indices provided in `peaks`, and to 0
-        everywhere else.
+        Replaces the current peaks with the indices provided in `peaks`. The `is_peak` column in `self.data` is set
+        to 1 at these indices, and to 0 everywhere else.
 
         Parameters
         ----------
@@ -483,17 +685,8 @@ class Section:
         update_rate : bool
             Whether to recalculate the signal rate based on the new peaks. Defaults to True.
         """
-        peaks = peaks[peaks >= 0]
-
-        pl_peaks = pl.Series("", peaks, pl.Int32)
-
-        self.data = self.data.with_columns(
-            pl.when(pl.col(SECTION_INDEX_COL).is_in(pl_peaks))
-            .then(pl.lit(1))
-            .otherwise(pl.lit(0))
-            .cast(pl.Int8)
-            .alias(IS_PEAK_COL)
-        )
+        self._set_peak_indices(np.unique(self._valid_peak_indices(peaks)))
+        self._rate_windows = None
 
         self.manual_peak_edits.clear()
         self._rate_is_synced = False
@@ -509,8 +702,11 @@ class Section:
         rr_params: _t.RollingRateKwargsDict | None = None,
     ) -> None:
         """
-        Updates the `is_peak` column in `self.data` at the given indices according to the provided
-        action, while keeping the rest of the column values the same.
+        Adds or removes the given peak indices, while keeping all other peaks the same.
+
+        The edit is applied to the sorted peak index array via binary search, so the cost depends only on the number
+        of edited and existing peaks, not on the length of the section. The `is_peak` column in `self.data` is
+        updated the next time the dataframe is accessed.
 
         Parameters
         ----------
@@ -525,35 +721,36 @@ class Section:
             Whether to recalculate the signal rate based on the new peaks. Defaults to True.
 
         """
-        pl_peaks = pl.Series("peaks", peaks, pl.Int32)
-        then_value = 1 if action in ["a", "add"] else 0
-
-        updated_data = (
-            self.data.lazy()
-            .select(
-                pl.when(pl.col(SECTION_INDEX_COL).is_in(pl_peaks))
-                .then(pl.lit(then_value))
-                .otherwise(pl.col(IS_PEAK_COL))
-                .cast(pl.Int8)
-                .alias(IS_PEAK_COL)
-            )
-            .collect()
-            .get_column(IS_PEAK_COL)
-        )
-
-        changed_indices = pl.arg_where(updated_data != self.data.get_column(IS_PEAK_COL), eager=True)
-
-        self.data = self.data.with_columns(is_peak=updated_data)
-
-        if action == "add":
+        candidates = np.unique(self._valid_peak_indices(peaks))
+        positions = np.searchsorted(self._peaks, candidates)
+        in_bounds = positions < self._peaks.size
+        is_existing = np.zeros(candidates.size, dtype=np.bool_)
+        is_existing[in_bounds] = self._peaks[positions[in_bounds]] == candidates[in_bounds]
+
+        if action in ["a", "add"]:
+            changed_indices = candidates[~is_existing]
+            new_peaks = np.insert(self._peaks, positions[~is_existing], changed_indices)
             self.manual_peak_edits.new_added(changed_indices)
+            if self._rate_windows is not None:
+                self._rate_windows.apply_edits(added=changed_indices)
         else:
+            changed_indices = candidates[is_existing]
+            new_peaks = np.delete(self._peaks, positions[is_existing])
             self.manual_peak_edits.new_removed(changed_indices)
+            if self._rate_windows is not None:
+                self._rate_windows.apply_edits(removed=changed_indices)
+
+        if changed_indices.size > 0:
+            self._set_peak_indices(new_peaks)
 
         self._rate_is_synced = False
-        if update_rate and self.peaks_local.len() > 3:
+        if update_rate and self._peaks.size > 3:
             self.update_rate_data(rr_params=rr_params)
 
+    def _valid_peak_indices(self, peaks: npt.ArrayLike) -> npt.NDArray[np.int32]:
+        peaks = np.asarray(peaks, dtype=np.int32).ravel()
+        return peaks[(peaks >= 0) & (peaks < self._data.height)]
+
     def update_rate_data(
         self, full_info: bool = False, force: bool = False, *, rr_params: _t.RollingRateKwargsDict | None = None
     ) -> None:
@@ -602,12 +799,7 @@ class Section:
             return
         if desired_length is None:
             desired_length = len(self.processed_signal)
-        inst_rate = nk.signal_rate(peaks, sampling_rate=self.sampling_rate, desired_length=desired_length)  # type: ignore
-
-        self.rate_data = pl.DataFrame(
-            {SECTION_INDEX_COL: self.data.get_column(SECTION_INDEX_COL), "rate_bpm": inst_rate},
-            schema_overrides={SECTION_INDEX_COL: pl.Int32, "rate_bpm": pl.Float64},
-        )
+        self.rate_data = instantaneous_rate(peaks, self.sampling_rate, desired_length)
 
     def _calc_rate_rolling(
         self,
@@ -621,73 +813,31 @@ class Section:
     ) -> None:
         sampling_rate = self.sampling_rate
 
-        every = sec_new_window_every * sampling_rate
-        period = sec_window_length * sampling_rate
-        offset = sec_start_at * sampling_rate
-
-        samples_in_minute = 60 * sampling_rate
-        peaks_in_window_to_peaks_per_minute = samples_in_minute / period
-        # Sampling rate: 400 Hz, window length: 90 seconds:
-        # samples_in_minute = 60 * 400 = 24000
-        # period = 90 * 400 = 36000
-        # peaks_in_window_to_peaks_per_minute = 24000 / 36000 = 0.666
-        # rate_bpm = peaks_in_window * 0.666
-
-        rr_df = (
-            self.data.lazy()
-            .sort(grp_col)
-            .with_columns(pl.col(grp_col).cast(pl.Int64))
-            .group_by_dynamic(
-                pl.col(grp_col),
-                every=f"{every}i",
-                period=f"{period}i",
-                offset=f"{offset}i",
-                label=label,
-            )
-        )
-        if (self.info_name in self.data.columns) and full_info:
-            info_col = self.info_name
-            rr_df = rr_df.agg(
-                pl.sum(IS_PEAK_COL).alias("peaks_in_window"),
-                pl.len().alias("rows_in_window"),
-                pl.mean(info_col).round(1).name.suffix("_mean"),
-                pl.std(info_col).name.suffix("_std"),
-                pl.min(info_col).name.suffix("_min"),
-                pl.max(info_col).name.suffix("_max"),
-                pl.var(info_col).name.suffix("_var"),
-            )
-        else:
-            rr_df = rr_df.agg(
-                pl.sum(IS_PEAK_COL).alias("peaks_in_window"),
-                pl.len().alias("rows_in_window"),
-            )
-
-        if incomplete_window_method == IncompleteWindowMethod.Drop:
-            rr_df = rr_df.filter(pl.col("rows_in_window") == period).with_columns(
-                (pl.col("peaks_in_window") * peaks_in_window_to_peaks_per_minute).alias("rate_bpm")
-            )
-        elif incomplete_window_method == IncompleteWindowMethod.Approximate:
-            rr_df = rr_df.with_columns(
-                (
-                    (pl.col("peaks_in_window") * period / pl.col("rows_in_window"))
-                    * peaks_in_window_to_peaks_per_minute
-                ).alias("rate_bpm")
-            )
-        elif incomplete_window_method == IncompleteWindowMethod.RepeatLast:
-            rr_df = rr_df.with_columns(
-                (
-                    pl.when(pl.col("rows_in_window") != period).then(None).otherwise(pl.col("peaks_in_window"))
-                    * peaks_in_window_to_peaks_per_minute
-                ).alias("rate_bpm")
-            ).with_columns(pl.col("rate_bpm").forward_fill())
-
-        if not full_info:
-            rr_df = rr_df.select(
-                pl.col(grp_col).cast(pl.Int32),
-                pl.col("rate_bpm").cast(pl.Float64),
-            )
+        if not full_info and grp_col == SECTION_INDEX_COL:
+            # Use the cached per-window peak counts, which are kept up to date by `update_peaks`
+            every = sec_new_window_every * sampling_rate
+            period = sec_window_length * sampling_rate
+            offset = sec_start_at * sampling_rate
+            rate_windows = self._rate_windows
+            if rate_windows is None or not rate_windows.matches(self._data.height, every, period, offset):
+                rate_windows = RollingRateWindows(self._data.height, every, period, offset)
+                rate_windows.set_peaks(self._peaks)
+                self._rate_windows = rate_windows
+            self.rate_data = rate_windows.rate_frame(incomplete_window_method, label, sampling_rate)
+            return
 
-        self.rate_data = rr_df.collect().shrink_to_fit()
+        self.rate_data = rolling_rate(
+            self.data,
+            sampling_rate,
+            grp_col=grp_col,
+            info_column=self.info_name if self.info_name in self._data.columns else None,
+            sec_new_window_every=sec_new_window_every,
+            sec_window_length=sec_window_length,
+            sec_start_at=sec_start_at,
+            full_info=full_info,
+            label=label,
+            incomplete_window_method=incomplete_window_method,
+        )
 
     def get_mean_rate_per_temperature(self) -> pl.DataFrame:
         info_col = self.info_name
@@ -703,20 +853,6 @@ class Section:
             .sort(f"{info_col}_mean")
         )
 
-    def _add_manual_peak_edits_column(self) -> None:
-        pl_added = pl.Series("added", self.manual_peak_edits.added, pl.Int32)
-        pl_removed = pl.Series("removed", self.manual_peak_edits.removed, pl.Int32)
-
-        self.data = self.data.with_columns(
-            pl.when(pl.col(SECTION_INDEX_COL).is_in(pl_added))
-            .then(pl.lit(1))
-            .when(pl.col(SECTION_INDEX_COL).is_in(pl_removed))
-            .then(pl.lit(-1))
-            .otherwise(pl.lit(0))
-            .cast(pl.Int8)
-            .alias(IS_MANUAL_COL)
-        )
-
     def get_metadata(self) -> SectionMetadata:
         return SectionMetadata(
             signal_name=self.signal_name,
@@ -728,14 +864,10 @@ class Section:
         )
 
     def get_peak_pos(self) -> pl.DataFrame:
-        return (
-            self.data.lazy()
-            .filter(pl.col(IS_PEAK_COL) == 1)
-            .select(
-                pl.col(SECTION_INDEX_COL),
-                pl.col(self.processed_signal_name),
-            )
-            .collect()
+        return self._get_cached(
+            "peak_pos",
+            lambda: pl.DataFrame([self.peaks_local, self.processed_signal.gather(self._peaks)]),
+            depends_on_signal=True,
         )
 
     def lock_result(self, *, rr_params: _t.RollingRateKwargsDict | None = None) -> None:
@@ -745,7 +877,6 @@ class Section:
 
     def get_result(self) -> DetailedSectionResult:
         metadata = self.get_metadata()
-        self._add_manual_peak_edits_column()
         section_df = self.data
         manual_edits = self.manual_peak_edits
 
@@ -801,9 +932,9 @@ class Section:
         if include_intervals:
             peak_df = peak_df.with_columns(section_peaks.diff().fill_null(0).alias("peak_intervals"))
 
-        if self.info_name in self.data.columns and include_info:
+        if self.info_name in self._data.columns and include_info:
             peak_df = peak_df.with_columns(
-                self.data.get_column(self.info_name).gather(section_peaks).alias(self.info_name)
+                self._data.get_column(self.info_name).gather(section_peaks).alias(self.info_name)
             )
 
         self.peak_data = peak_df
@@ -814,21 +945,17 @@ class Section:
 
         This function clears any manual peak edits, resets various flags related to the signal processing, and updates
         the signal data to its default values. It ensures that the signal is in a clean state for further processing.
+        The processing history is cleared as well.
         """
-        self.data = (
-            self.data.lazy()
-            .with_columns(
-                pl.col(self.signal_name).alias(self.processed_signal_name),
-                pl.lit(0, pl.Int8).alias(IS_PEAK_COL),
-                pl.lit(0, pl.Int8).alias(IS_MANUAL_COL),
-            )
-            .collect()
-        )
+        self._set_processed_signal(None)
+        self._set_peak_indices(np.empty(0, dtype=np.int32))
+        self._rate_windows = None
         self.manual_peak_edits.clear()
         self._is_filtered = False
         self._is_standardized = False
         self._is_processed = False
         self._processing_parameters.reset()
+        self._processing_history.clear()
 
     def reset_peaks(self) -> None:
         """
@@ -837,32 +964,104 @@ class Section:
         This function clears any manual peak edits and updates the signal data to indicate that there are no peaks. It
         also resets the processing parameters specifically related to peak detection.
         """
-        self.data = (
-            self.data.lazy()
-            .with_columns(
-                pl.lit(0, pl.Int8).alias(IS_PEAK_COL),
-                pl.lit(0, pl.Int8).alias(IS_MANUAL_COL),
-            )
-            .collect()
-        )
+        self._set_peak_indices(np.empty(0, dtype=np.int32))
+        self._rate_windows = None
         self.manual_peak_edits.clear()
         self._processing_parameters.reset(peaks_only=True)
 
+    def restore(
+        self,
+        processing_parameters: ProcessingParameters,
+        processed_signal: npt.NDArray[np.float64] | None,
+        peaks: npt.NDArray[np.int32],
+        manual_peak_edits: ManualPeakEdits | None = None,
+        result: SectionResult | None = None,
+        description: str = "Restored from file",
+    ) -> None:
+        """
+        Restores a previously saved state of the section (e.g. read from a results file), without re-running any of
+        the processing or peak detection steps.
+
+        Parameters
+        ----------
+        processing_parameters : ProcessingParameters
+            The parameters that were used to create the saved state
+        processed_signal : NDArray[np.float64] | None
+            The processed signal, or None if the signal wasn't processed. Added as a single step to the processing
+            history, so undoing it returns to the raw signal.
+        peaks : NDArray[np.int32]
+            The section indices of the peaks, including manually added ones
+        manual_peak_edits : ManualPeakEdits | None, optional
+            The net manual peak edits, by default None
+        result : SectionResult | None, optional
+            The saved result of the section, by default None
+        description : str, optional
+            Description of the processing history step, by default "Restored from file"
+        """
+        self.reset_signal()
+        self.sampling_rate = processing_parameters.sampling_rate
+        self._processing_parameters = processing_parameters
+        self._is_processed = processing_parameters.processing_pipeline is not None
+        self._is_standardized = processing_parameters.standardization_parameters is not None
+        self._is_filtered = not self._is_processed and any(processing_parameters.filter_parameters)
+        if processed_signal is not None:
+            self._add_processing_step(processed_signal, description)
+
+        self._set_peak_indices(np.unique(self._valid_peak_indices(peaks)))
+        self._manual_peak_edits = manual_peak_edits or ManualPeakEdits()
+        self._rate_is_synced = False
+        if result is not None:
+            self._result_data = result
+            self._rate_is_synced = result.has_rate_data()
+
+    def apply_recipe_result(
+        self,
+        recipe: ProcessingRecipe,
+        result: RecipeResult,
+        *,
+        rr_params: _t.RollingRateKwargsDict | None = None,
+    ) -> None:
+        """
+        Replace the processing and peaks of this section with the result of applying `recipe` to its raw signal (see
+        `batch_processing.apply_recipe`). The processing history is cleared, undoing the result returns to the raw
+        signal.
+
+        Parameters
+        ----------
+        recipe : ProcessingRecipe
+            The recipe that was applied
+        result : RecipeResult
+            The processed signal, filter parameters and peaks created by the recipe
+        rr_params : dict, optional
+            Additional parameters to pass to the `rolling_rate` function, by default None
+        """
+        params = ProcessingParameters(
+            sampling_rate=self.sampling_rate,
+            processing_pipeline=recipe.processing_pipeline,
+            filter_parameters=list(result.filter_parameters),
+            standardization_parameters=recipe.standardization_parameters,
+            peak_detection_method=recipe.peak_detection_method,
+            peak_detection_method_parameters=recipe.peak_detection_method_parameters,
+        )
+        self.restore(params, result.processed_signal, result.peaks, description="Batch processing")
+        if recipe.peak_detection_method is not None:
+            self.update_rate_data(rr_params=rr_params)
+
     def get_summary(self) -> _t.SectionSummaryDict:
         return {
             "name": self.section_id.pretty_name(),
-            "size": self.data.height,
+            "size": self._data.height,
             "sampling_rate": self.sampling_rate,
             "start_index": self.global_bounds[0],
             "end_index": self.global_bounds[1],
-            "peak_count": self.peaks_local.len(),
+            "peak_count": self._peaks.size,
             "processing_parameters": self._processing_parameters.to_dict(),
         }
 
     def __repr__(self) -> str:
         # Section stats
         metadata = self.get_metadata()
-        size = self.data.height
+        size = self._data.height
         processing_history: dict[str, str] = {
             f"Run {i}": repr(hist) for i, hist in enumerate(self._processing_parameters.filter_parameters, start=1)
         }
@@ -872,7 +1071,7 @@ class Section:
             "Sampling rate": f"{metadata.sampling_rate} Hz",
             "Start Index": str(metadata.global_bounds[0]),
             "End Index": str(metadata.global_bounds[1]),
-            "Peak Count": str(self.peaks_local.len()),
+            "Peak Count": str(self._peaks.size),
             "Processing History": pprint.pformat(processing_history),
         }
 
@@ -0,0 +1,230 @@
+import re
+import typing as t
+from pathlib import Path
+
+import attrs
+import numpy as np
+import numpy.typing as npt
+import polars as pl
+import tables as tb
+
+from .. import _type_defs as _t
+from .._constants import COMBO_BOX_NO_SELECTION, INDEX_COL, IS_MANUAL_COL, IS_PEAK_COL
+from .._enums import (
+    NK2ECGPeakDetectionMethod,
+    PeakDetectionMethod,
+    PreprocessPipeline,
+    RateComputationMethod,
+    StandardizationMethod,
+)
+from .section import ManualPeakEdits, ProcessingParameters, SectionResult
+
+# Number of rows read from a table at once, rounded to a multiple of the table's chunk size
+_READ_BATCH_ROWS: t.Final = 500_000
+
+# `write_hdf5` stores the NeuroKit2 ECG peak method as "<method> (<nk2 method>)"
+_NK2_METHOD_PATTERN: t.Final = re.compile(r"^(\S+) \((.+)\)$")
+
+
+def _to_python(value: t.Any) -> t.Any:
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, bytes):
+        value = value.decode()
+    return value
+
+
+def _attrs_to_dict(node: tb.Node) -> dict[str, t.Any]:
+    attr_set = node._v_attrs
+    return {name: _to_python(attr_set[name]) for name in attr_set._v_attrnamesuser}
+
+
+def _none_if_missing(value: t.Any) -> t.Any:
+    return None if value in {None, "None", ""} else value
+
+
+def _child_groups(group: tb.Group) -> dict[str, tb.Group]:
+    return t.cast(dict[str, tb.Group], group._v_groups)
+
+
+def _read_table(
+    table: tb.Table,
+    columns: t.Sequence[str] | None = None,
+    start: int = 0,
+    stop: int | None = None,
+    progress: _t.ProgressCallback | None = None,
+) -> pl.DataFrame:
+    """Read the rows `start:stop` of `table` in batches of whole HDF5 chunks."""
+    n_rows = int(table.nrows)
+    stop = n_rows if stop is None else min(stop, n_rows)
+    chunk_rows = table.chunkshape[0] if table.chunkshape else 1
+    batch_rows = max(_READ_BATCH_ROWS // chunk_rows, 1) * chunk_rows
+
+    batches = [pl.from_numpy(table.read(0, 0))]
+    for batch_start in range(start, stop, batch_rows):
+        batch_stop = min(batch_start + batch_rows, stop)
+        batches.append(pl.from_numpy(table.read(batch_start, batch_stop)))
+        if progress is not None:
+            progress(batch_stop - start, stop - start)
+
+    df = pl.concat(batches, rechunk=False)
+    return df if columns is None else df.select(columns)
+
+
+def _read_processing_parameters(group: tb.Group) -> ProcessingParameters:
+    info = _attrs_to_dict(group)
+    pipeline = _none_if_missing(info.get("processing_pipeline"))
+    params = ProcessingParameters(
+        sampling_rate=int(info["sampling_rate"]),
+        processing_pipeline=None if pipeline is None else PreprocessPipeline(pipeline),
+    )
+
+    filter_groups = sorted(
+        _child_groups(t.cast(tb.Group, group.filters)).items(), key=lambda item: int(item[0].rsplit("_", 1)[1])
+    )
+    params.filter_parameters = [t.cast(_t.SignalFilterParameters, _attrs_to_dict(g)) for _, g in filter_groups]
+
+    std_params = _attrs_to_dict(t.cast(tb.Group, group.standardization))
+    if std_params:
+        if (std_method := _none_if_missing(std_params.get("method"))) is not None:
+            std_params["method"] = StandardizationMethod(std_method)
+        params.standardization_parameters = t.cast(_t.StandardizationParameters, std_params)
+
+    peak_params = _attrs_to_dict(t.cast(tb.Group, group.peak_detection))
+    peak_method = _none_if_missing(peak_params.pop("method", None))
+    if peak_method is not None:
+        if match := _NK2_METHOD_PATTERN.match(peak_method):
+            peak_method = match.group(1)
+            peak_params = {"method": NK2ECGPeakDetectionMethod(match.group(2)), "params": peak_params or None}
+        params.peak_detection_method = PeakDetectionMethod(peak_method)
+        params.peak_detection_method_parameters = t.cast(_t.PeakDetectionMethodParameters, peak_params)
+
+    rate_method = _none_if_missing(_attrs_to_dict(t.cast(tb.Group, group.rate_computation)).get("method"))
+    if rate_method is not None:
+        params.rate_computation_method = RateComputationMethod(rate_method)
+    return params
+
+
+@attrs.frozen
+class StoredSection:
+    """Everything stored for a section in a results file, except for the section data itself."""
+
+    name: str = attrs.field()
+    global_bounds: tuple[int, int] = attrs.field()
+    processing_parameters: ProcessingParameters = attrs.field()
+    result: SectionResult = attrs.field()
+
+
+@attrs.frozen
+class StoredSectionState:
+    """The processed signal, peaks and manual peak edits of a section, as stored in its section dataframe."""
+
+    processed_signal: npt.NDArray[np.float64] | None = attrs.field()
+    peaks: npt.NDArray[np.int32] = attrs.field()
+    manual_peak_edits: ManualPeakEdits = attrs.field()
+
+
+class HDF5SessionReader:
+    """
+    Reads back the results files created by `write_hdf5`, so a previous session can be continued without processing
+    the data again.
+
+    The file is only opened while something is read from it. Tables are read in batches of whole HDF5 chunks, and the
+    section dataframes (the largest part of the file besides the combined data) are only read on request, which lets
+    sections be restored lazily once they are activated.
+    """
+
+    __slots__ = ("file_path", "metadata", "column_names", "n_rows", "section_names")
+
+    def __init__(self, file_path: Path | str) -> None:
+        self.file_path = Path(file_path)
+        with tb.open_file(self.file_path.resolve().as_posix(), "r") as h5f:
+            self.metadata = _attrs_to_dict(h5f.root)
+            table = t.cast(tb.Table, h5f.get_node("/combined_data"))
+            self.column_names: list[str] = list(table.colnames)
+            self.n_rows = int(table.nrows)
+            section_groups = (
+                _child_groups(t.cast(tb.Group, h5f.get_node("/section_results"))) if "/section_results" in h5f else {}
+            )
+            self.section_names = sorted(section_groups, key=lambda name: int(name.rsplit("_", 1)[1]))
+
+    def _open_file(self) -> t.ContextManager[tb.File]:
+        # `tb.File.__exit__` is annotated as returning a bool, so type checkers would assume it can suppress exceptions
+        # and treat everything assigned inside the block as possibly unbound
+        return tb.open_file(self.file_path.resolve().as_posix(), "r")
+
+    @property
+    def sampling_rate(self) -> int:
+        return int(self.metadata.get("sampling_rate", 0))
+
+    @property
+    def signal_column(self) -> str:
+        return self.metadata["name_signal_column"]
+
+    @property
+    def info_column(self) -> str:
+        return _none_if_missing(self.metadata.get("name_info_column")) or COMBO_BOX_NO_SELECTION
+
+    def read_combined_data(
+        self,
+        columns: t.Sequence[str],
+        start: int = 0,
+        stop: int | None = None,
+        progress: _t.ProgressCallback | None = None,
+    ) -> pl.DataFrame:
+        """Read the rows `start:stop` of the `index` column plus `columns` from the combined dataframe."""
+        with self._open_file() as h5f:
+            table = t.cast(tb.Table, h5f.get_node("/combined_data"))
+            df = _read_table(table, [INDEX_COL, *columns], start, stop, progress)
+        return df.with_columns(pl.col(INDEX_COL).cast(pl.UInt32)).set_sorted(INDEX_COL)
+
+    def read_section(self, name: str) -> StoredSection:
+        with self._open_file() as h5f:
+            group = t.cast(tb.Group, h5f.get_node("/section_results", name))
+            section_info = _attrs_to_dict(group)
+            data_table = t.cast(tb.Table, h5f.get_node(group, "data"))
+            first_index = int(data_table.read(0, 1, field=INDEX_COL)[0])
+            n_rows = int(data_table.nrows)
+            last_index = int(data_table.read(n_rows - 1, n_rows, field=INDEX_COL)[0])
+
+            peak_data = (
+                _read_table(t.cast(tb.Table, h5f.get_node(group, "peak_result")))
+                if "peak_result" in group
+                else pl.DataFrame()
+            )
+            rate_data = (
+                _read_table(t.cast(tb.Table, h5f.get_node(group, "rate_result")))
+                if "rate_result" in group
+                else pl.DataFrame()
+            )
+            processing_parameters = _read_processing_parameters(
+                t.cast(tb.Group, h5f.get_node(group, "processing_info"))
+            )
+
+        # Files written before the lock state was stored only have results for locked sections
+        is_locked = bool(section_info.get("is_locked", not peak_data.is_empty()))
+        result = SectionResult(peak_data=peak_data, rate_data=rate_data, is_locked=is_locked)
+        return StoredSection(name, (first_index, last_index), processing_parameters, result)
+
+    def read_section_state(self, name: str, processed_signal_name: str, is_processed: bool) -> StoredSectionState:
+        """
+        Read the processed signal and the peak / manual edit indicator columns of the section dataframe of `name`. If
+        `is_processed` is False, the processed signal is identical to the raw signal and isn't returned.
+        """
+        columns = [IS_PEAK_COL, IS_MANUAL_COL]
+        if is_processed:
+            columns.append(processed_signal_name)
+        with self._open_file() as h5f:
+            df = _read_table(t.cast(tb.Table, h5f.get_node(f"/section_results/{name}", "data")), columns)
+
+        is_manual = df.get_column(IS_MANUAL_COL).to_numpy()
+        manual_peak_edits = ManualPeakEdits(
+            added=np.flatnonzero(is_manual == 1).astype(np.int32),
+            removed=np.flatnonzero(is_manual == -1).astype(np.int32),
+        )
+        processed_signal = df.get_column(processed_signal_name).cast(pl.Float64).to_numpy() if is_processed else None
+        return StoredSectionState(
+            processed_signal=processed_signal,
+            peaks=np.flatnonzero(df.get_column(IS_PEAK_COL).to_numpy() == 1).astype(np.int32),
+            manual_peak_edits=manual_peak_edits,
+        )
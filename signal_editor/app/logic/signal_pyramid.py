@@ -0,0 +1,91 @@
+"""
+Level-of-detail data for plotting long signals.
+
+A `MinMaxPyramid` stores the minimum and maximum of a signal over buckets of 2, 4, 8, ... samples. Drawing the
+min / max envelope of the level whose buckets are about one screen pixel wide looks the same as drawing every sample,
+but the number of points only depends on the width of the plot, not on the length of the signal.
+"""
+
+import typing as t
+
+import attrs
+import numpy as np
+import numpy.typing as npt
+
+# No more levels are added once a level has fewer buckets than this
+_MIN_LEVEL_SIZE: t.Final = 2
+
+
+def _halve(
+    mins: npt.NDArray[np.float64], maxs: npt.NDArray[np.float64]
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """Combines each pair of neighbouring buckets. An odd last bucket is carried over as is."""
+    n_pairs = mins.size // 2
+    new_mins = np.fmin(mins[0 : 2 * n_pairs : 2], mins[1 : 2 * n_pairs : 2])
+    new_maxs = np.fmax(maxs[0 : 2 * n_pairs : 2], maxs[1 : 2 * n_pairs : 2])
+    if mins.size % 2:
+        new_mins = np.append(new_mins, mins[-1])
+        new_maxs = np.append(new_maxs, maxs[-1])
+    return new_mins, new_maxs
+
+
+@attrs.frozen
+class MinMaxPyramid:
+    """
+    Min / max envelopes of a signal at power-of-two decimations. Level 0 is the signal itself, level `k` holds the
+    minimum and maximum of each bucket of `2**k` samples. NaN values are ignored unless a bucket contains only NaNs.
+    """
+
+    signal: npt.NDArray[np.float64] = attrs.field(eq=False)
+    levels: list[tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]] = attrs.field(eq=False)
+
+    @classmethod
+    def from_signal(cls, sig: npt.NDArray[np.float64]) -> "MinMaxPyramid":
+        sig = np.asarray(sig, dtype=np.float64)
+        levels: list[tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]] = []
+        mins, maxs = sig, sig
+        while mins.size >= 2 * _MIN_LEVEL_SIZE:
+            mins, maxs = _halve(mins, maxs)
+            mins.setflags(write=False)
+            maxs.setflags(write=False)
+            levels.append((mins, maxs))
+        return cls(sig, levels)
+
+    @property
+    def n_levels(self) -> int:
+        """Number of levels, including the signal itself (level 0)."""
+        return len(self.levels) + 1
+
+    def level_for(self, n_samples: float, max_buckets: int) -> int:
+        """
+        Lowest level at which `n_samples` samples fit into at most `max_buckets` buckets. Level 0 is used as long as
+        plotting the samples directly doesn't take more points than the envelope would (two per bucket).
+        """
+        if n_samples <= 2 * max_buckets:
+            return 0
+        level = int(np.ceil(np.log2(n_samples / max(max_buckets, 1))))
+        return min(level, self.n_levels - 1)
+
+    def get_view(
+        self, x_start: float, x_stop: float, max_buckets: int
+    ) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        """
+        The x and y values to plot for the samples in `[x_start, x_stop)`, using the lowest level that needs at most
+        `max_buckets` buckets. At levels above 0, each bucket is drawn as a vertical line from its minimum to its
+        maximum at the position of the bucket's first sample.
+        """
+        n = self.signal.size
+        start = int(np.clip(np.floor(x_start), 0, n))
+        stop = int(np.clip(np.ceil(x_stop), start, n))
+        level = self.level_for(stop - start, max_buckets)
+        if level == 0:
+            return np.arange(start, stop, dtype=np.float64), self.signal[start:stop]
+
+        bucket_size = 2**level
+        mins, maxs = self.levels[level - 1]
+        first, last = start // bucket_size, -(-stop // bucket_size)
+        y = np.empty(2 * (last - first))
+        y[0::2] = mins[first:last]
+        y[1::2] = maxs[first:last]
+        x = np.repeat(np.arange(first, last, dtype=np.float64) * bucket_size, 2)
+        return x, y
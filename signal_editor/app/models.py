@@ -6,6 +6,7 @@ import polars as pl
 from PySide6 import QtCore
 
 from ._app_config import Config
+from ._enums import SectionBatchStatus
 from .gui.icons import AppIcons
 from .logic.section import Section, SectionID
 from .utils import format_file_path, human_readable_timedelta
@@ -199,6 +200,7 @@ class SectionListModel(QtCore.QAbstractListModel):
     ) -> None:
         super().__init__(parent)
         self._sections = sections or []
+        self._batch_status: dict["Section", tuple[SectionBatchStatus, str]] = {}
 
     @property
     def editable_sections(self) -> list["Section"]:
@@ -227,11 +229,35 @@ class SectionListModel(QtCore.QAbstractListModel):
         elif role == ItemDataRole.UserRole:
             return section
         elif role == ItemDataRole.ToolTipRole:
+            if section in self._batch_status:
+                status, message = self._batch_status[section]
+                return f"Batch processing: {status}\n{message}" if message else f"Batch processing: {status}"
             return repr(section)
         elif role == ItemDataRole.DecorationRole:
+            status = self._batch_status.get(section, (None, ""))[0]
+            if status == SectionBatchStatus.Queued:
+                return AppIcons.ArrowSync.icon()
+            elif status == SectionBatchStatus.Failed:
+                return AppIcons.ErrorCircle.icon()
             return AppIcons.LockClosed.icon() if section.is_locked else AppIcons.LockOpen.icon()
         return None
 
+    def set_batch_status(self, section: "Section", status: SectionBatchStatus, message: str = "") -> None:
+        """Show the batch processing status of `section` (and the error message if it failed) in the list."""
+        self._batch_status[section] = (status, message)
+        if section in self._sections:
+            index = self.index(self._sections.index(section))
+            self.dataChanged.emit(index, index, [ItemDataRole.DecorationRole, ItemDataRole.ToolTipRole])
+
+    def clear_batch_status(self, status: SectionBatchStatus | None = None) -> None:
+        """Remove the batch processing status of all sections, or only of the ones that have the given `status`."""
+        if status is None:
+            self._batch_status.clear()
+        else:
+            self._batch_status = {s: value for s, value in self._batch_status.items() if value[0] != status}
+        if self._sections:
+            self.dataChanged.emit(self.index(0), self.index(self.rowCount() - 1))
+
     def add_section(self, section: "Section") -> None:
         parent = self.index(0, 0)
         self.beginInsertRows(parent, self.rowCount(), self.rowCount())
@@ -243,6 +269,7 @@ class SectionListModel(QtCore.QAbstractListModel):
         row = index.row()
         parent = self.index(0, 0)
         self.beginRemoveRows(parent, row, row)
+        self._batch_status.pop(self._sections[row], None)
         self._sections.remove(self._sections[row])
         self.refresh_section_ids()
         self.endRemoveRows()
@@ -256,6 +283,7 @@ class SectionListModel(QtCore.QAbstractListModel):
     def clear(self) -> None:
         self.beginResetModel()
         self._sections.clear()
+        self._batch_status.clear()
         self.endResetModel()
 
     def refresh_section_ids(self) -> None:
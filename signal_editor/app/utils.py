@@ -57,6 +57,12 @@ def app_dir_posix() -> str:
     )
 
 
+def cache_dir_posix() -> str:
+    # The app doesn't set an application name, so `CacheLocation` wouldn't contain an app specific directory
+    location = QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.StandardLocation.GenericCacheLocation)
+    return (Path(location) / "signal_editor").as_posix()
+
+
 def safe_disconnect(
     sender: QtCore.QObject,
     signal: QtCore.SignalInstance,
@@ -0,0 +1,344 @@
+"""
+Headless batch processing of signal files.
+
+Applies a processing recipe saved from the app (the JSON form of `ProcessingParameters.to_dict`) to many input files
+in a pool of worker processes, and writes the results of each file as a HDF5 results file (which can be opened in the
+app to continue editing) or as Parquet files. Only the Qt-free parts of the app are imported.
+
+Example::
+
+    python -m signal_editor.cli recipe.json "data/*.edf" --signal-column ECG --output-dir results
+"""
+
+import argparse
+import concurrent.futures as cf
+import glob
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+import typing as t
+from pathlib import Path
+
+import attrs
+import numpy as np
+import numpy.typing as npt
+import polars as pl
+from loguru import logger
+
+from .app import _type_defs as _t
+from .app._constants import INDEX_COL, IS_MANUAL_COL, IS_PEAK_COL, SECTION_INDEX_COL
+from .app._enums import HDF5Compression, IncompleteWindowMethod, RateComputationMethod, TextFileSeparator
+from .app.logic.batch_processing import ProcessingRecipe, RecipeResult, apply_recipe
+from .app.logic.file_io import SectionExport, read_signal_file, write_hdf5_sections
+from .app.logic.rolling_rate import instantaneous_rate, rolling_rate
+
+
+@attrs.frozen
+class FileJob:
+    """Everything a worker process needs to process a single input file."""
+
+    input_path: Path = attrs.field()
+    output_dir: Path = attrs.field()
+    recipe: ProcessingRecipe = attrs.field()
+    signal_column: str = attrs.field()
+    info_column: str | None = attrs.field()
+    sampling_rate: int | None = attrs.field()
+    rate_computation_method: RateComputationMethod = attrs.field()
+    rr_params: _t.RollingRateKwargsDict = attrs.field()
+    output_format: t.Literal["hdf5", "parquet"] = attrs.field()
+    separator: TextFileSeparator = attrs.field()
+    compression: HDF5Compression = attrs.field()
+    compression_level: int = attrs.field()
+    block_size: int | None = attrs.field()
+
+
+@attrs.frozen
+class FileSummary:
+    input_path: Path = attrs.field()
+    n_samples: int = attrs.field(default=0)
+    n_peaks: int = attrs.field(default=0)
+    seconds: float = attrs.field(default=0.0)
+    output_path: Path | None = attrs.field(default=None)
+    error: str | None = attrs.field(default=None)
+
+
+def _processing_parameters_dict(job: FileJob, sampling_rate: int, result: RecipeResult) -> _t.ProcessingParametersDict:
+    """The processing parameters in the form of `ProcessingParameters.to_dict`, as the app would record them."""
+    recipe = job.recipe
+    return {
+        "sampling_rate": sampling_rate,
+        "processing_pipeline": str(recipe.processing_pipeline),
+        "filter_parameters": result.filter_parameters,
+        "standardization_parameters": recipe.standardization_parameters,
+        "peak_detection_method": str(recipe.peak_detection_method),
+        "peak_detection_method_parameters": recipe.peak_detection_method_parameters,
+        "rate_computation_method": str(job.rate_computation_method),
+    }
+
+
+def _section_dataframe(job: FileJob, data: pl.DataFrame, result: RecipeResult) -> pl.DataFrame:
+    """Same columns as `Section.data`: index, section index, raw signal (and info), processed signal, indicators."""
+    signal = data.get_column(job.signal_column).cast(pl.Float64)
+    processed = signal if result.processed_signal is None else pl.Series(result.processed_signal, dtype=pl.Float64)
+    peak_mask = np.zeros(data.height, dtype=np.int8)
+    peak_mask[result.peaks] = 1
+    return data.select(
+        pl.col(INDEX_COL).cast(pl.Int32),
+        pl.int_range(pl.len(), dtype=pl.Int32).alias(SECTION_INDEX_COL),
+        pl.exclude(INDEX_COL),
+    ).with_columns(
+        processed.alias(f"{job.signal_column}_processed"),
+        pl.Series(IS_PEAK_COL, peak_mask, pl.Int8),
+        pl.Series(IS_MANUAL_COL, np.zeros(data.height, dtype=np.int8), pl.Int8),
+    )
+
+
+def _peak_dataframe(job: FileJob, section_df: pl.DataFrame) -> pl.DataFrame:
+    """Same columns as the peak data of a locked section (`Section.lock_result`)."""
+    columns = [SECTION_INDEX_COL, f"{job.signal_column}_processed", INDEX_COL]
+    if job.info_column is not None:
+        columns.append(job.info_column)
+    return section_df.filter(pl.col(IS_PEAK_COL) == 1).select(columns).rename({INDEX_COL: "global_index"})
+
+
+def _rate_dataframe(
+    job: FileJob, section_df: pl.DataFrame, sampling_rate: int, peaks: npt.NDArray[np.int32]
+) -> pl.DataFrame:
+    if job.rate_computation_method == RateComputationMethod.Instantaneous:
+        return instantaneous_rate(peaks, sampling_rate, section_df.height)
+    return rolling_rate(section_df, sampling_rate, info_column=job.info_column, full_info=True, **job.rr_params)
+
+
+def _write_results(
+    job: FileJob,
+    sampling_rate: int,
+    section_df: pl.DataFrame,
+    peak_df: pl.DataFrame,
+    rate_df: pl.DataFrame,
+    processing_parameters: _t.ProcessingParametersDict,
+) -> Path:
+    stem = job.input_path.stem
+    if job.output_format == "parquet":
+        section_df.write_parquet(job.output_dir / f"{stem}.parquet")
+        peak_df.write_parquet(job.output_dir / f"{stem}_peaks.parquet")
+        rate_df.write_parquet(job.output_dir / f"{stem}_rate.parquet")
+        metadata_path = job.output_dir / f"{stem}_metadata.json"
+        metadata_path.write_text(json.dumps(processing_parameters, indent=2, default=str))
+        return job.output_dir / f"{stem}.parquet"
+
+    # Same layout as the results files exported by the app, with the whole file as a single section
+    section_id = f"Section_{job.signal_column}_001"
+    section = SectionExport(
+        name=section_id,
+        title=f"Results for Section 001 ({job.signal_column.upper()})",
+        metadata={
+            "signal_name": job.signal_column,
+            "section_id": t.cast(t.Any, section_id),
+            "global_bounds": (section_df.item(0, INDEX_COL), section_df.item(-1, INDEX_COL)),
+            "sampling_rate": sampling_rate,
+            "processing_parameters": processing_parameters,
+            "rate_computation_method": str(job.rate_computation_method),
+        },
+        data=section_df,
+        peak_data=peak_df,
+        rate_data=rate_df,
+    )
+    out_path = job.output_dir / f"{stem}.hdf5"
+    write_hdf5_sections(
+        out_path,
+        {
+            "file_name": job.input_path.name,
+            "file_format": job.input_path.suffix,
+            "sampling_rate": sampling_rate,
+            "name_signal_column": job.signal_column,
+            "name_info_column": job.info_column,
+        },
+        section_df.drop(SECTION_INDEX_COL),
+        [section],
+        compression=job.compression,
+        compression_level=job.compression_level,
+    )
+    return out_path
+
+
+def process_file(job: FileJob) -> FileSummary:
+    """Load -> filter -> standardize -> detect peaks -> compute rate -> export for a single file."""
+    start = time.perf_counter()
+    n_samples = 0
+    try:
+        data, detected_rate = read_signal_file(
+            job.input_path, job.signal_column, job.info_column, separator=job.separator
+        )
+        n_samples = data.height
+        sampling_rate = job.sampling_rate or detected_rate
+        if sampling_rate <= 0:
+            raise ValueError("Could not detect the sampling rate, please pass it with '--sampling-rate'.")
+
+        sig = data.get_column(job.signal_column).cast(pl.Float64).to_numpy()
+        result = apply_recipe(sig, sampling_rate, job.recipe, job.block_size)
+        if result.peaks.size < 3:
+            raise RuntimeError(f"Need at least 3 detected peaks to create a result, got {result.peaks.size}")
+
+        section_df = _section_dataframe(job, data, result)
+        peak_df = _peak_dataframe(job, section_df)
+        rate_df = _rate_dataframe(job, section_df, sampling_rate, result.peaks)
+        processing_parameters = _processing_parameters_dict(job, sampling_rate, result)
+        out_path = _write_results(job, sampling_rate, section_df, peak_df, rate_df, processing_parameters)
+    except Exception as e:
+        return FileSummary(job.input_path, n_samples, seconds=time.perf_counter() - start, error=repr(e))
+    return FileSummary(job.input_path, n_samples, int(result.peaks.size), time.perf_counter() - start, out_path)
+
+
+def expand_inputs(patterns: t.Iterable[str]) -> list[Path]:
+    """Expand the glob patterns in `patterns`, keeping the order and dropping duplicates."""
+    paths: dict[Path, None] = {}
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for match in matches:
+            paths[Path(match)] = None
+    return list(paths)
+
+
+def run_jobs(jobs: t.Sequence[FileJob], max_workers: int | None = None) -> t.Iterator[FileSummary]:
+    """Process `jobs` in a pool of worker processes, yielding the summaries in order of completion."""
+    if not jobs:
+        return
+    max_workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    if max_workers == 1:
+        yield from map(process_file, jobs)
+        return
+    with cf.ProcessPoolExecutor(max_workers, mp_context=mp.get_context("spawn")) as executor:
+        futures = [executor.submit(process_file, job) for job in jobs]
+        try:
+            for future in cf.as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m signal_editor.cli",
+        description="Apply a saved processing recipe to many signal files without starting the app.",
+    )
+    parser.add_argument("recipe", type=Path, help="JSON file with the processing parameters to apply.")
+    parser.add_argument(
+        "inputs", nargs="+", help="Input files or glob patterns (.edf, .csv, .txt, .tsv, .feather, .xlsx)."
+    )
+    parser.add_argument("-s", "--signal-column", required=True, help="Name of the column / channel to process.")
+    parser.add_argument("-i", "--info-column", default=None, help="Name of an additional column / channel to keep.")
+    parser.add_argument(
+        "-r", "--sampling-rate", type=int, default=None, help="Sampling rate in Hz, detected per file if omitted."
+    )
+    parser.add_argument("-o", "--output-dir", type=Path, default=Path("."), help="Directory for the result files.")
+    parser.add_argument("-f", "--format", choices=("hdf5", "parquet"), default="hdf5", help="Output file format.")
+    parser.add_argument(
+        "-j", "--workers", type=int, default=0, help="Number of worker processes, 0 uses one per CPU core."
+    )
+    parser.add_argument(
+        "--block-size",
+        type=int,
+        default=4_000_000,
+        help="Signals longer than this are filtered in blocks of this many samples, 0 filters them at once.",
+    )
+    parser.add_argument(
+        "--filter-stacking",
+        action="store_true",
+        help="Apply all filters of the recipe in sequence instead of only the last one.",
+    )
+    parser.add_argument(
+        "--rate-method",
+        type=RateComputationMethod,
+        choices=list(RateComputationMethod),
+        default=None,
+        help="How to compute the rate, defaults to the method stored in the recipe.",
+    )
+    parser.add_argument("--window-every", type=int, default=10, help="Seconds between rolling rate windows.")
+    parser.add_argument("--window-length", type=int, default=60, help="Length of the rolling rate windows in seconds.")
+    parser.add_argument(
+        "--incomplete-window",
+        type=IncompleteWindowMethod,
+        choices=list(IncompleteWindowMethod),
+        default=IncompleteWindowMethod.Drop,
+        help="How to handle rolling rate windows that are incomplete.",
+    )
+    parser.add_argument(
+        "--separator",
+        type=TextFileSeparator,
+        choices=list(TextFileSeparator),
+        default=TextFileSeparator.Tab,
+        help="Field separator of .txt files.",
+    )
+    parser.add_argument(
+        "--compression", type=HDF5Compression, choices=list(HDF5Compression), default=HDF5Compression.BloscLZ4
+    )
+    parser.add_argument("--compression-level", type=int, choices=range(10), default=5, metavar="{0-9}")
+    return parser
+
+
+def main(argv: t.Sequence[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+
+    recipe_dict: _t.ProcessingParametersDict = json.loads(args.recipe.read_text())
+    recipe = ProcessingRecipe.from_dict(recipe_dict, filter_stacking=args.filter_stacking)
+    rate_method = args.rate_method or RateComputationMethod(
+        recipe_dict.get("rate_computation_method", RateComputationMethod.RollingWindow)
+    )
+    input_paths = expand_inputs(args.inputs)
+    if not input_paths:
+        logger.error("No input files found.")
+        return 1
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    jobs = [
+        FileJob(
+            input_path=path,
+            output_dir=args.output_dir,
+            recipe=recipe,
+            signal_column=args.signal_column,
+            info_column=args.info_column,
+            sampling_rate=args.sampling_rate,
+            rate_computation_method=rate_method,
+            rr_params={
+                "sec_new_window_every": args.window_every,
+                "sec_window_length": args.window_length,
+                "incomplete_window_method": args.incomplete_window,
+            },
+            output_format=args.format,
+            separator=args.separator,
+            compression=args.compression,
+            compression_level=args.compression_level,
+            block_size=args.block_size or None,
+        )
+        for path in input_paths
+    ]
+
+    start = time.perf_counter()
+    summaries: list[FileSummary] = []
+    for i, summary in enumerate(run_jobs(jobs, args.workers), 1):
+        summaries.append(summary)
+        if summary.error is None:
+            logger.info(
+                f"[{i}/{len(jobs)}] {summary.input_path.name}: {summary.n_samples:_} samples, {summary.n_peaks:_} "
+                f"peaks in {summary.seconds:.2f} s -> {summary.output_path}"
+            )
+        else:
+            logger.error(f"[{i}/{len(jobs)}] {summary.input_path.name}: {summary.error}")
+    wall_time = time.perf_counter() - start
+
+    n_failed = sum(summary.error is not None for summary in summaries)
+    n_samples = sum(summary.n_samples for summary in summaries if summary.error is None)
+    cpu_time = sum(summary.seconds for summary in summaries)
+    print(
+        f"Processed {len(summaries) - n_failed}/{len(summaries)} files ({n_failed} failed), {n_samples:_} samples "
+        f"in {wall_time:.2f} s ({n_samples / max(wall_time, 1e-9) / 1e6:.2f} Msamples/s, "
+        f"{len(summaries) / max(wall_time, 1e-9):.2f} files/s, {cpu_time:.2f} s of worker time)"
+    )
+    return 1 if n_failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,17 +16,22 @@ from .app._enums import (
     PeakDetectionMethod,
     PreprocessPipeline,
     RateComputationMethod,
+    SectionBatchStatus,
     StandardizationMethod,
 )
 from .app.controllers.data_controller import DataController
 from .app.controllers.plot_controller import PlotController
 from .app.gui.main_window import MainWindow
+from .app.logic.batch_processing import ProcessingRecipe, RecipeResult, run_batch
 from .app.logic.file_io import write_hdf5
 from .app.logic.peak_detection import find_peaks
 from .app.models import FileListModel
 from .app.utils import safe_multi_disconnect
 
 if t.TYPE_CHECKING:
+    import polars as pl
+
+    from .app.logic.file_cache import PeakDetectionCache
     from .app.logic.metadata import FileMetadata
     from .app.logic.section import Section
 
@@ -45,18 +50,20 @@ class PeakDetectionWorker(QtCore.QRunnable):
         params: _t.PeakDetectionMethodParameters,
         *,
         rr_params: _t.RollingRateKwargsDict | None = None,
+        cache: "PeakDetectionCache | None" = None,
     ) -> None:
         super().__init__()
         self.section = section
         self.method = method
         self.params = params
         self.rr_params = rr_params
+        self.cache = cache
         self.signals = _WorkerSignals()
 
     @QtCore.Slot()
     def run(self) -> None:
         try:
-            self.section.detect_peaks(self.method, self.params, rr_params=self.rr_params)
+            self.section.detect_peaks(self.method, self.params, rr_params=self.rr_params, cache=self.cache)
         except Exception as e:
             self.signals.sig_failed.emit(e)
         else:
@@ -84,6 +91,102 @@ class SectionResultWorker(QtCore.QRunnable):
             self.signals.sig_done.emit()
 
 
+class LoadCancelledError(Exception):
+    pass
+
+
+class _LoadDataWorkerSignals(_WorkerSignals):
+    sig_progress: t.ClassVar[QtCore.Signal] = QtCore.Signal(int, int)
+    sig_data_ready: t.ClassVar[QtCore.Signal] = QtCore.Signal(object, object)
+    sig_cancelled: t.ClassVar[QtCore.Signal] = QtCore.Signal()
+
+
+class LoadDataWorker(QtCore.QRunnable):
+    def __init__(self, data: DataController, start: int = 0, stop: int | None = None) -> None:
+        super().__init__()
+        self.data = data
+        self.start = start
+        self.stop = stop
+        self.signals = _LoadDataWorkerSignals()
+        self._cancel_requested = False
+
+    def cancel(self) -> None:
+        self._cancel_requested = True
+
+    def _report_progress(self, n_read: int, n_total: int) -> None:
+        if self._cancel_requested:
+            raise LoadCancelledError
+        self.signals.sig_progress.emit(n_read, n_total)
+
+    @QtCore.Slot()
+    def run(self) -> None:
+        try:
+            df = self.data.read_data(self.start, self.stop, progress=self._report_progress)
+            if self._cancel_requested:
+                raise LoadCancelledError
+            if df is not None:
+                base_section = self.data.create_base_section(df)
+                self.signals.sig_data_ready.emit(df, base_section)
+        except Exception as e:
+            # Readers running inside polars re-raise the cancellation as a different exception type
+            if self._cancel_requested:
+                self.signals.sig_cancelled.emit()
+            else:
+                self.signals.sig_failed.emit(e)
+        else:
+            self.signals.sig_success.emit()
+        finally:
+            self.signals.sig_done.emit()
+
+
+class _BatchProcessingWorkerSignals(_WorkerSignals):
+    sig_section_processed: t.ClassVar[QtCore.Signal] = QtCore.Signal(object, object)
+
+
+class BatchProcessingWorker(QtCore.QRunnable):
+    """
+    Applies a processing recipe to the raw signals of several sections in a pool of worker processes. The results are
+    sent back one section at a time and applied to the sections in the GUI thread.
+    """
+
+    def __init__(self, sections: list["Section"], recipe: ProcessingRecipe) -> None:
+        super().__init__()
+        self.sections = sections
+        self.recipe = recipe
+        self.signals = _BatchProcessingWorkerSignals()
+        self._cancel_requested = False
+
+    def cancel(self) -> None:
+        """Stop after the sections that are currently being processed."""
+        self._cancel_requested = True
+
+    @QtCore.Slot()
+    def run(self) -> None:
+        signals = {
+            i: (section.raw_signal.to_numpy(allow_copy=False), section.sampling_rate)
+            for i, section in enumerate(self.sections)
+        }
+        try:
+            with contextlib.closing(
+                run_batch(
+                    signals,
+                    self.recipe,
+                    block_size=Config.editing.filter_block_size or None,
+                    max_workers=Config.editing.batch_max_workers or None,
+                )
+            ) as results:
+                for i, result in results:
+                    self.signals.sig_section_processed.emit(self.sections[i], result)
+                    if self._cancel_requested:
+                        break
+        except Exception as e:
+            self.signals.sig_failed.emit(e)
+        else:
+            self.signals.sig_success.emit()
+        finally:
+            self.signals.sig_done.emit()
+
+
 class SignalEditor(QtWidgets.QApplication):
     sig_peaks_updated: t.ClassVar[QtCore.Signal] = QtCore.Signal()
 
@@ -97,6 +200,10 @@ class SignalEditor(QtWidgets.QApplication):
         self.plot = PlotController(self, self.mw)
 
         self.thread_pool = QtCore.QThreadPool.globalInstance()
+        self._load_worker: LoadDataWorker | None = None
+        self._batch_worker: BatchProcessingWorker | None = None
+        self._batch_rr_params: _t.RollingRateKwargsDict | None = None
+        self._batch_progress = (0, 0)
 
         self.recent_files_model = FileListModel(Config.internal.recent_files, max_files=10, parent=self)
         self.recent_files_model.validate_files()
@@ -149,6 +256,11 @@ class SignalEditor(QtWidgets.QApplication):
         self.mw.dock_parameters.sig_data_reset_requested.connect(self.restore_original_signal)
         self.mw.dock_parameters.sig_peak_detection_requested.connect(self.run_peak_detection_worker)
         self.mw.dock_parameters.sig_clear_peaks_requested.connect(self.clear_peaks)
+        self.mw.action_undo_processing.triggered.connect(self.undo_processing_step)
+        self.mw.action_redo_processing.triggered.connect(self.redo_processing_step)
+        self.mw.action_cancel_loading.triggered.connect(self.cancel_loading)
+        self.mw.action_process_all_sections.triggered.connect(self.process_all_sections)
+        self.mw.action_cancel_batch_processing.triggered.connect(self.cancel_batch_processing)
 
         self.mw.action_find_peaks_in_selection.triggered.connect(self.find_peaks_in_selection)
         self.mw.action_remove_peaks_in_selection.triggered.connect(self.plot.remove_peaks_in_selection)
@@ -226,6 +338,8 @@ class SignalEditor(QtWidgets.QApplication):
         )
         self.mw.dock_parameters.set_pipeline_status(self.data.active_section.is_processed)
         self.mw.dock_parameters.set_standardization_status(self.data.active_section.is_standardized)
+        self.mw.action_undo_processing.setEnabled(self.data.active_section.can_undo_processing)
+        self.mw.action_redo_processing.setEnabled(self.data.active_section.can_redo_processing)
 
     @QtCore.Slot(dict)
     def filter_active_signal(self, filter_params: _t.SignalFilterParameters) -> None:
@@ -238,6 +352,18 @@ class SignalEditor(QtWidgets.QApplication):
         self.refresh_plot_data()
         self.plot.clear_peaks()
 
+    @QtCore.Slot()
+    def undo_processing_step(self) -> None:
+        if self.data.active_section.is_locked or not self.data.active_section.undo_processing():
+            return
+        self.refresh_plot_data()
+
+    @QtCore.Slot()
+    def redo_processing_step(self) -> None:
+        if self.data.active_section.is_locked or not self.data.active_section.redo_processing():
+            return
+        self.refresh_plot_data()
+
     @QtCore.Slot(object)
     def run_preprocess_pipeline(self, pipeline: PreprocessPipeline) -> None:
         if pipeline not in PreprocessPipeline:
@@ -249,24 +375,125 @@ class SignalEditor(QtWidgets.QApplication):
     def standardize_active_signal(self, standardization_params: _t.StandardizationParameters) -> None:
         method = standardization_params.pop("method")
         window_size = standardization_params.pop("window_size")
-        robust = method == StandardizationMethod.ZScoreRobust
+        robust = method in {StandardizationMethod.ZScoreRobust, StandardizationMethod.ZScoreRobustRolling}
         self.data.active_section.standardize_signal(method=method, robust=robust, window_size=window_size)
         self.refresh_plot_data()
 
     def refresh_plot_data(self) -> None:
-        self.plot.set_signal_data(self.data.active_section.processed_signal)
+        active_section = self.data.active_section
+        self.plot.set_signal_data(
+            active_section.processed_signal,
+            extrema_index=active_section.extrema_index,
+            signal_pyramid=active_section.signal_pyramid,
+        )
         self.update_status_indicators()
 
     @QtCore.Slot(enum.StrEnum, dict)
     def run_peak_detection_worker(self, method: PeakDetectionMethod, params: _t.PeakDetectionMethodParameters) -> None:
         rolling_rate_kwargs = self.mw.dock_parameters.get_rate_calculation_params()
-        worker = PeakDetectionWorker(self.data.active_section, method, params, rr_params=rolling_rate_kwargs)
+        worker = PeakDetectionWorker(
+            self.data.active_section,
+            method,
+            params,
+            rr_params=rolling_rate_kwargs,
+            cache=self.data.peak_detection_cache,
+        )
         worker.signals.sig_success.connect(self.refresh_peak_data)
         worker.signals.sig_done.connect(self._on_worker_finished)
         # worker.signals.sig_failed.connect(self.mw.sb_progress.error)
         self._on_worker_started("Detecting peaks...")
         self.thread_pool.start(worker)
 
+    @QtCore.Slot()
+    def process_all_sections(self) -> None:
+        if self._batch_worker is not None:
+            return
+        recipe = ProcessingRecipe.from_parameters(
+            self.data.active_section.get_metadata().processing_parameters,
+            filter_stacking=Config.editing.filter_stacking,
+        )
+        if recipe.is_empty:
+            logger.warning("The active section has no processing steps or peaks that could be applied to all sections.")
+            return
+        sections = self.data.get_unlocked_sections()
+        if not sections:
+            logger.warning("There are no unlocked sections to process.")
+            return
+
+        worker = BatchProcessingWorker(sections, recipe)
+        worker.signals.sig_section_processed.connect(self._on_batch_section_processed)
+        worker.signals.sig_failed.connect(self._on_batch_failed)
+        worker.signals.sig_done.connect(lambda: self._on_batch_finished(worker))
+        self._batch_worker = worker
+        self._batch_rr_params = self.mw.dock_parameters.get_rate_calculation_params()
+        self._batch_progress = (0, len(sections))
+
+        self.data.sections.clear_batch_status()
+        for section in sections:
+            self.data.sections.set_batch_status(section, SectionBatchStatus.Queued)
+        self.mw.dock_sections.show_batch_progress(*self._batch_progress)
+        self._set_batch_running(True)
+        logger.info(f"Processing {len(sections)} sections...")
+        self.thread_pool.start(worker)
+
+    @QtCore.Slot()
+    def cancel_batch_processing(self) -> None:
+        if self._batch_worker is not None:
+            self._batch_worker.cancel()
+            logger.info("Cancelling batch processing after the sections that are already running...")
+
+    def _set_batch_running(self, running: bool) -> None:
+        is_editable = not running and not self.data.active_section.is_locked
+        is_editable = is_editable and self.data.active_section is not self.data.get_base_section()
+        self.mw.action_process_all_sections.setEnabled(not running)
+        self.mw.action_cancel_batch_processing.setEnabled(running)
+        self.mw.action_remove_section.setEnabled(is_editable)
+        self.mw.action_mark_section_done.setEnabled(is_editable)
+        self.mw.dock_parameters.setEnabled(is_editable)
+        self.plot.block_clicks = not is_editable
+
+    @QtCore.Slot(object, object)
+    def _on_batch_section_processed(self, section: "Section", result: "RecipeResult | Exception") -> None:
+        if self._batch_worker is None or section not in self._batch_worker.sections:
+            return
+        name = section.section_id.pretty_name()
+        if isinstance(result, RecipeResult):
+            try:
+                section.apply_recipe_result(self._batch_worker.recipe, result, rr_params=self._batch_rr_params)
+            except Exception as e:
+                result = e
+        if isinstance(result, Exception):
+            logger.error(f"Batch processing failed for {name}: {result}")
+            self.data.sections.set_batch_status(section, SectionBatchStatus.Failed, str(result))
+        else:
+            self.data.sections.set_batch_status(section, SectionBatchStatus.Done)
+
+        n_done, n_total = self._batch_progress
+        self._batch_progress = (n_done + 1, n_total)
+        self.mw.dock_sections.show_batch_progress(*self._batch_progress)
+        if section is self.data.active_section:
+            self.refresh_plot_data()
+            self.plot.clear_peaks()
+            if not section.peaks_local.is_empty():
+                self.sig_peaks_updated.emit()
+
+    @QtCore.Slot(Exception)
+    def _on_batch_failed(self, error: Exception) -> None:
+        logger.error(f"Batch processing failed: {error}")
+
+    def _on_batch_finished(self, worker: BatchProcessingWorker) -> None:
+        # The file might have been closed (and another batch started) while the worker was running
+        if worker is not self._batch_worker:
+            return
+        n_done, n_total = self._batch_progress
+        logger.info(f"Batch processing finished, processed {n_done} of {n_total} sections.")
+        self._batch_worker = None
+        self._batch_rr_params = None
+        self.data.sections.clear_batch_status(SectionBatchStatus.Queued)
+        self.mw.dock_sections.show_batch_progress(n_total, n_total)
+        self._set_batch_running(False)
+        self.refresh_data_view()
+
     def _on_worker_started(self, overlay_text: str = "Calculating...") -> None:
         self.mw.overlay_widget.show_overlay(overlay_text)
 
@@ -361,12 +588,17 @@ class SignalEditor(QtWidgets.QApplication):
         self.mw.action_show_section_overview.setEnabled(is_base_section)
         self.mw.action_show_section_overview.setChecked(is_base_section)
         self.mw.dock_parameters.setEnabled(not is_base_section and not is_locked)
+        if self._batch_worker is not None:
+            self._set_batch_running(True)
 
         self.mw.set_active_section_label(section.section_id.pretty_name())
 
-        self.plot.block_clicks = is_locked_or_base
-        self.plot.set_signal_data(section.processed_signal)
+        self.plot.block_clicks = is_locked_or_base or self._batch_worker is not None
+        self.plot.set_signal_data(
+            section.processed_signal, extrema_index=section.extrema_index, signal_pyramid=section.signal_pyramid
+        )
         self.plot.clear_peaks()
+        self.update_status_indicators()
 
         if has_peaks:
             self.sig_peaks_updated.emit()
@@ -492,7 +724,7 @@ class SignalEditor(QtWidgets.QApplication):
             self.mw,
             "Open File",
             default_data_dir,
-            filter="Supported Files (*.csv *.txt *.tsv *.xlsx *.feather *.edf)",
+            filter="Supported Files (*.csv *.txt *.tsv *.xlsx *.feather *.edf *.hdf5)",
         )
         if not file_path:
             return
@@ -534,7 +766,58 @@ class SignalEditor(QtWidgets.QApplication):
             self.close_file()
             self._on_file_opened(loaded_file)
 
-        self.data.load_data()
+        # Loading again before the previous load finished replaces it
+        if self._load_worker is not None:
+            self._load_worker.cancel()
+
+        start, stop = self.mw.get_load_range(self.data.metadata.sampling_rate)
+        worker = LoadDataWorker(self.data, start, stop)
+        worker.signals.sig_progress.connect(self._on_load_progress)
+        worker.signals.sig_data_ready.connect(lambda df, base_section: self._on_data_loaded(worker, df, base_section))
+        worker.signals.sig_failed.connect(self._on_load_failed)
+        worker.signals.sig_cancelled.connect(self._on_load_cancelled)
+        worker.signals.sig_done.connect(lambda: self._on_load_finished(worker))
+        self._load_worker = worker
+
+        self.mw.action_cancel_loading.setEnabled(True)
+        self._on_worker_started("Loading data... (press Esc to cancel)")
+        self.thread_pool.start(worker)
+
+    @QtCore.Slot()
+    def cancel_loading(self) -> None:
+        if self._load_worker is not None:
+            self._load_worker.cancel()
+            self.mw.overlay_widget.show_overlay("Cancelling...")
+
+    @QtCore.Slot(int, int)
+    def _on_load_progress(self, n_read: int, n_total: int) -> None:
+        if n_total > 0:
+            text = f"Loading data... {n_read / n_total:.0%} (press Esc to cancel)"
+        else:
+            text = f"Loading data... {n_read:,} rows read (press Esc to cancel)"
+        self.mw.overlay_widget.show_overlay(text)
+
+    @QtCore.Slot(Exception)
+    def _on_load_failed(self, error: Exception) -> None:
+        logger.error(f"Failed to load data: {error}")
+
+    @QtCore.Slot()
+    def _on_load_cancelled(self) -> None:
+        logger.info("Loading data was cancelled.")
+
+    def _on_load_finished(self, worker: LoadDataWorker) -> None:
+        # A worker that was cancelled because another file was opened can finish after the new one started
+        if worker is not self._load_worker:
+            return
+        self._load_worker = None
+        self.mw.action_cancel_loading.setEnabled(False)
+        self.mw.overlay_widget.hide_overlay()
+
+    def _on_data_loaded(self, worker: LoadDataWorker, df: "pl.DataFrame", base_section: "Section") -> None:
+        # The file might have been closed, or another load started, while the worker was running
+        if worker is not self._load_worker or worker.data is not self.data:
+            return
+        self.data.set_data(df, base_section)
         self.mw.table_view_import_data.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
 
         self.mw.dock_sections.setEnabled(True)
@@ -561,6 +844,15 @@ class SignalEditor(QtWidgets.QApplication):
         self.mw.dock_parameters.setEnabled(False)
         self.mw.dock_sections.setEnabled(False)
 
+        if self._load_worker is not None:
+            self._load_worker.cancel()
+        if self._batch_worker is not None:
+            self._batch_worker.cancel()
+            self._batch_worker = None
+            self.mw.action_process_all_sections.setEnabled(True)
+            self.mw.action_cancel_batch_processing.setEnabled(False)
+            self.mw.dock_sections.show_batch_progress(0, 0)
+
         with contextlib.suppress(Exception):
             self._disconnect_data_controller_signals()
             self.data.setParent(None)
@@ -638,7 +930,15 @@ class SignalEditor(QtWidgets.QApplication):
 
         elif format == "hdf5":
             result = self.data.get_complete_result()
-            write_hdf5(Path(out_path), result.to_dict())
+            write_hdf5(
+                Path(out_path),
+                result.metadata.to_dict(),
+                result.combined_data.iter_chunks(),
+                result.section_results,
+                compression=Config.data.hdf5_compression,
+                compression_level=Config.data.hdf5_compression_level,
+                expected_rows=result.combined_data.height,
+            )
 
         elif format == "xlsx":
             df_peaks = self.data.active_section.peak_data
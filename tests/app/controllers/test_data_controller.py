@@ -0,0 +1,32 @@
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from signal_editor.app.controllers.data_controller import DataController
+
+
+@pytest.mark.parametrize(("suffix", "separator"), [(".csv", ","), (".tsv", "\t"), (".txt", "\t")])
+@pytest.mark.parametrize(("start", "stop"), [(100, 200), (0, 1), (950, 5_000), (0, None)])
+def test_read_data_row_range_of_text_files(
+    tmp_path: Path, suffix: str, separator: str, start: int, stop: int | None
+) -> None:
+    rng = np.random.default_rng(2)
+    df = pl.DataFrame(
+        {"time": np.arange(1_000) / 100, "sig": rng.normal(0, 1, 1_000), "temp": np.linspace(20, 30, 1_000)}
+    )
+    file_path = tmp_path / f"signal{suffix}"
+    df.write_csv(file_path, separator=separator)
+
+    controller = DataController()
+    controller.open_file(file_path)
+    controller.update_metadata(signal_col="sig", info_col="temp")
+    result = controller.read_data(start, stop)
+
+    expected = (
+        df.with_row_index("index").select("index", "sig", "temp").slice(start, None if stop is None else stop - start)
+    )
+    assert result is not None
+    assert_frame_equal(result, expected)
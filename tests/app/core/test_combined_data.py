@@ -0,0 +1,74 @@
+import numpy as np
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from signal_editor.app._constants import INDEX_COL, IS_MANUAL_COL, IS_PEAK_COL, SECTION_INDEX_COL
+from signal_editor.app.logic.combined_data import CombinedDataAssembler
+from signal_editor.app.logic.section import Section
+
+SAMPLING_RATE = 100
+
+
+def _combined_data_reference(base_section: Section, sections: list[Section]) -> pl.DataFrame:
+    """The combined dataframe as it was created by `DataController.get_complete_result` before chunking."""
+    section_dfs = [
+        s.data.with_columns(pl.col(IS_PEAK_COL).cast(pl.Int8), pl.col(IS_MANUAL_COL).cast(pl.Int8)) for s in sections
+    ]
+    return (
+        base_section.data.lazy()
+        .update(pl.concat(section_dfs).lazy(), on=[INDEX_COL, "sig"], how="full")
+        .drop(SECTION_INDEX_COL)
+        .sort(INDEX_COL)
+        .collect()
+    )
+
+
+@pytest.fixture
+def base_df() -> pl.DataFrame:
+    rng = np.random.default_rng(1)
+    n = 10_007
+    return pl.DataFrame(
+        {
+            INDEX_COL: pl.int_range(n, dtype=pl.UInt32, eager=True),
+            "sig": rng.normal(0, 1, n),
+            "temp": np.linspace(20, 30, n),
+        }
+    )
+
+
+def _make_section(base_df: pl.DataFrame, start: int, stop: int) -> Section:
+    section = Section(base_df.slice(start, stop - start), "sig", info_column="temp")
+    section.sampling_rate = SAMPLING_RATE
+    section.filter_signal(method="butterworth", lowcut=0.5, highcut=8, order=2)  # type: ignore
+    peaks = np.arange(10, stop - start, 97, dtype=np.int32)
+    section.set_peaks(peaks, update_rate=False)
+    section.update_peaks("add", np.array([1, 2], dtype=np.int32), update_rate=False)
+    section.update_peaks("remove", peaks[:3], update_rate=False)
+    return section
+
+
+@pytest.mark.parametrize("chunk_rows", [1_000, 4_096, 50_000])
+def test_combined_data_matches_full_join(base_df: pl.DataFrame, chunk_rows: int) -> None:
+    base_section = Section(base_df, "sig", info_column="temp")
+    sections = [
+        _make_section(base_df, 0, 1_500),
+        _make_section(base_df, 3_000, 6_200),
+        _make_section(base_df, 9_000, 10_007),
+    ]
+    expected = _combined_data_reference(base_section, sections)
+
+    assembler = CombinedDataAssembler(base_section, sections)
+    assert assembler.height == expected.height
+    assert_frame_equal(assembler.collect(), expected)
+
+    chunks = list(assembler.iter_chunks(chunk_rows))
+    assert all(chunk.height <= chunk_rows for chunk in chunks)
+    assert_frame_equal(pl.concat(chunks), expected)
+
+
+def test_combined_data_without_sections(base_df: pl.DataFrame) -> None:
+    base_section = Section(base_df, "sig", info_column="temp")
+    assembler = CombinedDataAssembler(base_section, [])
+
+    assert_frame_equal(assembler.collect(), base_section.data.drop(SECTION_INDEX_COL))
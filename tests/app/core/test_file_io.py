@@ -0,0 +1,225 @@
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from signal_editor.app._constants import COMBO_BOX_NO_SELECTION, INDEX_COL, IS_MANUAL_COL, IS_PEAK_COL
+from signal_editor.app._enums import HDF5Compression, IncompleteWindowMethod, PeakDetectionMethod
+from signal_editor.app.logic.combined_data import CombinedDataAssembler
+from signal_editor.app.logic.file_io import _read_edf_mne, read_edf, scan_edf, write_hdf5
+from signal_editor.app.logic.section import Section, SectionID
+from signal_editor.app.logic.session_reader import HDF5SessionReader
+
+SAMPLING_RATE = 100
+RR_PARAMS = {
+    "sec_new_window_every": 5,
+    "sec_window_length": 20,
+    "incomplete_window_method": IncompleteWindowMethod.Approximate,
+}
+
+
+def _write_edf(
+    file_path: Path,
+    channels: dict[str, tuple[np.ndarray, str, int]],
+    n_records: int,
+    record_duration: int = 1,
+) -> None:
+    """
+    Write a minimal EDF file. `channels` maps each label to its digital values (int16), unit and number of samples
+    per data record. The physical range equals the digital range, so the physical values are the digital ones scaled
+    by the unit.
+    """
+    n_signals = len(channels)
+
+    def field(values: list[str], width: int) -> bytes:
+        return b"".join(value.ljust(width)[:width].encode("latin-1") for value in values)
+
+    header = b"".join(
+        [
+            field(["0"], 8),
+            field(["X X X X"], 80),
+            field(["Startdate 01-JAN-2024 X X X"], 80),
+            field(["01.01.24"], 8),
+            field(["00.00.00"], 8),
+            field([str(256 * (n_signals + 1))], 8),
+            field([""], 44),
+            field([str(n_records)], 8),
+            field([str(record_duration)], 8),
+            field([str(n_signals)], 4),
+        ]
+    )
+    header += field(list(channels), 16)
+    header += field([""] * n_signals, 80)
+    header += field([unit for _, unit, _ in channels.values()], 8)
+    header += field(["-32768"] * n_signals, 8)
+    header += field(["32767"] * n_signals, 8)
+    header += field(["-32768"] * n_signals, 8)
+    header += field(["32767"] * n_signals, 8)
+    header += field([""] * n_signals, 80)
+    header += field([str(spr) for _, _, spr in channels.values()], 8)
+    header += field([""] * n_signals, 32)
+
+    records = [values.astype("<i2").reshape(n_records, spr) for values, _, spr in channels.values()]
+    with open(file_path, "wb") as f:
+        f.write(header)
+        f.write(np.concatenate(records, axis=1).tobytes())
+
+
+@pytest.fixture(scope="module")
+def edf_file(tmp_path_factory) -> Path:
+    rng = np.random.default_rng(5)
+    n_records = 30
+    n = n_records * SAMPLING_RATE
+    ecg = rng.integers(-20_000, 20_000, n, dtype=np.int16)
+    ecg[ecg == 0] = 1
+    temp = rng.integers(3_000, 4_000, n, dtype=np.int16)
+    # Zeros inside the recording, and a trailing run of zeros in both channels
+    temp[[10, 11, 500]] = 0
+    ecg[[20, 700]] = 0
+    ecg[-250:] = 0
+    temp[-300:] = 0
+    slow = rng.integers(-100, 100, n // 4, dtype=np.int16)
+
+    file_path = tmp_path_factory.mktemp("edf") / "recording.edf"
+    _write_edf(
+        file_path,
+        {
+            "ECG": (ecg, "uV", SAMPLING_RATE),
+            "Temp": (temp, "degC", SAMPLING_RATE),
+            "Slow": (slow, "mV", SAMPLING_RATE // 4),
+        },
+        n_records,
+    )
+    return file_path
+
+
+@pytest.mark.parametrize("info_channel", [None, "Temp"])
+@pytest.mark.parametrize("filter_all_zeros", [True, False])
+@pytest.mark.parametrize(("start", "stop"), [(0, None), (150, 2_900), (1_000, 1_010)])
+def test_read_edf_matches_mne(
+    edf_file: Path, info_channel: str | None, filter_all_zeros: bool, start: int, stop: int | None
+) -> None:
+    expected = _read_edf_mne(
+        edf_file,
+        "ECG",
+        info_channel or COMBO_BOX_NO_SELECTION,
+        start=start,
+        stop=stop,
+        filter_all_zeros=filter_all_zeros,
+    )
+    result = read_edf(edf_file, "ECG", info_channel, start=start, stop=stop, filter_all_zeros=filter_all_zeros)
+
+    assert_frame_equal(result, expected, check_dtypes=False)
+
+
+@pytest.mark.parametrize("info_channel", [None, "Temp"])
+@pytest.mark.parametrize("filter_all_zeros", [True, False])
+def test_scan_edf_projections(edf_file: Path, info_channel: str | None, filter_all_zeros: bool) -> None:
+    expected = read_edf(edf_file, "ECG", info_channel, start=150, stop=2_900, filter_all_zeros=filter_all_zeros)
+    lf = scan_edf(edf_file, "ECG", info_channel, start=150, stop=2_900, filter_all_zeros=filter_all_zeros)
+
+    assert lf.select(pl.len()).collect().item() == expected.height
+    assert_frame_equal(lf.select(INDEX_COL).collect(), expected.select(INDEX_COL))
+    assert_frame_equal(lf.select("ECG").collect(), expected.select("ECG"))
+    assert_frame_equal(lf.head(10).select(INDEX_COL).collect(), expected.head(10).select(INDEX_COL))
+
+
+def test_read_edf_falls_back_to_mne_for_slower_channels(edf_file: Path) -> None:
+    expected = _read_edf_mne(edf_file, "ECG", "Slow", filter_all_zeros=False)
+    result = read_edf(edf_file, "ECG", "Slow", filter_all_zeros=False)
+
+    assert_frame_equal(result, expected, check_dtypes=False)
+
+
+def _make_section(base: pl.DataFrame, start: int, stop: int, number: int) -> Section:
+    section = Section(base.slice(start, stop - start), "sig", info_column="temp")
+    section.section_id = SectionID(f"Section_SIG_{number:03}")
+    section.sampling_rate = SAMPLING_RATE
+    section.filter_signal(method="butterworth", lowcut=0.5, highcut=8, order=2)  # type: ignore
+    section.detect_peaks(PeakDetectionMethod.LocalMaxima, {"search_radius": 20, "min_distance": 50})
+    section.update_peaks("add", np.array([5, 6], dtype=np.int32), update_rate=False)
+    section.update_peaks("remove", section.peaks_local.to_numpy()[-2:], update_rate=False)
+    section.update_rate_data(full_info=True, force=True, rr_params=RR_PARAMS)  # type: ignore
+    return section
+
+
+def test_hdf5_session_round_trip(tmp_path: Path) -> None:
+    rng = np.random.default_rng(9)
+    n = 12_000
+    t = np.arange(n) / SAMPLING_RATE
+    base = pl.DataFrame(
+        {
+            INDEX_COL: pl.int_range(n, dtype=pl.UInt32, eager=True),
+            "sig": np.sin(2 * np.pi * 1.2 * t) + rng.normal(0, 0.05, n),
+            "temp": np.round(np.linspace(36, 38, n), 1),
+        }
+    )
+    base_section = Section(base, "sig", info_column="temp")
+    base_section.sampling_rate = SAMPLING_RATE
+    locked = _make_section(base, 1_000, 5_000, 1)
+    locked.lock_result(rr_params=RR_PARAMS)  # type: ignore
+    # Unlocking a section keeps its results
+    unlocked = _make_section(base, 6_000, 11_000, 2)
+    unlocked.lock_result(rr_params=RR_PARAMS)  # type: ignore
+    unlocked.set_locked(False)
+    sections = [locked, unlocked]
+
+    combined = CombinedDataAssembler(base_section, sections)
+    file_path = tmp_path / "result.h5"
+    write_hdf5(
+        file_path,
+        {
+            "file_name": "test.feather",
+            "file_format": "feather",
+            "sampling_rate": SAMPLING_RATE,
+            "name_signal_column": "sig",
+            "name_info_column": "temp",
+        },
+        combined.iter_chunks(5_000),
+        {section.section_id: section.get_result() for section in sections},
+        compression=HDF5Compression.BloscLZ4,
+        expected_rows=combined.height,
+    )
+
+    reader = HDF5SessionReader(file_path)
+    assert reader.sampling_rate == SAMPLING_RATE
+    assert reader.signal_column == "sig"
+    assert reader.info_column == "temp"
+    assert reader.n_rows == n
+    assert reader.section_names == ["Section_SIG_001", "Section_SIG_002"]
+
+    combined_data = combined.collect()
+    assert_frame_equal(
+        reader.read_combined_data(["sig", "sig_processed", IS_PEAK_COL, IS_MANUAL_COL], 2_000, 7_000),
+        combined_data.slice(2_000, 5_000).select(INDEX_COL, "sig", "sig_processed", IS_PEAK_COL, IS_MANUAL_COL),
+        check_dtypes=False,
+    )
+
+    for section in sections:
+        stored = reader.read_section(section.section_id)
+        assert stored.global_bounds == section.global_bounds
+        assert stored.result.is_locked == section.is_locked
+        assert stored.processing_parameters.sampling_rate == SAMPLING_RATE
+        assert stored.processing_parameters.peak_detection_method == PeakDetectionMethod.LocalMaxima
+        assert_frame_equal(stored.result.rate_data, section.rate_data, check_dtypes=False)
+        assert_frame_equal(stored.result.peak_data, section.peak_data, check_dtypes=False)
+
+        state = reader.read_section_state(section.section_id, section.processed_signal_name, is_processed=True)
+        np.testing.assert_allclose(state.processed_signal, section.processed_signal.to_numpy())
+        np.testing.assert_array_equal(state.peaks, section.peaks_local.to_numpy())
+        np.testing.assert_array_equal(state.manual_peak_edits.added, section.manual_peak_edits.added)
+        np.testing.assert_array_equal(state.manual_peak_edits.removed, section.manual_peak_edits.removed)
+
+        # Restoring the stored state gives the same section
+        restored = Section(base.slice(section.global_bounds[0], section.data.height), "sig", info_column="temp")
+        restored.restore(
+            stored.processing_parameters,
+            state.processed_signal,
+            state.peaks,
+            state.manual_peak_edits,
+            stored.result,
+        )
+        assert restored.is_locked == section.is_locked
+        assert_frame_equal(restored.data, section.data, check_dtypes=False)
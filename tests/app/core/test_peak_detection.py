@@ -0,0 +1,269 @@
+import neurokit2 as nk
+import numpy as np
+import pytest
+from scipy import ndimage
+
+from signal_editor.app._enums import PeakDetectionMethod, WFDBPeakDirection
+from signal_editor.app.logic.file_cache import PeakDetectionCache, signal_digest
+from signal_editor.app.logic.peak_detection import (
+    ExtremaIndex,
+    _adjust_peak_positions,
+    _remove_outliers,
+    _shift_peaks,
+    find_extrema,
+    find_local_extrema,
+    find_peaks,
+    find_peaks_blockwise,
+)
+
+SAMPLING_RATE = 400
+
+
+def _find_extrema_reference(sig: np.ndarray, search_radius: int, direction: str, min_peak_distance: int) -> np.ndarray:
+    """The original loop-based implementation of `find_extrema`."""
+    if len(sig) == 0 or np.min(sig) == np.max(sig):
+        return np.array([], dtype=np.int32)
+    size = 2 * search_radius + 1
+    if direction == "up":
+        peaks = np.flatnonzero(sig == ndimage.maximum_filter1d(sig, size=size, mode="constant"))
+    else:
+        peaks = np.flatnonzero(sig == ndimage.minimum_filter1d(sig, size=size, mode="constant"))
+
+    close_peaks = np.where(np.diff(peaks) < min_peak_distance)[0]
+    while len(close_peaks) > 0:
+        for i in close_peaks:
+            peaks[i] = (peaks[i] + peaks[i + 1]) // 2
+        peaks = np.delete(peaks, close_peaks + 1)
+        close_peaks = np.where(np.diff(peaks) < min_peak_distance)[0]
+    return peaks
+
+
+def _synthetic_signals() -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(7)
+    n = 20_000
+    t = np.arange(n) / SAMPLING_RATE
+    ppg_like = np.sin(2 * np.pi * 1.3 * t) + 0.5 * np.sin(2 * np.pi * 2.6 * t + 0.4)
+    return {
+        "clean": ppg_like,
+        "noisy": ppg_like + rng.normal(0, 0.3, n),
+        "white_noise": rng.normal(0, 1, n),
+        # Quantized values create plateaus, i.e. many neighbouring candidates with the same value
+        "quantized": np.round(ppg_like + rng.normal(0, 0.2, n), 1),
+        "flat": np.zeros(n),
+    }
+
+
+@pytest.mark.parametrize("name", list(_synthetic_signals()))
+@pytest.mark.parametrize("direction", ["up", "down"])
+@pytest.mark.parametrize(("search_radius", "min_peak_distance"), [(1, 5), (3, 20), (10, 1), (25, 200), (2, 0)])
+def test_find_extrema_matches_reference(name: str, direction: str, search_radius: int, min_peak_distance: int) -> None:
+    sig = _synthetic_signals()[name]
+
+    expected = _find_extrema_reference(sig, search_radius, direction, min_peak_distance)
+    result = find_extrema(sig, search_radius, direction, min_peak_distance)  # type: ignore
+
+    np.testing.assert_array_equal(result, expected)
+    if result.size > 1 and min_peak_distance > 0:
+        assert np.diff(result).min() >= min_peak_distance
+
+
+def _shift_peaks_reference(sig: np.ndarray, peaks: np.ndarray, radius: int, dir_is_up: bool) -> np.ndarray:
+    """The original loop-based implementation of `_shift_peaks`."""
+    start_indices = np.maximum(peaks - radius, 0)
+    end_indices = np.minimum(peaks + radius, sig.size)
+    shifted_peaks = np.zeros_like(peaks)
+    for i, (start, end) in enumerate(zip(start_indices, end_indices, strict=False)):
+        local_sig = sig[start:end]
+        shifted_peaks[i] = (np.argmax(local_sig) if dir_is_up else np.argmin(local_sig)) - radius
+    peaks += shifted_peaks
+    return peaks
+
+
+def _remove_outliers_reference(sig: np.ndarray, qrs_locations: np.ndarray, n_std: float, find_peak_func) -> np.ndarray:
+    """The original loop-based implementation of `_remove_outliers`."""
+    comparison_func, direction = {np.argmax: (np.less_equal, -1), np.argmin: (np.greater_equal, 1)}[find_peak_func]
+    outliers_mask = np.zeros_like(qrs_locations, dtype=np.bool_)
+    for i, peak in enumerate(qrs_locations):
+        surrounding_values = sig[qrs_locations[max(0, i - 2) : min(len(qrs_locations), i + 3)]]
+        threshold = np.mean(surrounding_values) + direction * n_std * np.std(surrounding_values)
+        if comparison_func(sig[peak], threshold):
+            outliers_mask[i] = True
+    return qrs_locations[~outliers_mask]
+
+
+@pytest.fixture(scope="module")
+def ecg_like() -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(11)
+    n = 60 * SAMPLING_RATE
+    beats = np.cumsum(rng.integers(250, 450, size=n // 250))
+    beats = beats[beats < n - 1]
+    sig = rng.normal(0, 0.05, n)
+    sig[beats] += rng.normal(1, 0.3, beats.size)
+    # Peaks right at the edges of the signal, and repeated values to check that ties are resolved identically
+    peaks = np.concatenate([[0, 3], beats + rng.integers(-30, 30, beats.size), [n - 4, n - 1]])
+    peaks = np.clip(peaks, 0, n - 1).astype(np.int32)
+    sig[1000:1100] = 0.5
+    return sig, peaks
+
+
+@pytest.mark.parametrize("radius", [1, 5, 40])
+@pytest.mark.parametrize("dir_is_up", [True, False])
+def test_shift_peaks_matches_reference(ecg_like: tuple[np.ndarray, np.ndarray], radius: int, dir_is_up: bool) -> None:
+    sig, peaks = ecg_like
+
+    expected = _shift_peaks_reference(sig, peaks.copy(), radius, dir_is_up)
+    result = _shift_peaks(sig, peaks.copy(), radius, dir_is_up)
+
+    np.testing.assert_array_equal(result, expected)
+
+
+@pytest.mark.parametrize("direction", list(WFDBPeakDirection))
+def test_adjust_peak_positions_matches_reference(ecg_like: tuple[np.ndarray, np.ndarray], direction) -> None:
+    sig, peaks = ecg_like
+    radius = 20
+    if direction == WFDBPeakDirection.Up:
+        expected = _shift_peaks_reference(sig, peaks.copy(), radius, True)
+    elif direction == WFDBPeakDirection.Down:
+        expected = _shift_peaks_reference(sig, peaks.copy(), radius, False)
+    elif direction == WFDBPeakDirection.Both:
+        expected = _shift_peaks_reference(np.abs(sig), peaks.copy(), radius, True)
+    else:
+        # Both shifts modify the same array, so the result is shifted twice
+        expected = _shift_peaks_reference(sig, _shift_peaks_reference(sig, peaks.copy(), radius, True), radius, False)
+
+    np.testing.assert_array_equal(_adjust_peak_positions(sig, peaks.copy(), radius, direction), expected)
+
+
+@pytest.mark.parametrize("n_peaks", [0, 1, 2, 3, 4, 5, 6, 200])
+@pytest.mark.parametrize("n_std", [0.5, 1.0, 4.0])
+@pytest.mark.parametrize("find_peak_func", [np.argmax, np.argmin])
+def test_remove_outliers_matches_reference(
+    ecg_like: tuple[np.ndarray, np.ndarray], n_peaks: int, n_std: float, find_peak_func
+) -> None:
+    sig, peaks = ecg_like
+    qrs_locations = np.unique(peaks)[:n_peaks]
+
+    expected = _remove_outliers_reference(sig, qrs_locations, n_std, find_peak_func)
+    result = _remove_outliers(sig, qrs_locations, n_std, find_peak_func)
+
+    np.testing.assert_array_equal(result, expected)
+
+
+@pytest.fixture(scope="module")
+def long_ecg() -> np.ndarray:
+    ecg = nk.ecg_simulate(duration=300, sampling_rate=SAMPLING_RATE, heart_rate=70, random_state=3)
+    return nk.ecg_clean(ecg, sampling_rate=SAMPLING_RATE)
+
+
+@pytest.mark.parametrize(
+    ("method", "method_parameters"),
+    [
+        (PeakDetectionMethod.LocalMaxima, {"search_radius": 30, "min_distance": 100}),
+        (
+            PeakDetectionMethod.WFDBXQRS,
+            {"search_radius": 30, "peak_dir": WFDBPeakDirection.Up, "min_peak_distance": 100},
+        ),
+        (PeakDetectionMethod.ECGNeuroKit2, {"method": "neurokit", "params": None}),
+        (
+            PeakDetectionMethod.PPGElgendi,
+            {"peakwindow": 0.111, "beatwindow": 0.667, "beatoffset": 0.02, "mindelay": 0.3},
+        ),
+    ],
+)
+def test_blockwise_peak_detection_matches_single_pass(
+    long_ecg: np.ndarray, method: PeakDetectionMethod, method_parameters
+) -> None:
+    expected = np.asarray(find_peaks(long_ecg, SAMPLING_RATE, method, method_parameters))
+
+    result = find_peaks_blockwise(long_ecg, SAMPLING_RATE, method, method_parameters, 25_000, max_workers=1)
+
+    assert result.dtype == np.int32
+    assert np.all(np.diff(result) > 0)
+    assert abs(result.size - expected.size) <= 1
+    # Every peak has a counterpart within a few samples
+    distance = np.abs(result[:, None] - expected[None, :]).min(axis=1)
+    assert np.count_nonzero(distance > 2) <= 1
+
+
+def test_blockwise_peak_detection_is_deterministic(long_ecg: np.ndarray) -> None:
+    params = {"method": "neurokit", "params": None}
+    serial = find_peaks_blockwise(
+        long_ecg, SAMPLING_RATE, PeakDetectionMethod.ECGNeuroKit2, params, 25_000, max_workers=1
+    )
+    parallel = find_peaks_blockwise(
+        long_ecg, SAMPLING_RATE, PeakDetectionMethod.ECGNeuroKit2, params, 25_000, max_workers=2
+    )
+
+    np.testing.assert_array_equal(serial, parallel)
+
+
+def test_peak_detection_cache(tmp_path, long_ecg: np.ndarray) -> None:
+    params = {"search_radius": 30, "min_distance": 100}
+    peaks = find_peaks(long_ecg, SAMPLING_RATE, PeakDetectionMethod.LocalMaxima, params).astype(np.int32)
+    digest = signal_digest(long_ecg)
+    key = PeakDetectionCache.key(digest, SAMPLING_RATE, PeakDetectionMethod.LocalMaxima, params)
+
+    cache = PeakDetectionCache(tmp_path, max_size=1024**2)
+    assert cache.get(key) is None
+    cache.put(key, peaks)
+    np.testing.assert_array_equal(cache.get(key), peaks)
+
+    # Parameters are compared by value, the signal by content
+    assert key == PeakDetectionCache.key(digest, SAMPLING_RATE, "local_maxima", dict(reversed(params.items())))
+    assert key != PeakDetectionCache.key(digest, SAMPLING_RATE, PeakDetectionMethod.LocalMaxima, params, block_size=1)
+    assert digest != signal_digest(long_ecg * 2)
+
+    # Stored on disk
+    np.testing.assert_array_equal(PeakDetectionCache(tmp_path, max_size=1024**2).get(key), peaks)
+
+    # Least recently used entries are removed once the cache is full
+    small = PeakDetectionCache(tmp_path / "small", max_size=peaks.nbytes + 1024, memory_size=0)
+    small.put("a", peaks)
+    small.put("b", peaks)
+    assert small.get("a") is None
+    assert small.get("b") is not None
+
+    # Shrinking the cache removes entries that no longer fit, a size of 0 disables it
+    cache.put("other", peaks[:10])
+    cache.get(key)
+    cache.resize(peaks.nbytes + 200)
+    assert cache.get(key) is not None
+    assert cache.get("other") is None
+    cache.resize(0)
+    assert not cache.enabled
+    assert cache.get(key) is None
+
+
+@pytest.mark.parametrize("name", list(_synthetic_signals()))
+def test_find_local_extrema(name: str) -> None:
+    sig = _synthetic_signals()[name]
+    maxima, minima = find_local_extrema(sig)
+
+    # Brute force: walk over plateaus and compare the samples on either side of them
+    expected_max, expected_min = [], []
+    i = 1
+    while i < sig.size - 1:
+        end = i
+        while end < sig.size - 1 and sig[end + 1] == sig[i]:
+            end += 1
+        if end < sig.size - 1:
+            if sig[i - 1] < sig[i] > sig[end + 1]:
+                expected_max.append(i)
+            elif sig[i - 1] > sig[i] < sig[end + 1]:
+                expected_min.append(i)
+        i = end + 1
+
+    np.testing.assert_array_equal(maxima, expected_max)
+    np.testing.assert_array_equal(minima, expected_min)
+
+
+def test_extrema_index_snaps_to_nearest_extremum() -> None:
+    sig = np.sin(2 * np.pi * np.arange(1000) / 100)  # maxima at 25, 125, ..., minima at 75, 175, ...
+    index = ExtremaIndex.from_signal(sig)
+
+    assert index.nearest(sig, 130, 0.9, radius=20) == 125
+    assert index.nearest(sig, 100, -0.9, radius=30) == 75
+    # Both within range, the one with the closer value wins
+    assert index.nearest(sig, 100, 0.2, radius=30) == 125
+    assert index.nearest(sig, 100, 0.9, radius=10) is None
+    np.testing.assert_array_equal(index.candidates(100, 50), [125, 75])
@@ -0,0 +1,225 @@
+import numpy as np
+import neurokit2 as nk
+import polars as pl
+import pytest
+from scipy import signal
+
+from signal_editor.app._enums import FilterMethod, PeakDetectionMethod, PreprocessPipeline, StandardizationMethod
+from signal_editor.app.logic.batch_processing import ProcessingRecipe, apply_recipe
+from signal_editor.app.logic.filter_design import (
+    apply_filter,
+    design_filter,
+    design_fir_bandpass,
+    zero_phase_filter,
+)
+from signal_editor.app.logic.processing import (
+    apply_cleaning_pipeline,
+    filter_signal,
+    rolling_mad,
+    standardize_signal,
+)
+
+SAMPLING_RATE = 400
+
+
+@pytest.fixture(scope="module")
+def sig() -> np.ndarray:
+    rng = np.random.default_rng(42)
+    n = 50_003
+    t = np.arange(n) / SAMPLING_RATE
+    return np.sin(2 * np.pi * 1.2 * t) + 0.3 * np.sin(2 * np.pi * 50 * t) + np.cumsum(rng.normal(0, 0.01, n))
+
+
+@pytest.mark.parametrize(
+    ("method", "lowcut", "highcut", "order"),
+    [
+        (FilterMethod.Butterworth, 0.5, 8, 3),
+        (FilterMethod.Butterworth, 0.5, None, 5),
+        (FilterMethod.Butterworth, None, 20, 2),
+        (FilterMethod.Bessel, 1, 30, 4),
+        (FilterMethod.ButterworthZI, 5, 15, 1),
+        (FilterMethod.ButterworthZI, 52, 48, 4),
+        (FilterMethod.Powerline, None, None, 2),
+    ],
+)
+@pytest.mark.parametrize("block_size", [1_000, 4_096, 49_999])
+def test_blockwise_filter_matches_whole_signal(
+    sig: np.ndarray,
+    method: FilterMethod,
+    lowcut: float | None,
+    highcut: float | None,
+    order: int,
+    block_size: int,
+) -> None:
+    coefficients = design_filter(method, SAMPLING_RATE, lowcut, highcut, order)
+
+    expected = nk.signal_filter(sig, SAMPLING_RATE, lowcut=lowcut, highcut=highcut, method=method, order=order)
+    whole = apply_filter(sig, coefficients)
+    blockwise = apply_filter(sig, coefficients, block_size=block_size)
+
+    np.testing.assert_allclose(whole, expected, rtol=0, atol=1e-10)
+    np.testing.assert_allclose(blockwise, whole, rtol=0, atol=1e-10)
+
+
+@pytest.mark.parametrize("block_size", [1_000, 4_096, 49_999])
+def test_blockwise_fir_matches_filtfilt(sig: np.ndarray, block_size: int) -> None:
+    coefficients = design_fir_bandpass(601, 0.67, 45, SAMPLING_RATE)
+    expected = signal.filtfilt(coefficients.b, coefficients.a, sig)
+
+    np.testing.assert_allclose(zero_phase_filter(sig, coefficients, block_size), expected, rtol=0, atol=1e-9)
+
+
+def test_blockwise_filter_keeps_missing_values(sig: np.ndarray) -> None:
+    sig_with_nan = sig.copy()
+    sig_with_nan[[10, 2_500, 2_501, 40_000]] = np.nan
+    coefficients = design_filter(FilterMethod.Butterworth, SAMPLING_RATE, 0.5, 8, 3)
+
+    expected = nk.signal_filter(sig_with_nan, SAMPLING_RATE, lowcut=0.5, highcut=8, method="butterworth", order=3)
+    blockwise = apply_filter(sig_with_nan, coefficients, block_size=1_000)
+
+    np.testing.assert_array_equal(np.isnan(blockwise), np.isnan(expected))
+    np.testing.assert_allclose(blockwise, expected, rtol=0, atol=1e-10, equal_nan=True)
+
+
+def test_blockwise_filter_short_signal_falls_back_to_whole_signal(sig: np.ndarray) -> None:
+    coefficients = design_filter(FilterMethod.Butterworth, SAMPLING_RATE, 0.5, 8, 3)
+    short = sig[:500]
+
+    np.testing.assert_array_equal(
+        apply_filter(short, coefficients, block_size=1_000), apply_filter(short, coefficients)
+    )
+
+
+def test_blockwise_filter_rejects_signal_shorter_than_padding(sig: np.ndarray) -> None:
+    coefficients = design_filter(FilterMethod.Butterworth, SAMPLING_RATE, 0.5, 8, 3)
+
+    with pytest.raises(ValueError):
+        zero_phase_filter(sig[:10], coefficients, block_size=5)
+
+
+@pytest.mark.parametrize("pipeline", list(PreprocessPipeline))
+def test_cleaning_pipeline_blockwise_matches_whole_signal(sig: np.ndarray, pipeline: PreprocessPipeline) -> None:
+    whole = apply_cleaning_pipeline(sig, SAMPLING_RATE, pipeline)
+    blockwise = apply_cleaning_pipeline(sig, SAMPLING_RATE, pipeline, block_size=2_000)
+
+    assert blockwise.parameters == whole.parameters
+    np.testing.assert_allclose(blockwise.cleaned, whole.cleaned, rtol=0, atol=1e-9)
+
+
+def test_filter_signal_blockwise_matches_whole_signal(sig: np.ndarray) -> None:
+    whole, whole_params = filter_signal(sig, SAMPLING_RATE, lowcut=0.5, highcut=10, method="butterworth", order=4)
+    blockwise, blockwise_params = filter_signal(
+        sig, SAMPLING_RATE, block_size=3_000, lowcut=0.5, highcut=10, method="butterworth", order=4
+    )
+
+    assert blockwise_params == whole_params
+    np.testing.assert_allclose(blockwise, whole, rtol=0, atol=1e-10)
+
+
+def test_filter_design_is_cached() -> None:
+    first = design_filter(FilterMethod.Butterworth, 250, 0.5, 8, 3)
+    second = design_filter(FilterMethod.Butterworth, 250, 0.5, 8, 3)
+
+    assert first is second
+    assert not first.sos.flags.writeable
+
+
+def test_rolling_mad_matches_brute_force(sig: np.ndarray) -> None:
+    x = sig[:10_000]
+    window_size = 2_000
+    median = pl.Series(x).rolling_median(window_size, min_periods=1).to_numpy()
+    expected = np.array(
+        [1.4826 * np.median(np.abs(x[max(i - window_size + 1, 0) : i + 1] - median[i])) for i in range(x.size)]
+    )
+
+    np.testing.assert_allclose(rolling_mad(x, window_size, step=1), expected)
+    # Interpolated between every `step`-th window
+    approx = rolling_mad(x, window_size)
+    np.testing.assert_allclose(approx[window_size:], expected[window_size:], rtol=0.1)
+
+
+@pytest.mark.parametrize("window_size", [200, 2_000])
+def test_rolling_mad_at_burst_edges(sig: np.ndarray, window_size: int) -> None:
+    x = sig[:20_000].copy()
+    burst_start, burst_stop = 8_000, 8_000 + 3 * window_size
+    x[burst_start:burst_stop] *= 20
+    expected = rolling_mad(x, window_size, step=1)
+    approx = rolling_mad(x, window_size)
+
+    # The MAD jumps once the burst makes up half of the window, the windows around that are computed exactly
+    for edge in (burst_start, burst_stop):
+        windows = slice(edge, edge + window_size)
+        np.testing.assert_allclose(approx[windows], expected[windows], rtol=0.1)
+
+
+def test_rolling_robust_standardization(sig: np.ndarray) -> None:
+    x = sig.copy()
+    x[20_000:20_400] *= 50  # motion burst
+
+    standardized = standardize_signal(pl.Series(x), robust=True, window_size=2_000)
+    reference = standardize_signal(pl.Series(sig), robust=True, window_size=2_000)
+
+    assert standardized.null_count() == 0
+    assert standardized.len() == x.size
+    # The burst only affects the windows that contain it
+    np.testing.assert_allclose(standardized[:20_000].to_numpy(), reference[:20_000].to_numpy())
+    np.testing.assert_allclose(standardized[23_000:].to_numpy(), reference[23_000:].to_numpy())
+
+
+def test_recipe_replays_pipeline_and_standardization(sig: np.ndarray) -> None:
+    recipe = ProcessingRecipe(
+        processing_pipeline=PreprocessPipeline.ECGNeuroKit2,
+        standardization_parameters={
+            "method": StandardizationMethod.ZScoreRobustRolling,
+            "robust": True,
+            "window_size": 500,
+        },
+    )
+    cleaning = apply_cleaning_pipeline(sig, SAMPLING_RATE, PreprocessPipeline.ECGNeuroKit2)
+    expected = standardize_signal(pl.Series(cleaning.cleaned), robust=True, window_size=500).to_numpy()
+
+    result = apply_recipe(sig, SAMPLING_RATE, recipe)
+
+    assert result.filter_parameters == [cleaning.parameters, cleaning.additional_parameters]
+    assert result.peaks.size == 0
+    np.testing.assert_allclose(result.processed_signal, expected)
+
+
+def test_recipe_replays_custom_filters(sig: np.ndarray) -> None:
+    filters = [
+        {"method": "butterworth", "lowcut": 0.5, "highcut": 8, "order": 3},
+        {"method": "powerline", "powerline": 50},
+    ]
+    expected = sig
+    for params in filters:
+        expected, _ = filter_signal(expected, SAMPLING_RATE, **dict(params))
+
+    result = apply_recipe(sig, SAMPLING_RATE, ProcessingRecipe(filter_parameters=filters))
+
+    assert result.filter_parameters == filters
+    np.testing.assert_allclose(result.processed_signal, expected)
+    assert apply_recipe(sig, SAMPLING_RATE, ProcessingRecipe()).processed_signal is None
+
+
+def test_recipe_from_saved_dict() -> None:
+    saved = {
+        "sampling_rate": SAMPLING_RATE,
+        "processing_pipeline": "None",
+        "filter_parameters": [{"method": "butterworth", "lowcut": 0.5, "highcut": 8, "order": 3}, {}],
+        "standardization_parameters": {"method": "mad", "robust": True, "window_size": None},
+        "peak_detection_method": "ppg_elgendi",
+        "peak_detection_method_parameters": {"peakwindow": 0.111},
+        "rate_computation_method": "rolling_window",
+    }
+
+    recipe = ProcessingRecipe.from_dict(saved)
+
+    assert recipe.processing_pipeline is None
+    assert recipe.filter_parameters == (saved["filter_parameters"][0],)
+    assert recipe.standardization_parameters == {
+        "method": StandardizationMethod.ZScoreRobust,
+        "robust": True,
+        "window_size": None,
+    }
+    assert recipe.peak_detection_method == PeakDetectionMethod.PPGElgendi
+    assert ProcessingRecipe.from_dict({**saved, "processing_pipeline": "ppg_elgendi"}).filter_parameters == ()
@@ -0,0 +1,86 @@
+import numpy as np
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from signal_editor.app._constants import IS_PEAK_COL, SECTION_INDEX_COL
+from signal_editor.app._enums import IncompleteWindowMethod
+from signal_editor.app.logic.rolling_rate import RollingRateWindows
+
+SAMPLING_RATE = 10
+N_ROWS = 1_234
+
+
+def _rolling_rate_reference(
+    peaks: np.ndarray,
+    every: int,
+    period: int,
+    start_at: int,
+    label: str,
+    incomplete_window_method: IncompleteWindowMethod,
+) -> pl.DataFrame:
+    """The rolling rate computed with `group_by_dynamic` over the complete `is_peak` column."""
+    every, period, offset = every * SAMPLING_RATE, period * SAMPLING_RATE, start_at * SAMPLING_RATE
+    to_per_minute = 60 * SAMPLING_RATE / period
+    rr_df = (
+        pl.DataFrame(
+            {
+                SECTION_INDEX_COL: pl.int_range(N_ROWS, dtype=pl.Int64, eager=True),
+                IS_PEAK_COL: np.isin(np.arange(N_ROWS), peaks).astype(np.int8),
+            }
+        )
+        .group_by_dynamic(
+            SECTION_INDEX_COL,
+            every=f"{every}i",
+            period=f"{period}i",
+            offset=f"{offset}i",
+            label=label,  # type: ignore
+        )
+        .agg(pl.sum(IS_PEAK_COL).alias("peaks_in_window"), pl.len().alias("rows_in_window"))
+    )
+    if incomplete_window_method == IncompleteWindowMethod.Drop:
+        rr_df = rr_df.filter(pl.col("rows_in_window") == period).with_columns(
+            (pl.col("peaks_in_window") * to_per_minute).alias("rate_bpm")
+        )
+    elif incomplete_window_method == IncompleteWindowMethod.Approximate:
+        rr_df = rr_df.with_columns(
+            (pl.col("peaks_in_window") * period / pl.col("rows_in_window") * to_per_minute).alias("rate_bpm")
+        )
+    else:
+        rr_df = rr_df.with_columns(
+            (
+                pl.when(pl.col("rows_in_window") != period).then(None).otherwise(pl.col("peaks_in_window"))
+                * to_per_minute
+            ).alias("rate_bpm")
+        ).with_columns(pl.col("rate_bpm").forward_fill())
+    return rr_df.select(pl.col(SECTION_INDEX_COL).cast(pl.Int32), pl.col("rate_bpm").cast(pl.Float64))
+
+
+@pytest.mark.parametrize("incomplete_window_method", list(IncompleteWindowMethod))
+@pytest.mark.parametrize("label", ["left", "right", "datapoint"])
+@pytest.mark.parametrize(
+    ("every", "period", "start_at"),
+    [(10, 30, 0), (10, 30, 3), (10, 30, 13), (10, 5, 3), (10, 10, 7), (7, 30, -4)],
+)
+def test_rate_frame_matches_group_by_dynamic(
+    incomplete_window_method: IncompleteWindowMethod, label: str, every: int, period: int, start_at: int
+) -> None:
+    rng = np.random.default_rng(7)
+    peaks = np.sort(rng.choice(N_ROWS, 120, replace=False)).astype(np.int32)
+
+    windows = RollingRateWindows(N_ROWS, every * SAMPLING_RATE, period * SAMPLING_RATE, start_at * SAMPLING_RATE)
+    windows.set_peaks(peaks)
+    assert_frame_equal(
+        windows.rate_frame(incomplete_window_method, label, SAMPLING_RATE),  # type: ignore
+        _rolling_rate_reference(peaks, every, period, start_at, label, incomplete_window_method),
+    )
+
+    # Incremental updates give the same result as recomputing the rate from the edited peaks
+    added = np.setdiff1d(rng.choice(N_ROWS, 30, replace=False), peaks).astype(np.int32)
+    removed = rng.choice(peaks, 30, replace=False)
+    windows.apply_edits(added=added, removed=removed)
+    edited = np.union1d(np.setdiff1d(peaks, removed), added)
+    assert_frame_equal(
+        windows.rate_frame(incomplete_window_method, label, SAMPLING_RATE),  # type: ignore
+        _rolling_rate_reference(edited, every, period, start_at, label, incomplete_window_method),
+    )
@@ -0,0 +1,305 @@
+import numpy as np
+import polars as pl
+import polars.selectors as cs
+import pytest
+from polars.testing import assert_frame_equal, assert_series_equal
+
+from signal_editor.app._constants import INDEX_COL, IS_MANUAL_COL, IS_PEAK_COL, SECTION_INDEX_COL
+from signal_editor.app._enums import IncompleteWindowMethod
+from signal_editor.app.logic.section import ManualPeakEdits, Section
+
+SAMPLING_RATE = 100
+N_ROWS = 20_000
+RR_PARAMS = {
+    "sec_new_window_every": 5,
+    "sec_window_length": 20,
+    "sec_start_at": 2,
+    "incomplete_window_method": IncompleteWindowMethod.Approximate,
+}
+
+
+@pytest.fixture
+def section() -> Section:
+    rng = np.random.default_rng(3)
+    t = np.arange(N_ROWS) / SAMPLING_RATE
+    df = pl.DataFrame(
+        {
+            INDEX_COL: pl.int_range(1_000, 1_000 + N_ROWS, dtype=pl.Int32, eager=True),
+            "sig": np.sin(2 * np.pi * 1.1 * t) + rng.normal(0, 0.05, N_ROWS),
+        }
+    )
+    section = Section(df, "sig")
+    section.sampling_rate = SAMPLING_RATE
+    return section
+
+
+def _set_peaks_reference(data: pl.DataFrame, peaks: np.ndarray) -> pl.DataFrame:
+    """The original `Section.set_peaks`, which rebuilt the `is_peak` column with `is_in`."""
+    peaks = peaks[peaks >= 0]
+    return data.with_columns(
+        pl.when(pl.col(SECTION_INDEX_COL).is_in(pl.Series("", peaks, pl.Int32)))
+        .then(pl.lit(1))
+        .otherwise(pl.lit(0))
+        .cast(pl.Int8)
+        .alias(IS_PEAK_COL)
+    )
+
+
+def _update_peaks_reference(data: pl.DataFrame, action: str, peaks: np.ndarray) -> tuple[pl.DataFrame, np.ndarray]:
+    """The original `Section.update_peaks`. Returns the new data and the indices whose `is_peak` value changed."""
+    updated = data.select(
+        pl.when(pl.col(SECTION_INDEX_COL).is_in(pl.Series("peaks", peaks, pl.Int32)))
+        .then(pl.lit(1 if action == "add" else 0))
+        .otherwise(pl.col(IS_PEAK_COL))
+        .cast(pl.Int8)
+        .alias(IS_PEAK_COL)
+    ).get_column(IS_PEAK_COL)
+    changed = pl.arg_where(updated != data.get_column(IS_PEAK_COL), eager=True).to_numpy()
+    return data.with_columns(updated), changed
+
+
+def _random_peak_edits(section: Section, peaks: np.ndarray, n_edits: int = 20) -> pl.DataFrame:
+    """
+    Apply `n_edits` alternating add / remove edits to `section` and the reference implementation. Returns the
+    reference dataframe after the last edit.
+    """
+    rng = np.random.default_rng(11)
+    expected = _set_peaks_reference(
+        pl.DataFrame({SECTION_INDEX_COL: pl.int_range(N_ROWS, dtype=pl.Int32, eager=True)}), peaks
+    )
+    for i in range(n_edits):
+        action = "add" if i % 2 == 0 else "remove"
+        # Mix of new indices, existing peaks and duplicates
+        indices = np.concatenate([rng.choice(N_ROWS, 15), rng.choice(peaks, 5), rng.choice(peaks, 2)]).astype(np.int32)
+        expected, changed = _update_peaks_reference(expected, action, indices)
+        section.update_peaks(action, indices, update_rate=False)  # type: ignore
+
+        assert_series_equal(section.data.get_column(IS_PEAK_COL), expected.get_column(IS_PEAK_COL))
+        assert np.isin(changed, indices).all()
+    return expected
+
+
+def test_peak_updates_match_is_in_mask(section: Section) -> None:
+    rng = np.random.default_rng(11)
+    peaks = np.sort(rng.choice(N_ROWS, 200, replace=False)).astype(np.int32)
+
+    section.set_peaks(peaks, update_rate=False)
+    expected = _set_peaks_reference(section.data, peaks)
+    assert_series_equal(section.data.get_column(IS_PEAK_COL), expected.get_column(IS_PEAK_COL))
+
+    expected = _random_peak_edits(section, peaks)
+    final = np.flatnonzero(expected[IS_PEAK_COL])
+    np.testing.assert_array_equal(section.peaks_local.to_numpy(), final)
+    np.testing.assert_array_equal(section.peaks_global.to_numpy(), final + 1_000)
+
+    # The net manual edits are the differences to the peaks that were set
+    np.testing.assert_array_equal(section.manual_peak_edits.added, np.setdiff1d(final, peaks))
+    np.testing.assert_array_equal(section.manual_peak_edits.removed, np.setdiff1d(peaks, final))
+
+
+def test_update_peaks_ignores_out_of_range_indices(section: Section) -> None:
+    section.set_peaks(np.array([-5, 10, 20, N_ROWS + 3], dtype=np.int32), update_rate=False)
+    np.testing.assert_array_equal(section.peaks_local.to_numpy(), [10, 20])
+
+    section.update_peaks("add", np.array([-1, 30, N_ROWS], dtype=np.int32), update_rate=False)
+    section.update_peaks("remove", np.array([-1, 10, N_ROWS], dtype=np.int32), update_rate=False)
+    np.testing.assert_array_equal(section.peaks_local.to_numpy(), [20, 30])
+    np.testing.assert_array_equal(section.manual_peak_edits.added, [30])
+    np.testing.assert_array_equal(section.manual_peak_edits.removed, [10])
+
+
+def test_incremental_rate_matches_full_recomputation(section: Section) -> None:
+    rng = np.random.default_rng(11)
+    peaks = np.sort(rng.choice(N_ROWS, 200, replace=False)).astype(np.int32)
+    section.set_peaks(peaks, rr_params=RR_PARAMS)  # type: ignore
+    _random_peak_edits(section, peaks)
+
+    # The window counts are kept up to date by the edits
+    section.update_rate_data(rr_params=RR_PARAMS)  # type: ignore
+    incremental = section.rate_data
+
+    # `full_info` always aggregates the complete `is_peak` column
+    section.update_rate_data(full_info=True, force=True, rr_params=RR_PARAMS)  # type: ignore
+    assert_frame_equal(incremental, section.rate_data.select(SECTION_INDEX_COL, "rate_bpm"), check_dtypes=False)
+
+
+def _section_data_reference(data: pl.DataFrame, signal_name: str) -> pl.DataFrame:
+    """The section dataframe as it was created eagerly by the original `Section.__init__`."""
+    return (
+        data.with_row_index(SECTION_INDEX_COL)
+        .select(cs.by_name(INDEX_COL, SECTION_INDEX_COL).cast(pl.Int32), ~cs.by_name(INDEX_COL, SECTION_INDEX_COL))
+        .with_columns(
+            pl.col(signal_name).alias(f"{signal_name}_processed"),
+            pl.lit(0, pl.Int8).alias(IS_PEAK_COL),
+            pl.lit(0, pl.Int8).alias(IS_MANUAL_COL),
+        )
+    )
+
+
+def test_section_is_a_view_of_the_base_data() -> None:
+    rng = np.random.default_rng(4)
+    base = pl.DataFrame(
+        {
+            INDEX_COL: pl.int_range(N_ROWS, dtype=pl.UInt32, eager=True),
+            "sig": rng.normal(0, 1, N_ROWS),
+            "temp": np.linspace(20, 30, N_ROWS),
+        }
+    ).rechunk()
+    data = base.slice(5_000, 2_500)
+    section = Section(data, "sig", info_column="temp")
+
+    assert_frame_equal(section.data, _section_data_reference(data, "sig"))
+    assert section.global_bounds == (5_000, 7_499)
+
+    # The signal isn't copied until it is processed
+    base_ptr = base.get_column("sig").to_numpy(allow_copy=False).__array_interface__["data"][0]
+    raw_ptr = section.raw_signal.to_numpy(allow_copy=False).__array_interface__["data"][0]
+    assert raw_ptr == base_ptr + 5_000 * 8
+
+    # Changes to the section are reflected in its dataframe, but never in the base data
+    section.set_peaks(np.array([3, 10, 2_000], dtype=np.int32), update_rate=False)
+    section.update_peaks("add", np.array([50], dtype=np.int32), update_rate=False)
+    section.update_peaks("remove", np.array([10], dtype=np.int32), update_rate=False)
+    assert section.data.get_column(IS_PEAK_COL).to_numpy().nonzero()[0].tolist() == [3, 50, 2_000]
+    assert section.data.get_column(IS_MANUAL_COL).to_numpy()[[10, 50]].tolist() == [-1, 1]
+    assert base.columns == [INDEX_COL, "sig", "temp"]
+
+
+def test_processing_undo_redo(section: Section) -> None:
+    raw = section.raw_signal.to_numpy()
+    assert not section.can_undo_processing
+    assert not section.undo_processing()
+
+    section.filter_signal(method="butterworth", lowcut=0.5, highcut=8, order=2)  # type: ignore
+    filtered = section.processed_signal.to_numpy().copy()
+    section.standardize_signal(robust=False, window_size=None)  # type: ignore
+    standardized = section.processed_signal.to_numpy().copy()
+    assert section.is_filtered
+    assert section.is_standardized
+
+    assert section.undo_processing()
+    np.testing.assert_array_equal(section.processed_signal.to_numpy(), filtered)
+    assert section.is_filtered
+    assert not section.is_standardized
+    assert section.can_redo_processing
+
+    assert section.undo_processing()
+    np.testing.assert_array_equal(section.processed_signal.to_numpy(), raw)
+    assert not section.is_filtered
+    assert not section.undo_processing()
+
+    assert section.redo_processing()
+    assert section.redo_processing()
+    np.testing.assert_array_equal(section.processed_signal.to_numpy(), standardized)
+    assert section.is_standardized
+    assert not section.redo_processing()
+
+    # A new step after undoing discards the steps that could have been redone
+    assert section.undo_processing()
+    section.filter_signal(method="butterworth", lowcut=1, highcut=5, order=2)  # type: ignore
+    assert not section.can_redo_processing
+    assert not section.is_standardized
+    assert section.undo_processing()
+    np.testing.assert_array_equal(section.processed_signal.to_numpy(), filtered)
+
+
+def _assert_peak_views_match(section: Section) -> None:
+    peaks = np.flatnonzero(section.data.get_column(IS_PEAK_COL).to_numpy())
+    np.testing.assert_array_equal(section.peaks_local.to_numpy(), peaks)
+    np.testing.assert_array_equal(section.peaks_global.to_numpy(), section.data.get_column(INDEX_COL).to_numpy()[peaks])
+    peak_pos = section.get_peak_pos()
+    np.testing.assert_array_equal(peak_pos.to_series(0).to_numpy(), peaks)
+    np.testing.assert_array_equal(peak_pos.to_series(1).to_numpy(), section.processed_signal.to_numpy()[peaks])
+
+
+def test_derived_peak_views_follow_changes(section: Section) -> None:
+    section.set_peaks(np.arange(50, N_ROWS, 97, dtype=np.int32), update_rate=False)
+    _assert_peak_views_match(section)
+
+    # Reused as long as nothing changed
+    assert section.peaks_local is section.peaks_local
+    assert section.peaks_global is section.peaks_global
+    assert section.get_peak_pos() is section.get_peak_pos()
+
+    section.update_peaks("add", np.array([1, 2, 3], dtype=np.int32), update_rate=False)
+    _assert_peak_views_match(section)
+
+    # Editing nothing keeps the cached values
+    peaks_local = section.peaks_local
+    section.update_peaks("remove", np.array([4], dtype=np.int32), update_rate=False)
+    assert section.peaks_local is peaks_local
+
+    # The peak positions depend on the processed signal as well
+    peak_pos = section.get_peak_pos()
+    section.filter_signal(method="butterworth", lowcut=0.5, highcut=8, order=2)  # type: ignore
+    assert section.peaks_local is peaks_local
+    assert section.get_peak_pos() is not peak_pos
+    _assert_peak_views_match(section)
+
+    assert section.undo_processing()
+    _assert_peak_views_match(section)
+
+    section.reset_peaks()
+    assert section.peaks_local.is_empty()
+    assert section.get_peak_pos().height == 0
+
+
+class _ManualPeakEditsReference:
+    """The original list based `ManualPeakEdits`."""
+
+    def __init__(self) -> None:
+        self.added: list[int] = []
+        self.removed: list[int] = []
+
+    def new_added(self, values: np.ndarray) -> None:
+        for v in values.tolist():
+            if v in self.removed:
+                self.removed.remove(v)
+            else:
+                self.added.append(v)
+
+    def new_removed(self, values: np.ndarray) -> None:
+        for v in values.tolist():
+            if v in self.added:
+                self.added.remove(v)
+            else:
+                self.removed.append(v)
+
+
+def test_manual_peak_edits_match_list_implementation() -> None:
+    rng = np.random.default_rng(8)
+    edits = ManualPeakEdits()
+    reference = _ManualPeakEditsReference()
+
+    # Like `Section.update_peaks`, only indices that actually change are passed on
+    is_peak = rng.random(500) < 0.2
+    for i in range(200):
+        candidates = np.unique(rng.choice(500, rng.integers(1, 20)))
+        if i % 3 == 0:
+            values = candidates[is_peak[candidates]].astype(np.int32)
+            is_peak[values] = False
+            edits.new_removed(values)
+            reference.new_removed(values)
+        else:
+            values = candidates[~is_peak[candidates]].astype(np.int32)
+            is_peak[values] = True
+            edits.new_added(values)
+            reference.new_added(values)
+
+        np.testing.assert_array_equal(edits.added, sorted(set(reference.added)))
+        np.testing.assert_array_equal(edits.removed, sorted(set(reference.removed)))
+        assert edits.added.dtype == np.int32
+        assert edits.removed.dtype == np.int32
+        assert not np.isin(edits.added, edits.removed).any()
+
+    # Every non-empty edit is logged
+    assert all(op.indices.size > 0 for op in edits.journal)
+    assert len(edits) == edits.added.size + edits.removed.size
+
+    n_operations = len(edits.journal)
+    edits.clear()
+    assert len(edits) == 0
+    assert edits.journal[-1].action == "clear"
+    # Clearing without any edits isn't logged
+    edits.clear()
+    assert len(edits.journal) == n_operations + 1
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from signal_editor.app.logic.signal_pyramid import MinMaxPyramid
+
+SAMPLING_RATE = 400
+
+
+@pytest.fixture(scope="module")
+def sig() -> np.ndarray:
+    rng = np.random.default_rng(42)
+    n = 50_003
+    t = np.arange(n) / SAMPLING_RATE
+    return np.sin(2 * np.pi * 1.2 * t) + 0.3 * np.sin(2 * np.pi * 50 * t) + np.cumsum(rng.normal(0, 0.01, n))
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 1000, 50_003])
+def test_min_max_pyramid_levels(n: int) -> None:
+    sig = np.random.default_rng(n).normal(size=n)
+    sig[n // 2] = np.nan
+    pyramid = MinMaxPyramid.from_signal(sig)
+
+    for level, (mins, maxs) in enumerate(pyramid.levels, start=1):
+        bucket_size = 2**level
+        padded = np.concatenate([sig, np.full(-n % bucket_size, np.nan)]).reshape(-1, bucket_size)
+        with np.errstate(all="ignore"):
+            np.testing.assert_array_equal(mins, np.nanmin(padded, axis=1))
+            np.testing.assert_array_equal(maxs, np.nanmax(padded, axis=1))
+    assert pyramid.levels == [] or pyramid.levels[-1][0].size < 4
+
+
+def test_min_max_pyramid_view(sig: np.ndarray) -> None:
+    pyramid = MinMaxPyramid.from_signal(sig)
+
+    # Few enough samples to plot directly
+    x, y = pyramid.get_view(100.4, 1100, max_buckets=500)
+    np.testing.assert_array_equal(x, np.arange(100, 1100))
+    np.testing.assert_array_equal(y, sig[100:1100])
+
+    # The envelope stays within the number of buckets and covers the whole range
+    x, y = pyramid.get_view(-500, 40_000, max_buckets=1000)
+    level = pyramid.level_for(40_000, 1000)
+    assert level == 6
+    assert x.size <= 2 * 1000 + 2
+    assert x[0] == 0 and x[-1] + 2**level >= 40_000
+    assert y[0::2].min() == sig[: x[-1].astype(int) + 2**level].min()
+    assert y[1::2].max() == sig[: x[-1].astype(int) + 2**level].max()
+
+    # Zoomed out further than the top level, the top level is used
+    assert pyramid.level_for(1e12, 10) == pyramid.n_levels - 1